@@ -0,0 +1,109 @@
+"""
+analysis.py — Pixel readouts for Image Studio
+Hover readouts and the pixel inspector crop just the pixels they show,
+so an event costs the same on any image size and nothing is re-encoded.
+Whole-image stats (palettes) convert the image to a NumPy array, on a
+worker thread, and keep only their result per version.
+"""
+
+import numpy as np
+from PIL import Image
+
+
+class PixelBuffer:
+    """Read-only pixel access to one image version (RGB, RGBA or L)."""
+
+    def __init__(self, img: Image.Image):
+        self.img = img
+        self.width, self.height = img.size
+        self.cache = {}                    # derived stats of this version
+
+    def array(self):
+        """(H, W, C) copy of the whole image; "L" has C = 1."""
+        arr = np.asarray(self.img)
+        return arr[:, :, None] if arr.ndim == 2 else arr
+
+    def pixel(self, x, y):
+        v = self.img.getpixel((x, y))
+        return (v,) * 3 if isinstance(v, int) else tuple(v[:3])
+
+    def patch(self, cx, cy, n):
+        """n×n RGB block around (cx, cy), kept inside the image where possible.
+        Returns (block, x0, y0) with (x0, y0) the image coords of block[0, 0]."""
+        x0 = min(max(0, cx - n // 2), max(0, self.width - n))
+        y0 = min(max(0, cy - n // 2), max(0, self.height - n))
+        x1, y1 = min(x0 + n, self.width), min(y0 + n, self.height)
+        block = np.asarray(self.img.crop((x0, y0, x1, y1)))
+        block = block[:, :, None] if block.ndim == 2 else block[:, :, :3]
+        if block.shape[:2] != (n, n):      # image smaller than n: repeat the edge
+            block = np.pad(block, ((0, n - block.shape[0]), (0, n - block.shape[1]), (0, 0)),
+                           mode="edge")
+        if block.shape[2] == 1:
+            block = np.repeat(block, 3, axis=2)
+        return block, x0, y0
+
+
+def magnify(block, cell) -> Image.Image:
+    """Nearest-neighbour enlargement of a small block, cell px per pixel."""
+    img = Image.fromarray(np.ascontiguousarray(block))
+    return img.resize((img.width * cell, img.height * cell), Image.NEAREST)
+
+
+def text_colors(block):
+    """'black' or 'white' per pixel, whichever reads better on it."""
+    block = block.astype(np.int32)
+    bright = block[..., 0] * 299 + block[..., 1] * 587 + block[..., 2] * 114
+    return np.where(bright > 128000, "black", "white")
+
+
+# ----------------------------------------------------------------------------
+#  palette
+SAMPLE = 1_000_000            # pixels counted for palettes of larger images
+PALETTE_MODES = ("common", "median-cut", "k-means")
+
+
+def sample_pixels(buf: PixelBuffer, n=SAMPLE):
+    """(m, 3) uint8 RGB rows: every pixel, or a fixed random sample of n."""
+    arr = buf.array()
+    flat = arr.reshape(-1, arr.shape[2])
+    if len(flat) > n:
+        idx = np.random.default_rng(0).integers(0, len(flat), n)
+        flat = flat[idx]
+    flat = flat[:, :3]
+    return np.repeat(flat, 3, axis=1) if flat.shape[1] == 1 else flat
+
+
+def pack_rgb(rows):
+    rows = rows.astype(np.uint32)
+    return rows[:, 0] << 16 | rows[:, 1] << 8 | rows[:, 2]
+
+
+def common_colors(rows, k=16):
+    """[(share, (r, g, b))] of the k most frequent exact colors."""
+    keys, counts = np.unique(pack_rgb(rows), return_counts=True)
+    top = np.argsort(counts)[::-1][:k]
+    return [(float(counts[i] / len(rows)),
+             (int(keys[i] >> 16), int(keys[i] >> 8 & 255), int(keys[i] & 255)))
+            for i in top]
+
+
+def dominant_colors(rows, k=16, kmeans=False):
+    """[(share, (r, g, b))] of k median-cut clusters, optionally refined by
+    k-means iterations."""
+    strip = Image.fromarray(np.ascontiguousarray(rows[None, :, :]))
+    q = strip.quantize(k, Image.Quantize.MEDIANCUT, kmeans=8 if kmeans else 0)
+    pal = q.getpalette()
+    counts = sorted(q.getcolors(k) or [], reverse=True)
+    return [(c / len(rows), tuple(pal[3*i:3*i + 3])) for c, i in counts]
+
+
+def palette(buf: PixelBuffer, mode="common", k=16):
+    """Palette of one image version, cached on its buffer."""
+    key = ("palette", mode, k)
+    if key not in buf.cache:
+        rows = sample_pixels(buf)
+        if mode == "common":
+            buf.cache[key] = common_colors(rows, k)
+        else:
+            buf.cache[key] = dominant_colors(rows, k, kmeans=mode == "k-means")
+    return buf.cache[key]
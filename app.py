@@ -3,27 +3,28 @@ from tkinter import ttk, filedialog, messagebox, colorchooser
 import os
 import sys
 import threading
-
-# optional heavy imports (install with pip) 
-try:
-    from PIL import Image, ImageTk, ImageFilter, ImageEnhance, ImageOps
-    PIL_OK = True
-except ImportError:
-    PIL_OK = False
-
-try:
-    import cv2
-    import numpy as np
-    CV2_OK = True
-except ImportError:
-    CV2_OK = False
-
-try:
-    from pydub import AudioSegment
-    from pydub.playback import play
-    AUDIO_OK = True
-except ImportError:
-    AUDIO_OK = False
+import time
+
+from executor import SerialQueue, OpExecutor
+import histogram
+import media_ops
+import tracing
+
+# optional heavy imports (install with pip), resolved on first use
+from backends import Lazy, PIL_OK, CV2_OK, NP_OK, AUDIO_OK
+
+Image        = Lazy("PIL.Image")
+ImageTk      = Lazy("PIL.ImageTk")
+image_ops    = Lazy("image_ops")
+loader       = Lazy("loader")
+export       = Lazy("export")
+image_cache  = Lazy("image_cache")
+gallery      = Lazy("gallery")
+audio_io     = Lazy("audio_io")
+waveform     = Lazy("waveform")
+spectrogram  = Lazy("spectrogram")
+cv2          = Lazy("cv2")
+np           = Lazy("numpy")
 
 # ------------------------------------------------------------------------------
 COLORS = {
@@ -59,6 +60,8 @@ def file_type(path: str) -> str:
 #  MAIN APPLICATION
 
 class MultimediaApp(tk.Tk):
+    PREVIEW_SIZE = (680, 540)
+
     def __init__(self):
         super().__init__()
         self.title("🎬 Multimedia File Manipulator")
@@ -67,7 +70,24 @@ class MultimediaApp(tk.Tk):
         self.configure(bg=COLORS["bg"])
         self._current_path = tk.StringVar()
         self._status      = tk.StringVar(value="Browse a file to get started …")
+        self._idle_status = None
+        self._img_load   = None
+        self._executor = OpExecutor(self, self._update_busy)
+        self._img_queue = SerialQueue(
+            self._executor,
+            base=lambda: self._img_current,
+            work=self._img_run,
+            on_result=self._img_result,
+            on_error=lambda exc: messagebox.showerror("Error", str(exc)),
+            # wrapped so image_ops (and Pillow) still load on first use
+            coalesce=lambda prev, node: image_ops.coalesce(prev, node),
+            describe=lambda node: image_ops.describe(node))
         self._build_ui()
+        self.bind("<Escape>", lambda e: self._img_queue.cancel())
+        self.bind("<F8>", lambda e: self._toggle_tracing())
+        self.bind("<Shift-F8>", lambda e: self._export_trace())
+        self.bind("<F9>", lambda e: self._toggle_profiler())
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
 
     #  UI scaffolding 
     def _build_ui(self):
@@ -92,6 +112,7 @@ class MultimediaApp(tk.Tk):
                          relief="flat", bd=6)
         entry.pack(side="left", fill="x", expand=True, padx=8)
         self._styled_btn(picker, "Browse", self._browse).pack(side="left", padx=4)
+        self._styled_btn(picker, "Gallery", self._browse_folder).pack(side="left", padx=4)
         self._styled_btn(picker, "Load ▶", self._load_file,
                          color=COLORS["success"]).pack(side="left", padx=4)
 
@@ -106,8 +127,9 @@ class MultimediaApp(tk.Tk):
         self._tool_frame.pack_propagate(False)
 
         # right: output / preview
-        right = tk.Frame(body, bg=COLORS["panel"], relief="flat")
+        right = self._right = tk.Frame(body, bg=COLORS["panel"], relief="flat")
         right.pack(side="left", fill="both", expand=True)
+        self._wave = None                  # waveform.WaveformView of an audio file
 
         self._preview_label = tk.Label(right, bg=COLORS["panel"],
                                        fg=COLORS["subtext"],
@@ -156,12 +178,57 @@ class MultimediaApp(tk.Tk):
         b.bind("<Leave>", lambda e: b.config(bg=COLORS["accent"]))
         return b
 
+    # background work 
+    def _update_busy(self, ex):
+        job = ex.current
+        if job is not None:
+            if self._idle_status is None:
+                self._idle_status = self._status.get()
+            self._status.set(f"⏳ {job.label} …  (Esc to cancel)")
+        elif self._idle_status is not None:
+            if self._status.get().startswith("⏳"):
+                self._status.set(self._idle_status)
+            self._idle_status = None
+
+    def _on_close(self):
+        self._executor.shutdown()
+        self.destroy()
+
+    # tracing (F8 on/off, Shift+F8 export) and profiling (F9)
+    def _toggle_tracing(self):
+        tracing.enable(not tracing.enabled())
+        self._status.set(f"Tracing {'on' if tracing.enabled() else 'off'}"
+                         "  —  Shift+F8 exports a Chrome trace")
+
+    def _export_trace(self):
+        if not tracing.spans():
+            self._status.set("No spans recorded — press F8 to start tracing."); return
+        out = filedialog.asksaveasfilename(
+            defaultextension=".json", filetypes=[("Chrome trace","*.json"),("All","*.*")])
+        if out:
+            n = tracing.export_chrome(out)
+            self._status.set(f"Trace ({n} events) → {out}")
+
+    def _toggle_profiler(self):
+        if not tracing.profiling():
+            tracing.start_profile()
+            self._status.set("Profiling …  (F9 to stop)"); return
+        out = filedialog.asksaveasfilename(
+            title="Save profile (cancel to only view)", defaultextension=".prof",
+            filetypes=[("cProfile","*.prof"),("All","*.*")])
+        report = tracing.stop_profile(out or None)
+        self._status.set(f"Profile saved → {out}" if out else "Profiler stopped.")
+        self._show_text(report)
+
     # clear helpers 
     def _clear_tools(self):
         for w in self._tool_frame.winfo_children():
             w.destroy()
 
     def _clear_preview(self):
+        if self._wave is not None:
+            self._wave.destroy()
+            self._wave = None
         self._preview_label.config(image="", text="")
         self._preview_label._img = None
         self._text_output.pack_forget()
@@ -174,11 +241,27 @@ class MultimediaApp(tk.Tk):
             self._current_path.set(p)
             self._load_file()
 
+    def _browse_folder(self):
+        if not PIL_OK:
+            messagebox.showerror("Missing Library", "Pillow not installed.\nRun: pip install pillow")
+            return
+        folder = filedialog.askdirectory(title="Browse Folder")
+        if folder:
+            gallery.Gallery(self, folder, self._open_from_gallery, COLORS)
+
+    def _open_from_gallery(self, path):
+        self._current_path.set(path)
+        self._load_file()
+
     def _load_file(self):
         path = self._current_path.get().strip()
         if not os.path.isfile(path):
             messagebox.showerror("Error", "File not found.")
             return
+        self._img_queue.cancel()
+        if self._img_load is not None:            # the previous image's decode
+            self._img_load.cancel()
+            self._img_load = None
         self._path = path
         self._ftype = file_type(path)
         self._clear_tools()
@@ -192,7 +275,14 @@ class MultimediaApp(tk.Tk):
             "text":    self._setup_text,
             "unknown": self._setup_unknown,
         }
-        handlers[self._ftype]()
+        t0 = time.perf_counter()
+        with tracing.span(f"setup_{self._ftype}", path=os.path.basename(path)):
+            handlers[self._ftype]()
+        cost = f"  •  ⏱ {(time.perf_counter() - t0) * 1000:.0f} ms"
+        if self._idle_status is not None:       # a background load is showing
+            self._idle_status += cost
+        else:
+            self._status.set(self._status.get() + cost)
 
     
     #  IMAGE TOOLS
@@ -201,70 +291,109 @@ class MultimediaApp(tk.Tk):
         if not PIL_OK:
             self._show_text("Pillow not installed.\nRun: pip install pillow")
             return
-        self._img_original = Image.open(self._path)
-        self._img_current  = self._img_original.copy()
-        self._show_image(self._img_current)
-
+        # reduced-scale preview now, full decode in the background; ops never
+        # modify their input, so original and current share one image
+        # (both are kept in image_cache, so switching back to a file is instant)
+        path = self._path
+        self._img_original = self._img_current = None
+        # the file's own format and mode: the decode is normalized to RGB / L
+        self._img_format, self._img_mode = loader.header(path)
+        if loader.is_cached(path):
+            img = self._img_original = self._img_current = loader.load_full(path)
+            if loader.is_cached(path, self.PREVIEW_SIZE):
+                img = loader.preview(path, self.PREVIEW_SIZE)
+            self._show_image(img)
+        else:
+            fast = self._img_format in loader.DRAFT_FORMATS
+            if fast:
+                self._show_image(loader.preview(path, self.PREVIEW_SIZE))
+            else:
+                # other formats have no cheap reduced decode: wait for the full one
+                self._preview_label.config(text="Loading …")
+            self._load_image(path, show=not fast)
+        self._image_tools()
+
+    def _load_image(self, path, show=False):
+        def decode(job):
+            with tracing.span("decode", path=os.path.basename(path)) as sp:
+                img = loader.load_full(path)
+                sp.add(bytes=tracing.nbytes(img))
+            return img
+        def loaded(img):
+            if self._path == path:
+                self._img_original = self._img_current = img
+                if show:
+                    self._show_image(img)
+        self._img_load = self._executor.submit(
+            f"open {os.path.basename(path)}", decode, loaded,
+            lambda exc: messagebox.showerror("Error", str(exc)))
+
+    def _image_tools(self):
         self._section("📐 Transform")
-        self._tool_btn("Rotate 90°",      lambda: self._img_op("rotate90"))
-        self._tool_btn("Rotate 180°",     lambda: self._img_op("rotate180"))
+        self._tool_btn("Rotate 90°",      lambda: self._img_op("turn", 90))
+        self._tool_btn("Rotate 180°",     lambda: self._img_op("turn", 180))
         self._tool_btn("Flip Horizontal", lambda: self._img_op("flip_h"))
         self._tool_btn("Flip Vertical",   lambda: self._img_op("flip_v"))
 
         self._section("🎨 Color")
-        self._tool_btn("Grayscale",   lambda: self._img_op("gray"))
+        self._tool_btn("Grayscale",   lambda: self._img_op("grayscale"))
         self._tool_btn("Invert",      lambda: self._img_op("invert"))
         self._tool_btn("Sepia",       lambda: self._img_op("sepia"))
         self._tool_btn("Enhance Brightness", self._img_brightness)
         self._tool_btn("Enhance Contrast",   self._img_contrast)
 
         self._section("🔎 Filters")
-        self._tool_btn("Blur",        lambda: self._img_op("blur"))
-        self._tool_btn("Sharpen",     lambda: self._img_op("sharpen"))
-        self._tool_btn("Edge Detect", lambda: self._img_op("edges"))
-        self._tool_btn("Emboss",      lambda: self._img_op("emboss"))
+        self._tool_btn("Blur",        lambda: self._img_op("blur", 2))
+        self._tool_btn("Sharpen",     lambda: self._img_op("kernel", "sharpen"))
+        self._tool_btn("Edge Detect", lambda: self._img_op("kernel", "edges"))
+        self._tool_btn("Emboss",      lambda: self._img_op("kernel", "emboss"))
 
         self._section("💾 Export")
         self._tool_btn("Resize …",         self._img_resize_dialog)
         self._tool_btn("Save As …",        self._img_save)
-        self._tool_btn("Reset to Original",lambda: self._img_op("reset"))
+        self._tool_btn("Reset to Original",self._img_reset)
         self._tool_btn("File Info",        self._img_info)
 
-    def _img_op(self, op):
-        img = self._img_current
-        orig = self._img_original
-        ops = {
-            "rotate90":  lambda: img.rotate(-90, expand=True),
-            "rotate180": lambda: img.rotate(180),
-            "flip_h":    lambda: ImageOps.mirror(img),
-            "flip_v":    lambda: ImageOps.flip(img),
-            "gray":      lambda: img.convert("L").convert("RGB"),
-            "invert":    lambda: ImageOps.invert(img.convert("RGB")),
-            "blur":      lambda: img.filter(ImageFilter.GaussianBlur(2)),
-            "sharpen":   lambda: img.filter(ImageFilter.SHARPEN),
-            "edges":     lambda: img.filter(ImageFilter.FIND_EDGES),
-            "emboss":    lambda: img.filter(ImageFilter.EMBOSS),
-            "reset":     lambda: orig.copy(),
-        }
-        if op == "sepia":
-            gray = img.convert("L")
-            sepia = Image.merge("RGB", [
-                gray.point(lambda p: min(int(p * 1.08), 255)),
-                gray.point(lambda p: min(int(p * 0.84), 255)),
-                gray.point(lambda p: min(int(p * 0.66), 255)),
-            ])
-            self._img_current = sepia
-        elif op in ops:
-            self._img_current = ops[op]()
+    def _img_ready(self):
+        if self._img_current is None:
+            self._status.set("Still loading the image …")
+            return False
+        return True
+
+    def _img_op(self, op, *args):
+        # ops come from the shared image_ops registry (also used by batch.py)
+        if self._img_ready():
+            self._img_queue.submit(op, args)
+
+    def _img_reset(self):
+        if not self._img_ready(): return
+        self._img_queue.cancel()
+        self._img_current = self._img_original
         self._show_image(self._img_current)
 
+    def _img_run(self, img, nodes, job):
+        with tracing.span("ops", nodes=len(nodes)) as sp:
+            out = image_ops.run(img, nodes)
+            sp.add(bytes=tracing.nbytes(out))
+        return out
+
+    def _img_result(self, nodes, img):
+        t0 = time.perf_counter()
+        self._img_current = img
+        with tracing.span("display"):
+            self._show_image(self._img_current)
+        job = self._img_queue.last_job
+        self._status.set(f"⏱ {job.label}  {job.elapsed * 1000:.0f} ms"
+                         f" + {(time.perf_counter() - t0) * 1000:.0f} ms UI"
+                         f"  •  {tracing.nbytes(img) / 1e6:.1f} MB")
+
     def _img_brightness(self):
-        self._enhance_dialog("Brightness", ImageEnhance.Brightness)
+        self._enhance_dialog("Brightness", "brightness")
 
     def _img_contrast(self):
-        self._enhance_dialog("Contrast", ImageEnhance.Contrast)
+        self._enhance_dialog("Contrast", "contrast")
 
-    def _enhance_dialog(self, name, Enhancer):
+    def _enhance_dialog(self, name, kind):
         d = tk.Toplevel(self); d.title(name); d.configure(bg=COLORS["bg"])
         d.resizable(False, False)
         tk.Label(d, text=f"Factor (0.1 – 3.0):", bg=COLORS["bg"],
@@ -276,12 +405,12 @@ class MultimediaApp(tk.Tk):
         lbl = tk.Label(d, textvariable=var, bg=COLORS["bg"], fg=COLORS["highlight"])
         lbl.pack()
         def apply():
-            self._img_current = Enhancer(self._img_current).enhance(var.get())
-            self._show_image(self._img_current); d.destroy()
+            self._img_op("enhance", kind, var.get()); d.destroy()
         tk.Button(d, text="Apply", command=apply, bg=COLORS["btn"], fg="white",
                   relief="flat", padx=16, pady=6).pack(pady=12)
 
     def _img_resize_dialog(self):
+        if not self._img_ready(): return
         d = tk.Toplevel(self); d.title("Resize Image"); d.configure(bg=COLORS["bg"])
         d.resizable(False, False)
         w_var = tk.IntVar(value=self._img_current.width)
@@ -293,39 +422,38 @@ class MultimediaApp(tk.Tk):
             tk.Entry(row, textvariable=var, bg=COLORS["panel"], fg=COLORS["text"],
                      width=8, relief="flat").pack(side="left")
         def apply():
-            self._img_current = self._img_current.resize(
-                (w_var.get(), h_var.get()), Image.LANCZOS)
-            self._show_image(self._img_current); d.destroy()
+            self._img_op("resize", w_var.get(), h_var.get()); d.destroy()
         tk.Button(d, text="Resize", command=apply, bg=COLORS["btn"], fg="white",
                   relief="flat", padx=16, pady=6).pack(pady=12)
 
     def _img_save(self):
+        if not self._img_ready(): return
         ext = os.path.splitext(self._path)[1]
         out = filedialog.asksaveasfilename(
-            defaultextension=ext,
-            filetypes=[("JPEG","*.jpg"),("PNG","*.png"),("BMP","*.bmp"),
-                       ("All","*.*")])
-        if out:
-            self._img_current.save(out)
-            self._status.set(f"Saved → {out}")
+            defaultextension=ext, filetypes=export.FILE_TYPES)
+        if not out: return
+        # encoded in the background with the format's preset, alpha kept
+        img = self._img_current
+        self._executor.submit(
+            f"save {os.path.basename(out)}", lambda job: export.save(img, out),
+            lambda n: self._status.set(f"Saved → {out}  ({n / 1e6:.1f} MB)"),
+            lambda exc: messagebox.showerror("Error", str(exc)))
 
     def _img_info(self):
+        if not self._img_ready(): return
         img = self._img_original
         info = (f"File:   {os.path.basename(self._path)}\n"
                 f"Size:   {img.size[0]} × {img.size[1]} px\n"
-                f"Mode:   {img.mode}\n"
-                f"Format: {img.format}\n"
-                f"Bytes:  {os.path.getsize(self._path):,}")
+                f"Mode:   {self._img_mode}\n"
+                f"Format: {self._img_format}\n"
+                f"Bytes:  {os.path.getsize(self._path):,}\n\n"
+                f"Cache:  {image_cache.CACHE.summary()}")
         messagebox.showinfo("Image Info", info)
 
     def _show_image(self, img):
         self._text_output.pack_forget()
         self._preview_label.pack(fill="both", expand=True, padx=10, pady=10)
-        # fit to panel
-        max_w, max_h = 680, 540
-        ratio = min(max_w / img.width, max_h / img.height, 1)
-        disp = img.resize((int(img.width * ratio), int(img.height * ratio)),
-                           Image.LANCZOS)
+        disp = loader.display(img, self.PREVIEW_SIZE)     # fit to panel
         tk_img = ImageTk.PhotoImage(disp)
         self._preview_label.config(image=tk_img, text="")
         self._preview_label._img = tk_img
@@ -336,6 +464,7 @@ class MultimediaApp(tk.Tk):
     def _setup_audio(self):
         info = self._audio_info_str()
         self._show_text(info)
+        self._show_waveform()
 
         self._section("🔊 Audio Info")
         self._tool_btn("Show Info",   self._show_audio_info)
@@ -345,45 +474,73 @@ class MultimediaApp(tk.Tk):
         self._tool_btn("Change Volume",     self._audio_volume)
         self._tool_btn("Reverse Audio",     self._audio_reverse)
 
+        self._section("📈 Analysis")
+        self._tool_btn("Spectrogram",       self._audio_spectrogram)
+
         self._section("💾 Export")
         self._tool_btn("Export as WAV",  lambda: self._audio_export("wav"))
         self._tool_btn("Export as MP3",  lambda: self._audio_export("mp3"))
         self._tool_btn("Export as OGG",  lambda: self._audio_export("ogg"))
 
+    def _show_waveform(self):
+        """Overview from the cached peak pyramid; built in the background
+        on the first visit and whenever the file changes."""
+        if not NP_OK: return
+        path = self._path
+        view = self._wave = waveform.WaveformView(self._right, COLORS)
+        view.pack(before=self._text_output, fill="x", padx=10, pady=(10, 0))
+        view.message("Building waveform …")
+        def work(job):
+            peaks = waveform.peaks_for(path, job)
+            src = audio_io.wav_source(path)
+            return peaks, audio_io.AudioBuffer.open(src) if src else None
+        def failed(exc):
+            if view.winfo_exists():
+                view.message(f"No waveform: {exc}")
+        self._executor.submit(f"waveform {os.path.basename(path)}", work,
+                              lambda res: view.winfo_exists() and view.show(*res),
+                              failed)
+
     def _load_audio(self):
         if not AUDIO_OK:
             messagebox.showerror("Missing Library",
                 "pydub not installed.\nRun: pip install pydub\n"
                 "Also requires ffmpeg in PATH.")
             return None
-        return AudioSegment.from_file(self._path)
+        # decoded once per file version, shared by every tool
+        return audio_io.load(self._path)
 
     def _audio_info_str(self):
         size = os.path.getsize(self._path)
         lines = [f"File:       {os.path.basename(self._path)}",
                  f"Size:       {size:,} bytes ({size/1024/1024:.2f} MB)",
                  f"Extension:  {os.path.splitext(self._path)[1].upper()}"]
-        if AUDIO_OK:
-            try:
-                seg = AudioSegment.from_file(self._path)
-                dur = len(seg) / 1000
-                lines += [f"Duration:   {dur:.2f} s  ({int(dur//60)}m {int(dur%60)}s)",
-                          f"Channels:   {seg.channels}",
-                          f"Frame Rate: {seg.frame_rate} Hz",
-                          f"Sample Wid: {seg.sample_width * 8} bit"]
-            except Exception as e:
-                lines.append(f"(Could not read audio metadata: {e})")
+        # header only: nothing is decoded to show the metadata
+        info = audio_io.probe(self._path)
+        if info:
+            dur = info["duration"]
+            lines += [f"Duration:   {dur:.2f} s  ({int(dur//60)}m {int(dur%60)}s)",
+                      f"Channels:   {info['channels']}",
+                      f"Frame Rate: {info['rate']} Hz",
+                      f"Sample Wid: {info['bits'] or '?'} bit",
+                      f"Codec:      {info['codec']}"]
         else:
+            lines.append("(Could not read the audio header — install ffmpeg/ffprobe)")
+        if not AUDIO_OK:
             lines.append("\n⚠ Install pydub for full audio features.")
+        lines.append(f"\nDecoded-audio cache: {audio_io.CACHE.summary()}")
         return "\n".join(lines)
 
     def _show_audio_info(self):
         messagebox.showinfo("Audio Info", self._audio_info_str())
 
     def _audio_trim(self):
-        seg = self._load_audio()
-        if seg is None: return
-        dur = len(seg) / 1000
+        info = audio_io.probe(self._path)
+        dur = info["duration"] if info else None
+        if dur is None:
+            seg = self._load_audio()
+            if seg is None: return
+            dur = len(seg) / 1000
         d = tk.Toplevel(self); d.title("Trim Audio"); d.configure(bg=COLORS["bg"])
         tk.Label(d, text=f"Duration: {dur:.2f}s", bg=COLORS["bg"],
                  fg=COLORS["text"]).pack(padx=20, pady=(12,4))
@@ -396,18 +553,16 @@ class MultimediaApp(tk.Tk):
             tk.Entry(row, textvariable=var, bg=COLORS["panel"], fg=COLORS["text"],
                      width=8, relief="flat").pack(side="left")
         def apply():
-            trimmed = seg[int(s_var.get()*1000):int(e_var.get()*1000)]
-            out = filedialog.asksaveasfilename(defaultextension=".wav",
-                    filetypes=[("WAV","*.wav"),("MP3","*.mp3")])
-            if out:
-                trimmed.export(out); self._status.set(f"Trimmed → {out}")
+            start, end = s_var.get(), e_var.get()
             d.destroy()
+            self._audio_edit(
+                "trim", "Trimmed",
+                lambda src, out, job: audio_io.stream_trim(src, out, start, end, job),
+                lambda seg: media_ops.audio_trim(seg, start, end))
         tk.Button(d, text="Trim & Save", command=apply, bg=COLORS["btn"],
                   fg="white", relief="flat", padx=14, pady=6).pack(pady=12)
 
     def _audio_volume(self):
-        seg = self._load_audio()
-        if seg is None: return
         d = tk.Toplevel(self); d.title("Change Volume"); d.configure(bg=COLORS["bg"])
         tk.Label(d, text="dB change (−20 to +20):", bg=COLORS["bg"],
                  fg=COLORS["text"], font=("Segoe UI", 10)).pack(padx=20, pady=(16,4))
@@ -416,31 +571,61 @@ class MultimediaApp(tk.Tk):
                   length=260).pack(padx=20)
         tk.Label(d, textvariable=var, bg=COLORS["bg"], fg=COLORS["highlight"]).pack()
         def apply():
-            louder = seg + var.get()
-            out = filedialog.asksaveasfilename(defaultextension=".wav",
-                    filetypes=[("WAV","*.wav"),("MP3","*.mp3")])
-            if out:
-                louder.export(out); self._status.set(f"Saved → {out}")
+            db = var.get()
             d.destroy()
+            self._audio_edit(
+                "gain", "Saved",
+                lambda src, out, job: audio_io.stream_gain(src, out, db, job),
+                lambda seg: media_ops.audio_gain(seg, db))
         tk.Button(d, text="Apply & Save", command=apply, bg=COLORS["btn"],
                   fg="white", relief="flat", padx=14, pady=6).pack(pady=12)
 
     def _audio_reverse(self):
-        seg = self._load_audio()
-        if seg is None: return
+        self._audio_edit("reverse", "Reversed",
+                         lambda src, out, job: audio_io.stream_reverse(src, out, job),
+                         media_ops.audio_reverse)
+
+    def _audio_edit(self, label, done_msg, stream, edit):
+        """Write an edited copy in the background. PCM / float WAV → WAV
+        runs on a memory map of the file (audio_io.AudioBuffer), as does
+        any → WAV once a large decode has been spilled; anything else is
+        decoded (once, cached) and edited with pydub."""
         out = filedialog.asksaveasfilename(defaultextension=".wav",
                 filetypes=[("WAV","*.wav"),("MP3","*.mp3")])
-        if out:
-            seg.reverse().export(out)
-            self._status.set(f"Reversed → {out}")
+        if not out: return
+        src, wav = self._path, audio_io.wav_source(self._path)
+        if wav and out.lower().endswith(".wav"):
+            work = lambda job: stream(wav, out, job)
+        elif not AUDIO_OK:
+            self._load_audio(); return               # shows the install hint
+        else:
+            work = lambda job: media_ops.audio_export(edit(audio_io.load(src)), out)
+        self._executor.submit(f"{label} {os.path.basename(src)}", work,
+                              lambda _: self._status.set(f"{done_msg} → {out}"),
+                              lambda exc: messagebox.showerror("Error", str(exc)))
+
+    def _audio_spectrogram(self):
+        if not (NP_OK and PIL_OK):
+            messagebox.showerror("Missing Library",
+                "The spectrogram needs NumPy and Pillow.\nRun: pip install numpy pillow")
+            return
+        if not audio_io.streamable(self._path) and not AUDIO_OK:
+            self._load_audio(); return                   # shows the install hint
+        spectrogram.Spectrogram(self, self._path, COLORS)
 
     def _audio_export(self, fmt):
+        if fmt == "wav" and audio_io.wav_source(self._path):
+            # same samples, copied page by page without decoding
+            self._audio_edit("export", "Exported",
+                             lambda src, out, job: audio_io.AudioBuffer.open(src).write(out, job=job),
+                             lambda seg: seg)
+            return
         seg = self._load_audio()
         if seg is None: return
         out = filedialog.asksaveasfilename(defaultextension=f".{fmt}",
                 filetypes=[(fmt.upper(), f"*.{fmt}")])
         if out:
-            seg.export(out, format=fmt)
+            media_ops.audio_export(seg, out, fmt)
             self._status.set(f"Exported → {out}")
 
     
@@ -519,14 +704,7 @@ class MultimediaApp(tk.Tk):
         out_dir = filedialog.askdirectory(title="Select output folder")
         if not out_dir: return
         def worker():
-            cap = cv2.VideoCapture(self._path)
-            i = 0
-            while True:
-                ret, frame = cap.read()
-                if not ret: break
-                cv2.imwrite(os.path.join(out_dir, f"frame_{i:05d}.png"), frame)
-                i += 1
-            cap.release()
+            i = media_ops.extract_frames(self._path, out_dir)
             self._status.set(f"Extracted {i} frames → {out_dir}")
         threading.Thread(target=worker, daemon=True).start()
         self._status.set("Extracting frames … (background)")
@@ -537,22 +715,12 @@ class MultimediaApp(tk.Tk):
         cap = cv2.VideoCapture(self._path)
         ret, frame = cap.read(); cap.release()
         if not ret: return
-        import io, matplotlib
-        matplotlib.use("Agg")
-        import matplotlib.pyplot as plt
-        fig, axes = plt.subplots(1, 3, figsize=(8, 3), facecolor="#1a1a2e")
-        colors = ("b","g","r"); names=("Blue","Green","Red")
-        for i,(c,n) in enumerate(zip(colors, names)):
-            hist = cv2.calcHist([frame],[i],None,[256],[0,256])
-            axes[i].plot(hist, color=c)
-            axes[i].set_title(n, color="white")
-            axes[i].set_facecolor("#16213e")
-            axes[i].tick_params(colors="white")
-        fig.tight_layout()
-        buf = io.BytesIO(); fig.savefig(buf, format="png"); buf.seek(0)
-        plt.close(fig)
-        img = Image.open(buf)
-        self._show_image(img)
+        hists = histogram.from_array(frame)[::-1]       # BGR → RGB
+        d = tk.Toplevel(self); d.title("Frame Histogram")
+        d.configure(bg=COLORS["bg"]); d.geometry("600x280")
+        cv = tk.Canvas(d, bg=COLORS["panel"], highlightthickness=0)
+        cv.pack(fill="both", expand=True, padx=8, pady=8)
+        cv.bind("<Configure>", lambda e: histogram.draw(cv, hists))
 
     
     #  TEXT TOOLS
@@ -586,19 +754,14 @@ class MultimediaApp(tk.Tk):
         self._text_output.pack(fill="both", expand=True, padx=10, pady=10)
 
     def _text_count(self):
-        txt = self._text_content
-        lines = txt.splitlines()
-        words = len(txt.split())
-        chars = len(txt)
+        st = media_ops.text_stats(self._text_content)
         messagebox.showinfo("Text Stats",
-            f"Lines:      {len(lines)}\n"
-            f"Words:      {words}\n"
-            f"Characters: {chars}")
+            f"Lines:      {st['lines']}\n"
+            f"Words:      {st['words']}\n"
+            f"Characters: {st['chars']}")
 
     def _text_char_freq(self):
-        from collections import Counter
-        freq = Counter(c for c in self._text_content if c.isalpha())
-        top = freq.most_common(10)
+        top = media_ops.char_freq(self._text_content)
         msg = "\n".join(f"  '{c}': {n}" for c,n in top)
         messagebox.showinfo("Top 10 Characters", msg)
 
@@ -613,20 +776,15 @@ class MultimediaApp(tk.Tk):
             if label == "Find:": find_e = e
             else:                repl_e = e
         def apply():
-            self._text_content = self._text_content.replace(
-                find_e.get(), repl_e.get())
+            self._text_content = media_ops.find_replace(
+                self._text_content, find_e.get(), repl_e.get())
             self._show_text(self._text_content)
             d.destroy()
         tk.Button(d, text="Replace All", command=apply, bg=COLORS["btn"],
                   fg="white", relief="flat", padx=14, pady=6).pack(pady=12)
 
     def _text_transform(self, op):
-        t = self._text_content
-        if op == "upper":     t = t.upper()
-        elif op == "lower":   t = t.lower()
-        elif op == "rev_lines": t = "\n".join(reversed(t.splitlines()))
-        elif op == "sort":    t = "\n".join(sorted(t.splitlines()))
-        elif op == "rm_blank":t = "\n".join(l for l in t.splitlines() if l.strip())
+        t = media_ops.text_transform(self._text_content, op)
         self._text_content = t
         self._show_text(t)
 
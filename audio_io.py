@@ -0,0 +1,376 @@
+"""
+audio_io.py — Audio header probing and a decoded-audio cache
+probe() reads duration, channels, rate and sample width from the
+container header: RIFF/WAV and FLAC headers are parsed here, other
+formats are asked of ffprobe, which also stops after the header.
+Samples are decoded (pydub / ffmpeg) only when a tool needs them, and
+load() keeps the decoded AudioSegments per path and mtime in an LRU
+cache bounded by MM_AUDIO_CACHE_MB (default 512). A decode too big for
+the cache is also written once to a WAV in MM_AUDIO_SPILL (default a
+temp directory): later loads read it back instead of running ffmpeg, and
+the memory-mapped tools below work on it like on any WAV.
+
+PCM and float WAVs skip decoding altogether: AudioBuffer maps the data
+chunk with np.memmap, trims and reverses as views, and writes gain or
+copies block by block into a memory-mapped output file.
+"""
+
+import hashlib, json, os, shutil, struct, subprocess, tempfile
+
+from backends import Lazy
+from image_cache import ImageCache, file_key
+
+AudioSegment = Lazy("pydub", "AudioSegment")
+np           = Lazy("numpy")
+
+BUDGET = int(os.environ.get("MM_AUDIO_CACHE_MB", 512)) << 20
+CACHE  = ImageCache(BUDGET, sizeof=lambda seg: len(seg.raw_data))
+SPILL_DIR = os.environ.get("MM_AUDIO_SPILL") or os.path.join(
+    tempfile.gettempdir(), "multimedia-course", "audio")
+
+WAV_PCM, WAV_FLOAT, WAV_EXTENSIBLE = 1, 3, 0xFFFE
+
+
+def wav_header(path):
+    """fmt and data chunk of a RIFF/WAVE file; data_offset is where the
+    interleaved samples start."""
+    with open(path, "rb") as f:
+        riff, _, wave_id = struct.unpack("<4sI4s", f.read(12))
+        if riff != b"RIFF" or wave_id != b"WAVE":
+            raise ValueError("not a RIFF/WAVE file")
+        info = None
+        while True:
+            head = f.read(8)
+            if len(head) < 8:
+                raise ValueError("WAV file has no data chunk")
+            cid, size = struct.unpack("<4sI", head)
+            if cid == b"fmt ":
+                fmt = f.read(size)
+                tag, channels, rate, _, align, bits = struct.unpack("<HHIIHH", fmt[:16])
+                if not channels or not rate or align < channels:
+                    raise ValueError(f"bad WAV fmt chunk: {channels} channels, "
+                                     f"{rate} Hz, {align}-byte frames")
+                if tag == WAV_EXTENSIBLE and len(fmt) >= 26:
+                    tag = struct.unpack("<H", fmt[24:26])[0]
+                info = {"format": "wav",
+                        "codec": {WAV_PCM: "pcm", WAV_FLOAT: "float"}.get(tag, f"0x{tag:04x}"),
+                        "channels": channels, "rate": rate,
+                        "width": align // channels, "bits": bits}
+            elif cid == b"data":
+                if info is None:
+                    raise ValueError("WAV data chunk before fmt chunk")
+                offset = f.tell()
+                # streamed writers leave the size at 0 or 0xFFFFFFFF
+                avail = os.fstat(f.fileno()).st_size - offset
+                size = avail if size in (0, 0xFFFFFFFF) else min(size, avail)
+                frame = info["width"] * info["channels"]
+                info.update(data_offset=offset, frames=size // frame)
+                info["duration"] = info["frames"] / info["rate"]
+                return info
+            else:
+                f.seek(size, os.SEEK_CUR)
+            if size & 1:
+                f.seek(1, os.SEEK_CUR)               # chunks are word aligned
+
+
+def flac_header(path):
+    """STREAMINFO block of a FLAC file."""
+    with open(path, "rb") as f:
+        if f.read(4) != b"fLaC":
+            raise ValueError("not a FLAC file")
+        block = f.read(4 + 34)
+    if block[0] & 0x7F != 0:
+        raise ValueError("FLAC file does not start with STREAMINFO")
+    bits = int.from_bytes(block[4 + 10:4 + 18], "big")
+    rate     = bits >> 44
+    channels = ((bits >> 41) & 0x7) + 1
+    depth    = ((bits >> 36) & 0x1F) + 1
+    frames   = bits & 0xFFFFFFFFF
+    return {"format": "flac", "codec": "flac", "channels": channels, "rate": rate,
+            "width": (depth + 7) // 8, "bits": depth, "frames": frames,
+            "duration": frames / rate if rate else 0.0}
+
+
+def ffprobe(path):
+    """First audio stream as reported by ffprobe, or None without it."""
+    exe = shutil.which("ffprobe")
+    if exe is None:
+        return None
+    res = subprocess.run(
+        [exe, "-v", "error", "-select_streams", "a:0", "-of", "json",
+         "-show_entries", "stream=codec_name,channels,sample_rate,bits_per_sample,"
+         "duration:format=format_name,duration", path],
+        capture_output=True, text=True)
+    if res.returncode:
+        return None
+    data = json.loads(res.stdout or "{}")
+    streams = data.get("streams") or [{}]
+    st, fmt = streams[0], data.get("format", {})
+    bits = int(st.get("bits_per_sample") or 0)
+    return {"format": fmt.get("format_name", "?"), "codec": st.get("codec_name", "?"),
+            "channels": int(st.get("channels") or 0),
+            "rate": int(st.get("sample_rate") or 0),
+            "width": (bits + 7) // 8 or None, "bits": bits or None,
+            "duration": float(st.get("duration") or fmt.get("duration") or 0)}
+
+
+def probe(path):
+    """Header information without decoding any audio; None if unknown."""
+    ext = os.path.splitext(path)[1].lower()
+    try:
+        if ext == ".wav":
+            return wav_header(path)
+        if ext == ".flac":
+            return flac_header(path)
+    except (OSError, ValueError, struct.error):
+        pass
+    return ffprobe(path)
+
+
+def spill_file(path):
+    """Where load() keeps the decode of this version of path."""
+    apath, mtime, size = file_key(path)
+    h = hashlib.blake2b(apath.encode(), digest_size=16).hexdigest()
+    return os.path.join(SPILL_DIR, f"{h}-{mtime}-{size}.wav")
+
+
+def _decode(path):
+    spill = spill_file(path)
+    if os.path.exists(spill):
+        return AudioSegment.from_wav(spill)          # read back, no ffmpeg
+    seg = AudioSegment.from_file(path)
+    if len(seg.raw_data) > CACHE.budget:
+        # spilling is best effort: without it the next load decodes again
+        prefix = os.path.basename(spill).split("-")[0] + "-"
+        try:
+            os.makedirs(SPILL_DIR, exist_ok=True)
+            for old in os.listdir(SPILL_DIR):        # earlier versions of the file
+                if old.startswith(prefix):
+                    os.remove(os.path.join(SPILL_DIR, old))
+            AudioBuffer.from_segment(seg).write(spill)
+        except (OSError, ValueError):
+            pass
+    return seg
+
+
+def load(path):
+    """Decoded AudioSegment, from the cache while the file is unchanged,
+    else from its spilled decode."""
+    return CACHE.load(path, _decode)
+
+
+def wav_source(path):
+    """A file with path's samples that opens as an AudioBuffer: path
+    itself for PCM / float WAV, else its spilled decode; None if neither."""
+    if streamable(path):
+        return path
+    try:
+        spill = spill_file(path)
+    except OSError:
+        return None
+    return spill if os.path.exists(spill) else None
+
+
+# ----------------------------------------------------------------------------
+#  AudioBuffer: the data chunk of a PCM / float WAV as a memory map
+BLOCK = 1 << 16               # frames per block (≈ 1.5 s of 44.1 kHz audio)
+HEADER = 44                   # bytes of the header create() writes
+
+
+def mappable(info):
+    return ((info["codec"] == "pcm" and info["width"] in (1, 2, 3, 4))
+            or (info["codec"] == "float" and info["width"] in (4, 8)))
+
+
+def streamable(path):
+    """Whether the file opens as an AudioBuffer (no ffmpeg involved)."""
+    try:
+        return mappable(wav_header(path))
+    except (OSError, ValueError, struct.error):
+        return False
+
+
+class AudioBuffer:
+    """Frames as rows of an (n, frame bytes) uint8 array, normally an
+    np.memmap of a WAV data chunk, so every sample width (24-bit too)
+    maps the same way. trim() and reversed() are views: nothing is read
+    until samples(), gain() or write() touch the pages."""
+
+    def __init__(self, raw, info):
+        self.raw, self.info = raw, info
+
+    @classmethod
+    def open(cls, path, mode="r"):
+        info = wav_header(path)
+        if not mappable(info):
+            raise ValueError(f"cannot map {info['codec']} {info['bits']}-bit WAV")
+        frame = info["width"] * info["channels"]
+        if not info["frames"]:                       # mmap refuses empty maps
+            return cls(np.zeros((0, frame), np.uint8), info)
+        return cls(np.memmap(path, np.uint8, mode, offset=info["data_offset"],
+                             shape=(info["frames"], frame)), info)
+
+    @classmethod
+    def from_segment(cls, seg):
+        """View of a decoded pydub AudioSegment's samples."""
+        if seg.sample_width == 1:                    # pydub keeps 8-bit signed
+            seg = seg.set_sample_width(2)
+        w, ch, rate = seg.sample_width, seg.channels, seg.frame_rate
+        raw = np.frombuffer(seg.raw_data, np.uint8).reshape(-1, w * ch)
+        info = {"format": "pcm", "codec": "pcm", "channels": ch, "rate": rate,
+                "width": w, "bits": 8 * w, "frames": len(raw),
+                "duration": len(raw) / rate}
+        return cls(raw, info)
+
+    @classmethod
+    def create(cls, path, info, frames):
+        """New WAV of frames at path, mapped for writing."""
+        tag = WAV_FLOAT if info["codec"] == "float" else WAV_PCM
+        ch, rate, width = info["channels"], info["rate"], info["width"]
+        size = frames * ch * width
+        if 36 + size + (size & 1) > 0xFFFFFFFF:   # RIFF sizes are 32-bit
+            raise ValueError(f"{size / 2**30:.1f} GB of samples exceeds the 4 GB "
+                             "WAV limit; trim the audio or export to another format")
+        with open(path, "wb") as f:
+            f.write(struct.pack("<4sI4s4sIHHIIHH4sI", b"RIFF", 36 + size + (size & 1),
+                                b"WAVE", b"fmt ", 16, tag, ch, rate, rate * ch * width,
+                                ch * width, width * 8, b"data", size))
+            f.truncate(HEADER + size + (size & 1))
+        return cls.open(path, "r+")
+
+    def __len__(self):
+        return len(self.raw)
+
+    @property
+    def duration(self):
+        return len(self) / self.info["rate"]
+
+    def trim(self, start_s, end_s):
+        """[start_s, end_s) seconds, zero-copy."""
+        rate = self.info["rate"]
+        return AudioBuffer(self.raw[max(0, round(start_s * rate)):
+                                    max(0, round(end_s * rate))], self.info)
+
+    def reversed(self):
+        """Frames last to first, zero-copy; channels stay in place."""
+        return AudioBuffer(self.raw[::-1], self.info)
+
+    def samples(self, start=0, end=None):
+        """float64 (n, channels) samples of frames [start, end), integer scale."""
+        return decode(np.ascontiguousarray(self.raw[start:end]),
+                      self.info).reshape(-1, self.info["channels"])
+
+    def typed(self, start=0, end=None):
+        """(n, channels) samples of frames [start, end) in their stored
+        type, without conversion; 8- and 24-bit come back centred on 0 as
+        int16 / int32 (as decode() scales them)."""
+        w, raw = self.info["width"], np.ascontiguousarray(self.raw[start:end])
+        if self.info["codec"] == "float":
+            x = raw.view("<f4" if w == 4 else "<f8")
+        elif w == 1:
+            x = raw.view(np.uint8).astype(np.int16) - 128
+        elif w == 3:
+            x = decode(raw, self.info).astype(np.int32)
+        else:
+            x = raw.view("<i2" if w == 2 else "<i4")
+        return x.reshape(-1, self.info["channels"])
+
+    def blocks(self, job=None):
+        """(start, end) frame spans of BLOCK; job is checked and advanced."""
+        n = len(self)
+        for s in range(0, n, BLOCK):
+            yield s, min(s + BLOCK, n)
+            if job is not None:
+                job.check()
+                job.report(min(1.0, (s + BLOCK) / n))
+
+    def gain(self, db, out=None, job=None):
+        """Scale by db decibels into out (same length), or in place."""
+        out = self if out is None else out
+        factor = 10 ** (db / 20)
+        for s, e in self.blocks(job):
+            x = encode(self.samples(s, e).ravel() * factor, self.info)
+            out.raw[s:e] = np.frombuffer(x, np.uint8).reshape(e - s, -1)
+        return out
+
+    def write(self, dst, db=None, job=None):
+        """Save as a WAV through an output memmap, with an optional gain;
+        the file only appears under dst once complete."""
+        tmp = f"{dst}.part{os.getpid()}"
+        try:
+            out = AudioBuffer.create(tmp, self.info, len(self))
+            if db is None:
+                for s, e in self.blocks(job):
+                    out.raw[s:e] = self.raw[s:e]
+            else:
+                self.gain(db, out, job)
+            out.close()
+            os.replace(tmp, dst)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return dst
+
+    def close(self):
+        if isinstance(self.raw, np.memmap):
+            self.raw.flush()
+        self.raw = None
+
+
+def open_buffer(path):
+    """AudioBuffer of any audio file: mapped for PCM / float WAV and
+    spilled decodes, else wrapped around the (cached) pydub decode."""
+    src = wav_source(path)
+    if src is None:
+        seg = load(path)
+        src = wav_source(path)                       # the decode may have spilled
+        if src is None:
+            return AudioBuffer.from_segment(seg)
+    return AudioBuffer.open(src)
+
+
+def stream_trim(src, dst, start_s, end_s, job=None):
+    """Copy [start_s, end_s) seconds; only those pages are read."""
+    return AudioBuffer.open(src).trim(start_s, end_s).write(dst, job=job)
+
+
+def stream_gain(src, dst, db, job=None):
+    return AudioBuffer.open(src).write(dst, db, job)
+
+
+def stream_reverse(src, dst, job=None):
+    return AudioBuffer.open(src).reversed().write(dst, job=job)
+
+
+#  raw WAV bytes <-> float64 samples (integer scale, not normalized)
+def full_scale(info):
+    return 1.0 if info["codec"] == "float" else float(1 << (8 * info["width"] - 1))
+
+
+def decode(raw, info):
+    w = info["width"]
+    if info["codec"] == "float":
+        return np.frombuffer(raw, "<f4" if w == 4 else "<f8").astype(np.float64)
+    if w == 1:                                  # 8-bit WAV is unsigned
+        return np.frombuffer(raw, np.uint8).astype(np.float64) - 128
+    if w == 3:
+        b = np.frombuffer(raw, np.uint8).reshape(-1, 3).astype(np.int32)
+        x = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+        return ((x << 8) >> 8).astype(np.float64)   # sign-extend 24 → 32 bit
+    return np.frombuffer(raw, "<i2" if w == 2 else "<i4").astype(np.float64)
+
+
+def encode(x, info):
+    """Inverse of decode(); integer samples are floored and clipped the way
+    pydub's gain does."""
+    w = info["width"]
+    if info["codec"] == "float":
+        return x.astype("<f4" if w == 4 else "<f8").tobytes()
+    lo, hi = -(1 << (8 * w - 1)), (1 << (8 * w - 1)) - 1
+    x = np.floor(np.clip(x, lo, hi))
+    if w == 1:
+        return (x + 128).astype(np.uint8).tobytes()
+    if w == 3:
+        return x.astype("<i4").view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+    return x.astype("<i2" if w == 2 else "<i4").tobytes()
@@ -0,0 +1,65 @@
+"""
+backends.py — Optional dependencies resolved on first use
+Pillow, OpenCV/NumPy and pydub are imported the first time a feature
+needs them rather than at start-up. Flags such as PIL_OK keep working in
+`if not PIL_OK:` checks; Lazy stand-ins import their module on first
+attribute access or call.
+"""
+
+import importlib
+
+
+class Backend:
+    """A group of modules that is usable only if all of them import."""
+
+    def __init__(self, *modules):
+        self.modules = modules
+        self._ok = None
+
+    def __bool__(self):
+        if self._ok is None:
+            try:
+                for m in self.modules:
+                    importlib.import_module(m)
+                self._ok = True
+            except ImportError:
+                self._ok = False
+        return self._ok
+
+    @property
+    def resolved(self):
+        return self._ok is not None
+
+    def __repr__(self):
+        state = "unresolved" if self._ok is None else self._ok
+        return f"Backend({', '.join(self.modules)}: {state})"
+
+
+class Lazy:
+    """Stand-in for a module, or an attribute of one, imported on first use."""
+
+    def __init__(self, module, attr=None):
+        self._module = module
+        self._attr   = attr
+        self._obj    = None
+
+    def _resolve(self):
+        if self._obj is None:
+            obj = importlib.import_module(self._module)
+            self._obj = getattr(obj, self._attr) if self._attr else obj
+        return self._obj
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self._resolve()(*args, **kwargs)
+
+    def __repr__(self):
+        return f"Lazy({self._module}{'.' + self._attr if self._attr else ''})"
+
+
+PIL_OK   = Backend("PIL.Image", "PIL.ImageTk")
+CV2_OK   = Backend("cv2", "numpy")
+NP_OK    = Backend("numpy")
+AUDIO_OK = Backend("pydub", "pydub.playback")
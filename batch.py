@@ -0,0 +1,157 @@
+"""
+batch.py — Headless batch runner for Image Studio recipes
+Applies a recipe saved from Image Studio (or written by hand) to every
+image in a directory, spread over a process pool.
+
+    python batch.py recipe.json photos/ out/ -j 8 --ext .jpg
+
+Files whose output is newer than both the source and the recipe are
+skipped, so an interrupted run can simply be started again.
+"""
+
+import argparse, multiprocessing, os, sys, time
+
+from PIL import Image
+
+import export
+import image_ops
+import parallel
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".gif", ".tiff", ".tif", ".webp"}
+CHUNK = 8                     # files handed to a worker at a time
+
+_nodes = None                 # recipe of the current worker process
+
+
+def find_images(src, recursive=True, exclude=None):
+    exclude = exclude and os.path.abspath(exclude)
+    for root, dirs, files in os.walk(src):
+        if not recursive:
+            dirs.clear()
+        # an output directory inside src must not be read back as input
+        dirs[:] = sorted(d for d in dirs
+                         if os.path.abspath(os.path.join(root, d)) != exclude)
+        for f in sorted(files):
+            if os.path.splitext(f)[1].lower() in IMAGE_EXTS:
+                yield os.path.join(root, f)
+
+
+def output_path(path, src, dst, ext=None):
+    rel = os.path.relpath(path, src)
+    if ext:
+        rel = os.path.splitext(rel)[0] + ext
+    return os.path.join(dst, rel)
+
+
+def up_to_date(path, out, recipe_mtime):
+    try:
+        t = os.stat(out).st_mtime
+    except OSError:
+        return False
+    return t >= os.stat(path).st_mtime and t >= recipe_mtime
+
+
+def save(img, out, quality=90):
+    # atomic write with the export presets (fast PNG, progressive JPEG …)
+    export.save(img, out, quality=quality)
+
+
+def process(img: Image.Image, nodes) -> Image.Image:
+    if img.mode not in ("RGB", "RGBA", "L"):
+        img = img.convert("RGB")
+    return image_ops.run(img, nodes)
+
+
+# worker side
+def _init(recipe):
+    global _nodes
+    _nodes = image_ops.load_recipe(recipe)
+    # files are already spread over processes; keep each filter in one piece
+    parallel.WORKERS = 1
+
+
+def _work(task):
+    path, out, quality = task
+    t0 = time.perf_counter()
+    try:
+        with Image.open(path) as img:
+            save(process(img, _nodes), out, quality)
+        err = None
+    except Exception as exc:
+        err = f"{type(exc).__name__}: {exc}"
+    return path, os.getpid(), time.perf_counter() - t0, err
+
+
+# ----------------------------------------------------------------------------
+def run(recipe, src, dst, workers=None, ext=None, quality=90, force=False,
+        recursive=True, log=print):
+    """Process a directory; returns {"done", "skipped", "failed", "seconds",
+    "workers": {pid: (files, busy seconds)}}."""
+    image_ops.load_recipe(recipe)               # fail early on a bad recipe
+    recipe_mtime = os.stat(recipe).st_mtime
+    stats = {"done": 0, "skipped": 0, "failed": 0, "workers": {}}
+
+    def tasks():
+        for path in find_images(src, recursive, exclude=dst):
+            out = output_path(path, src, dst, ext)
+            if not force and up_to_date(path, out, recipe_mtime):
+                stats["skipped"] += 1
+                continue
+            yield path, out, quality
+
+    t0 = last = time.perf_counter()
+    with multiprocessing.Pool(workers, initializer=_init, initargs=(recipe,)) as pool:
+        # imap_unordered streams: results arrive as files finish and the
+        # task generator is consumed lazily, so memory stays flat
+        for path, pid, secs, err in pool.imap_unordered(_work, tasks(), CHUNK):
+            n, busy = stats["workers"].get(pid, (0, 0.0))
+            stats["workers"][pid] = (n + 1, busy + secs)
+            if err:
+                stats["failed"] += 1
+                log(f"FAILED {path}: {err}")
+            else:
+                stats["done"] += 1
+            now = time.perf_counter()
+            if now - last >= 1.0:
+                last = now
+                log(f"{stats['done']} done, {stats['failed']} failed, "
+                    f"{stats['skipped']} skipped  "
+                    f"({stats['done'] / (now - t0):.1f} files/s)")
+    stats["seconds"] = time.perf_counter() - t0
+    return stats
+
+
+def report(stats, log=print):
+    wall = stats["seconds"] or 1e-9
+    log(f"{stats['done']} written, {stats['skipped']} up to date, "
+        f"{stats['failed']} failed in {wall:.1f}s "
+        f"({stats['done'] / wall:.1f} files/s)")
+    for pid, (n, busy) in sorted(stats["workers"].items()):
+        log(f"  worker {pid}: {n} files, {n / wall:.1f} files/s, "
+            f"{1000 * busy / n:.0f} ms/file, {100 * busy / wall:.0f}% busy")
+
+
+def main(argv=None):
+    # first paragraph of the module docstring, below its title line
+    intro = __doc__.strip().split("\n\n")[0].split("\n")[1:]
+    ap = argparse.ArgumentParser(description=" ".join(intro))
+    ap.add_argument("recipe", help="recipe .json saved from Image Studio")
+    ap.add_argument("src", help="input directory")
+    ap.add_argument("dst", help="output directory (mirrors src)")
+    ap.add_argument("-j", "--workers", type=int, default=None,
+                    help="worker processes (default: CPU count)")
+    ap.add_argument("--ext", help="output extension, e.g. .jpg (default: keep)")
+    ap.add_argument("--quality", type=int, default=90, help="JPEG/WebP quality")
+    ap.add_argument("--force", action="store_true", help="ignore up-to-date outputs")
+    ap.add_argument("--no-recursive", dest="recursive", action="store_false")
+    args = ap.parse_args(argv)
+    if args.ext and not args.ext.startswith("."):
+        args.ext = "." + args.ext
+    stats = run(args.recipe, args.src, args.dst, args.workers, args.ext,
+                args.quality, args.force, args.recursive)
+    report(stats)
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""
+startup.py — Cold-start budget for the desktop apps
+Launches each app in a fresh interpreter and measures the time from
+process start until the module is imported and until the first window
+has been drawn. Exits non-zero when the median exceeds the budget.
+
+    python benchmarks/startup.py [--runs 5]
+
+The window stage needs a display; without one only imports are timed.
+"""
+
+import argparse, json, os, statistics, subprocess, sys, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# seconds, median of --runs cold starts
+BUDGETS = {
+    "app":       {"import": 0.25, "window": 0.8},
+    "image_app": {"import": 0.40, "window": 1.0},
+}
+APPS = {"app": "MultimediaApp", "image_app": "ImageApp"}
+
+CHILD = """
+import json, os, sys, time
+sys.path.insert(0, {root!r})
+t0 = float(os.environ["STARTUP_T0"])
+import {module}
+out = {{"import": time.time() - t0}}
+try:
+    win = {module}.{cls}()
+    win.update()                       # process the first map / expose
+    out["window"] = time.time() - t0
+    win.destroy()
+except Exception as exc:               # no display
+    out["error"] = str(exc).splitlines()[0]
+print(json.dumps(out))
+"""
+
+
+def measure(module, runs):
+    code = CHILD.format(root=ROOT, module=module, cls=APPS[module])
+    samples = []
+    for _ in range(runs):
+        env = dict(os.environ, STARTUP_T0=repr(time.time()))
+        res = subprocess.run([sys.executable, "-c", code], env=env, cwd=ROOT,
+                             capture_output=True, text=True)
+        if res.returncode:
+            raise RuntimeError(res.stderr.strip().splitlines()[-1])
+        samples.append(json.loads(res.stdout.strip().splitlines()[-1]))
+    result = {}
+    for stage in ("import", "window"):
+        vals = [s[stage] for s in samples if stage in s]
+        if vals:
+            result[stage] = statistics.median(vals)
+    if "window" not in result:
+        result["skipped"] = samples[0].get("error", "no window")
+    return result
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Cold-start time budget")
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--json", action="store_true", help="print results as JSON")
+    args = ap.parse_args(argv)
+    results, over = {}, []
+    for module in APPS:
+        res = results[module] = measure(module, args.runs)
+        for stage, budget in BUDGETS[module].items():
+            if stage in res and res[stage] > budget:
+                over.append(f"{module} {stage} {res[stage]:.3f}s > {budget:.3f}s")
+    if args.json:
+        print(json.dumps(results, indent=1))
+    else:
+        for module, res in results.items():
+            line = f"{module:10s} import {res['import'] * 1000:6.0f} ms"
+            if "window" in res:
+                line += f"   first window {res['window'] * 1000:6.0f} ms"
+            else:
+                line += f"   (window skipped: {res['skipped']})"
+            print(line)
+    for msg in over:
+        print("OVER BUDGET:", msg)
+    return 1 if over else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
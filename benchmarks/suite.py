@@ -0,0 +1,373 @@
+"""
+suite.py — Benchmarks for the image, audio, video and text operations
+Drives the same code the apps call (image_ops, analysis, media_ops,
+audio_io, waveform, spectrogram) on synthetic inputs, or on the files in
+datasets/ for the smoke tier, and records wall time, throughput and peak
+RSS per operation.
+
+    python benchmarks/suite.py --tier smoke
+    python benchmarks/suite.py --tier medium --save-baseline base.json
+    python benchmarks/suite.py --tier medium --baseline base.json
+
+With --baseline, cases slower (or hungrier) than the stored run by more
+than the tolerance are flagged and the exit status is 1.
+"""
+
+import argparse, json, math, os, platform, random, shutil, statistics
+import sys, tempfile, time, wave
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from backends import Lazy, PIL_OK, CV2_OK, NP_OK, AUDIO_OK
+
+Image     = Lazy("PIL.Image")
+image_ops = Lazy("image_ops")
+analysis  = Lazy("analysis")
+histogram = Lazy("histogram")
+media_ops = Lazy("media_ops")
+audio_io  = Lazy("audio_io")
+waveform  = Lazy("waveform")
+spectrogram = Lazy("spectrogram")
+cv2       = Lazy("cv2")
+np        = Lazy("numpy")
+
+# inputs per tier: datasets/ files for smoke, otherwise synthetic sizes
+TIERS = {
+    "smoke":  {"image": "datasets/sample_image.jpg", "audio": "datasets/sample_audio.wav",
+               "video": "datasets/sample_video.mp4", "text": "README.md"},
+    "small":  {"image": 1_000_000,   "audio": 10,   "video": (640, 360, 60),
+               "text": 1 << 20},
+    "medium": {"image": 12_000_000,  "audio": 600,  "video": (1920, 1080, 120),
+               "text": 32 << 20},
+    "large":  {"image": 100_000_000, "audio": 3600, "video": (3840, 2160, 120),
+               "text": 256 << 20},
+}
+
+# arguments for ops whose defaults do not make a meaningful run
+IMAGE_ARGS = {
+    "turn":       lambda w, h: (90,),
+    "rotate":     lambda w, h: (15.0,),
+    "enhance":    lambda w, h: ("contrast", 1.3),
+    "kernel":     lambda w, h: ("sharpen",),
+    "resize":     lambda w, h: (w // 2, h // 2),
+    "crop":       lambda w, h: ((w // 4, h // 4, 3 * w // 4, 3 * h // 4),),
+    "fit":        lambda w, h: (1024, 1024),
+    "border":     lambda w, h: (20,),
+    "text":       lambda w, h: ("Benchmark", 20, 20, 48, "#ffffff"),
+    "grid":       lambda w, h: (3, 3),
+    "channel":    lambda w, h: (0,),
+}
+
+TOLERANCE     = 0.20          # slower than baseline by more than this → flagged
+MEM_TOLERANCE = 0.25
+NOISE_S       = 0.005         # ignore differences below this many seconds
+NOISE_MB      = 16
+
+
+# ----------------------------------------------------------------------------
+#  peak RSS: VmHWM can be reset per case on Linux; elsewhere the process peak
+def _status_kb(field):
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak():
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def rss_mb():
+    kb = _status_kb("VmRSS")
+    return kb / 1024 if kb is not None else None
+
+
+def peak_rss_mb():
+    kb = _status_kb("VmHWM")
+    if kb is not None:
+        return kb / 1024
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        return None
+
+
+# ----------------------------------------------------------------------------
+#  synthetic inputs
+def make_image(pixels):
+    w = int(math.sqrt(pixels * 1.5)); h = max(1, pixels // w)
+    grad = Image.linear_gradient("L").resize((w, h))
+    noise = Image.effect_noise((w, h), 40)
+    img = Image.merge("RGB", [grad, noise, grad.transpose(Image.Transpose.FLIP_LEFT_RIGHT)])
+    return img
+
+
+def make_wav(seconds, tmp, rate=44100):
+    path = os.path.join(tmp, f"tone_{seconds}s.wav")
+    one = bytearray()
+    for i in range(rate):
+        v = int(12000 * math.sin(2 * math.pi * 440 * i / rate))
+        one += v.to_bytes(2, "little", signed=True) * 2
+    with wave.open(path, "wb") as w:
+        w.setnchannels(2); w.setsampwidth(2); w.setframerate(rate)
+        for _ in range(int(seconds)):
+            w.writeframes(one)
+    return path
+
+
+def make_video(spec, tmp):
+    w, h, frames = spec
+    path = os.path.join(tmp, f"clip_{w}x{h}.mp4")
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 30, (w, h))
+    base = np.tile(np.linspace(0, 255, w, dtype=np.uint8), (h, 1))
+    for i in range(frames):
+        f = np.roll(base, i * 4, axis=1)
+        out.write(np.dstack([f, f[::-1], np.full_like(f, i % 256)]))
+    out.release()
+    return path
+
+
+def make_text(nbytes, tmp):
+    path = os.path.join(tmp, f"text_{nbytes}.txt")
+    rnd = random.Random(0)
+    words = ["media", "frame", "pixel", "sample", "codec", "audio", "video",
+             "Image", "Kernel", "stream", "buffer", "", "tile", "Bitrate"]
+    with open(path, "w") as f:
+        written = 0
+        while written < nbytes:
+            line = " ".join(rnd.choice(words) for _ in range(rnd.randint(0, 12))) + "\n"
+            f.write(line); written += len(line)
+    return path
+
+
+# ----------------------------------------------------------------------------
+#  cases: (id, unit, amount, fn) where fn() runs one repetition
+def image_cases(spec, tmp):
+    if not PIL_OK:
+        return "Pillow not installed"
+    if isinstance(spec, str):
+        img = Image.open(os.path.join(ROOT, spec)).convert("RGB")
+    else:
+        img = make_image(spec)
+    w, h = img.size
+    mp = w * h / 1e6
+    cases = []
+    for name in image_ops.OPS:
+        args = IMAGE_ARGS.get(name, lambda w, h: ())(w, h)
+        cases.append((f"image.{name}", "MPix", mp,
+                      lambda name=name, args=args: image_ops.apply_op(img, name, args)))
+    cases.append(("image.recipe", "MPix", mp, lambda: image_ops.run(
+        img, [("grayscale", ()), ("fit", (1024, 1024)), ("kernel", ("sharpen",))])))
+    cases.append(("image.histogram", "MPix", mp, lambda: histogram.channels(img)))
+    if NP_OK:
+        cases.append(("image.palette", "MPix", mp,
+                      lambda: analysis.palette(analysis.PixelBuffer(img))))
+    return cases
+
+
+def audio_cases(spec, tmp):
+    path = os.path.join(ROOT, spec) if isinstance(spec, str) else make_wav(spec, tmp)
+    secs = audio_io.probe(path)["duration"]
+    out = os.path.join(tmp, "out.wav")
+    cases = [("audio.probe", "s audio", secs, lambda: audio_io.probe(path))]
+    if AUDIO_OK:
+        seg = media_ops.load_audio(path)
+        cases += [
+            ("audio.load",    "s audio", secs, lambda: media_ops.load_audio(path)),
+            ("audio.trim",    "s audio", secs, lambda: media_ops.audio_trim(seg, secs / 4, 3 * secs / 4)),
+            ("audio.gain",    "s audio", secs, lambda: media_ops.audio_gain(seg, 6.0)),
+            ("audio.reverse", "s audio", secs, lambda: media_ops.audio_reverse(seg)),
+            ("audio.export",  "s audio", secs, lambda: media_ops.audio_export(seg, out, "wav")),
+        ]
+    if NP_OK and audio_io.streamable(path):
+        # the WAV paths the apps take without pydub
+        buf = audio_io.AudioBuffer.open(path)
+        peaks = waveform.build(buf)
+        n, width = len(buf), 800
+
+        def waveform_zoom():
+            # whole file down to one frame per pixel, as wheel zooms do
+            span = n
+            while span >= width:
+                peaks.columns(max(0, n // 2 - span // 2), n // 2 + span // 2, width, buf)
+                span //= 4
+
+        def spectrogram_overview():
+            spectrogram.CACHE.clear()
+            hop = spectrogram.hop_for(n, width)
+            for t in range((n - 1) // hop // spectrogram.TILE + 1):
+                spectrogram.cached_tile(path, buf, hop, t)
+
+        cases += [
+            ("audio.stream_trim",    "s audio", secs,
+             lambda: audio_io.stream_trim(path, out, secs / 4, 3 * secs / 4)),
+            ("audio.stream_gain",    "s audio", secs, lambda: audio_io.stream_gain(path, out, 6.0)),
+            ("audio.stream_reverse", "s audio", secs, lambda: audio_io.stream_reverse(path, out)),
+            ("audio.buffer_export",  "s audio", secs, lambda: buf.write(out)),
+            ("audio.peaks",          "s audio", secs, lambda: waveform.build(buf)),
+            ("audio.waveform_zoom",  "s audio", secs, waveform_zoom),
+            ("audio.spectrogram",    "s audio", secs, spectrogram_overview),
+        ]
+    return cases
+
+
+def video_cases(spec, tmp):
+    if not CV2_OK:
+        return "opencv-python not installed"
+    path = os.path.join(ROOT, spec) if isinstance(spec, str) else make_video(spec, tmp)
+    cap = cv2.VideoCapture(path)
+    n = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)); cap.release()
+    frames = os.path.join(tmp, "frames")
+
+    def extract():
+        shutil.rmtree(frames, ignore_errors=True); os.makedirs(frames)
+        return media_ops.extract_frames(path, frames)
+
+    def first_histogram():
+        cap = cv2.VideoCapture(path)
+        ok, frame = cap.read(); cap.release()
+        return histogram.from_array(frame)
+
+    return [("video.extract_all", "frames", n, extract),
+            ("video.histogram",   "frames", 1, first_histogram)]
+
+
+def text_cases(spec, tmp):
+    path = os.path.join(ROOT, spec) if isinstance(spec, str) else make_text(spec, tmp)
+    with open(path, errors="replace") as f:
+        text = f.read()
+    mb = len(text.encode("utf-8", "replace")) / 1e6
+    cases = [("text.stats", "MB", mb, lambda: media_ops.text_stats(text)),
+             ("text.char_freq", "MB", mb, lambda: media_ops.char_freq(text)),
+             ("text.find_replace", "MB", mb,
+              lambda: media_ops.find_replace(text, "pixel", "sample"))]
+    for op in media_ops.TEXT_TRANSFORMS:
+        cases.append((f"text.{op}", "MB", mb,
+                      lambda op=op: media_ops.text_transform(text, op)))
+    return cases
+
+
+GROUPS = {"image": image_cases, "audio": audio_cases,
+          "video": video_cases, "text": text_cases}
+
+
+# ----------------------------------------------------------------------------
+def measure(fn, reps):
+    times = []
+    exact_peak = reset_peak()
+    base = rss_mb()
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - t0)
+        del out
+    peak = peak_rss_mb()
+    res = {"seconds": statistics.median(times), "min_seconds": min(times)}
+    if peak is not None:
+        res["peak_rss_mb"] = round(peak, 1)
+        if exact_peak and base is not None:
+            res["extra_rss_mb"] = round(peak - base, 1)
+    return res
+
+
+def run(tier, groups, reps, only=None, log=print):
+    results, skipped = {}, {}
+    tmp = tempfile.mkdtemp(prefix="mm_bench_")
+    try:
+        for group in groups:
+            cases = GROUPS[group](TIERS[tier][group], tmp)
+            if isinstance(cases, str):
+                skipped[group] = cases
+                log(f"{group}: skipped ({cases})")
+                continue
+            for cid, unit, amount, fn in cases:
+                if only and only not in cid:
+                    continue
+                try:
+                    res = measure(fn, reps)
+                except Exception as exc:
+                    skipped[cid] = f"{type(exc).__name__}: {exc}"
+                    log(f"{cid:24s} failed: {skipped[cid]}")
+                    continue
+                res["throughput"] = round(amount / res["seconds"], 3) if res["seconds"] else None
+                res["unit"] = f"{unit}/s"
+                results[cid] = res
+                log(f"{cid:24s} {res['seconds'] * 1000:9.1f} ms  "
+                    f"{res['throughput'] or 0:10.2f} {res['unit']:11s} "
+                    f"peak {res.get('peak_rss_mb', 0):7.0f} MB")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return {"meta": {"tier": tier, "reps": reps, "python": platform.python_version(),
+                     "platform": platform.platform(), "cpus": os.cpu_count(),
+                     "time": time.strftime("%Y-%m-%d %H:%M:%S")},
+            "cases": results, "skipped": skipped}
+
+
+def compare(current, baseline, tol=TOLERANCE, mem_tol=MEM_TOLERANCE):
+    """Return [(case, message)] for cases slower or bigger than the baseline."""
+    flagged = []
+    for cid, cur in current["cases"].items():
+        base = baseline.get("cases", {}).get(cid)
+        if base is None:
+            continue
+        s0, s1 = base["seconds"], cur["seconds"]
+        if s1 > s0 * (1 + tol) and s1 - s0 > NOISE_S:
+            flagged.append((cid, f"time {s0 * 1000:.1f} → {s1 * 1000:.1f} ms "
+                                 f"(+{(s1 / s0 - 1) * 100:.0f}%)"))
+        m0, m1 = base.get("extra_rss_mb"), cur.get("extra_rss_mb")
+        if m0 is not None and m1 is not None and m1 > m0 * (1 + mem_tol) + NOISE_MB:
+            flagged.append((cid, f"memory {m0:.0f} → {m1:.0f} MB"))
+    return flagged
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Operation benchmarks")
+    ap.add_argument("--tier", choices=TIERS, default="smoke")
+    ap.add_argument("--groups", default=",".join(GROUPS),
+                    help="comma-separated subset of " + ", ".join(GROUPS))
+    ap.add_argument("--only", help="run cases whose id contains this text")
+    ap.add_argument("--reps", type=int, default=None,
+                    help="repetitions per case (default 3, 1 for the large tier)")
+    ap.add_argument("--out", help="write results JSON here")
+    ap.add_argument("--save-baseline", help="write results as a baseline JSON")
+    ap.add_argument("--baseline", help="compare against this baseline JSON")
+    ap.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = ap.parse_args(argv)
+    groups = [g for g in args.groups.split(",") if g]
+    for g in groups:
+        if g not in GROUPS:
+            ap.error(f"unknown group {g}")
+    reps = args.reps or (1 if args.tier == "large" else 3)
+    res = run(args.tier, groups, reps, args.only)
+    for path in (args.out, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(res, f, indent=1)
+    if args.baseline:
+        with open(args.baseline) as f:
+            base = json.load(f)
+        if base.get("meta", {}).get("tier") != args.tier:
+            print(f"warning: baseline tier is {base.get('meta', {}).get('tier')}")
+        flagged = compare(res, base, args.tolerance)
+        for cid, msg in flagged:
+            print(f"REGRESSION {cid}: {msg}")
+        if flagged:
+            return 1
+        print("no regressions against", args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
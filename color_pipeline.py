@@ -0,0 +1,146 @@
+"""
+color_pipeline.py — Fused per-pixel color operations
+Pointwise ops are described as 256-entry lookup tables or a grayscale mix
+and composed symbolically, so a chain such as grayscale → sepia → contrast
+touches the pixels once instead of once per op. Every table is derived
+from Pillow's own arithmetic, so results match the unfused ops exactly.
+"""
+
+from PIL import Image
+
+IDENTITY = list(range(256))
+RAMP = None                                 # 256×1 "L" image, 0 … 255
+
+
+def _ramp():
+    global RAMP
+    if RAMP is None:
+        RAMP = Image.frombytes("L", (256, 1), bytes(IDENTITY))
+    return RAMP
+
+
+def _compose(first, then):
+    return [then[v] for v in first]
+
+
+def blend_table(base, factor):
+    """Table for Image.blend(flat base, x, factor), as ImageEnhance does it."""
+    flat = Image.new("L", (256, 1), base)
+    return list(Image.blend(flat, _ramp(), factor).getdata())
+
+
+def luma_table(tables):
+    """Luminance of (r[i], g[i], b[i]) using Pillow's RGB → L conversion."""
+    rgb = Image.merge("RGB", [Image.frombytes("L", (256, 1), bytes(t))
+                              for t in tables])
+    return list(rgb.convert("L").getdata())
+
+
+# ----------------------------------------------------------------------------
+#  steps: ("lut", (r, g, b), alpha, keep_alpha) | ("gray",) | ("contrast", f)
+def lut(r, g=None, b=None, alpha=None, keep_alpha=False):
+    return ("lut", (r, g or r, b or r), alpha, keep_alpha)
+
+GRAY = ("gray",)
+
+
+class ColorPipeline:
+    """Accumulates steps; apply() runs them with as few pixel passes as possible."""
+
+    def __init__(self, steps=()):
+        self.steps = list(steps)
+
+    def then(self, steps):
+        self.steps.extend(steps)
+        return self
+
+    def apply(self, img: Image.Image) -> Image.Image:
+        st = _State(img)
+        for step in self.steps:
+            kind = step[0]
+            if kind == "lut":
+                st.lut(*step[1:])
+            elif kind == "gray":
+                st.gray()
+            elif kind == "contrast":
+                st.contrast(step[1])
+        return st.result()
+
+
+class _State:
+    """Folded form of the steps so far:  out = post(L(pre(img))) when gray,
+    otherwise out = pre(img); alpha is a table, or None once dropped."""
+
+    def __init__(self, img):
+        self.img   = img
+        self.pre   = [IDENTITY] * 3
+        self.gray_ = False
+        self.post  = None
+        self.alpha = IDENTITY if img.mode == "RGBA" else None
+        self._L    = None                  # cached L(pre(img)) for stats
+
+    def lut(self, tables, alpha, keep_alpha):
+        if self.gray_:
+            self.post = [_compose(p, t) for p, t in zip(self.post, tables)]
+        else:
+            self.pre = [_compose(p, t) for p, t in zip(self.pre, tables)]
+        if self.alpha is not None:
+            self.alpha = _compose(self.alpha, alpha) if keep_alpha else None
+
+    def gray(self):
+        if self.gray_:
+            l = luma_table(self.post)
+            self.post = [l] * 3
+        else:
+            self.gray_, self.post = True, [IDENTITY] * 3
+        self.alpha = None
+
+    def contrast(self, factor):
+        # ImageEnhance.Contrast: blend towards the rounded mean luminance
+        if self.gray_:
+            hist = self._luma().histogram()
+            l = luma_table(self.post)
+        else:
+            self._flush()
+            hist = self.img.convert("L").histogram()
+            l = IDENTITY
+        n = sum(hist) or 1
+        mean = int(sum(h * l[g] for g, h in enumerate(hist)) / n + 0.5)
+        t = blend_table(mean, factor)
+        self.lut((t, t, t), IDENTITY, True)
+
+    def _luma(self):
+        if self._L is None:
+            src = self.img
+            if self.pre != [IDENTITY] * 3:
+                src = _point_rgb(src, self.pre, None)
+            self._L = src.convert("L")
+        return self._L
+
+    def _flush(self):
+        self.img = self.result()
+        self.pre, self.gray_, self.post = [IDENTITY] * 3, False, None
+        self.alpha = IDENTITY if self.img.mode == "RGBA" else None
+        self._L = None
+
+    def result(self) -> Image.Image:
+        if not self.gray_:
+            return _point_rgb(self.img, self.pre, self.alpha)
+        L = self._luma()
+        if self.post[0] == self.post[1] == self.post[2]:
+            if self.post[0] != IDENTITY:
+                L = L.point(self.post[0])
+            return L.convert("RGB")
+        # per-band table lookups on the 8-bit L plane are cheaper than a
+        # NumPy gather over the full RGB output
+        return Image.merge("RGB", [L.point(t) for t in self.post])
+
+
+def _point_rgb(img, tables, alpha):
+    if img.mode == "RGBA" and alpha is not None:
+        return img.point(tables[0] + tables[1] + tables[2] + alpha)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    if tables == [IDENTITY] * 3:
+        return img
+    return img.point(tables[0] + tables[1] + tables[2])
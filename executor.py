@@ -0,0 +1,216 @@
+"""
+executor.py — Background operation runner for the Tk apps
+Work runs on a thread pool; results are handed back to the Tk main loop
+through a queue polled with after(), so widgets are only ever touched from
+the UI thread.
+"""
+
+import os, queue, threading, time
+from concurrent.futures import ThreadPoolExecutor
+
+import tracing
+
+POLL_MS = 30
+
+
+class Cancelled(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, label, fn, on_done, on_error):
+        self.label    = label
+        self.fn       = fn
+        self.on_done  = on_done
+        self.on_error = on_error
+        self.progress = None               # 0..1 when the work reports it
+        self.elapsed  = None               # seconds spent in fn, once run
+        self._cancel  = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+
+    # called from the worker
+    def report(self, fraction):
+        self.progress = fraction
+
+    def check(self):
+        if self._cancel.is_set():
+            raise Cancelled()
+
+
+class OpExecutor:
+    """Runs fn(job) on a worker pool and calls on_done(result) on the Tk thread."""
+
+    def __init__(self, root, on_status=None, workers=None):
+        self._root      = root
+        self._on_status = on_status or (lambda ex: None)
+        self._pool      = ThreadPoolExecutor(
+            max_workers=workers or min(4, os.cpu_count() or 1),
+            thread_name_prefix="op")
+        self._results   = queue.Queue()
+        self._active: list[Job] = []
+        self._polling   = False
+
+    @property
+    def busy(self):
+        return any(not j.cancelled for j in self._active)
+
+    @property
+    def current(self):
+        live = [j for j in self._active if not j.cancelled]
+        return live[0] if live else None
+
+    def submit(self, label, fn, on_done, on_error=None) -> Job:
+        job = Job(label, fn, on_done, on_error)
+        self._active.append(job)
+        self._pool.submit(self._run, job)
+        if not self._polling:
+            self._polling = True
+            self._root.after(POLL_MS, self._poll)
+        self._on_status(self)
+        return job
+
+    def cancel_all(self):
+        for j in self._active:
+            j.cancel()
+        self._on_status(self)
+
+    def shutdown(self):
+        self.cancel_all()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job):
+        t0 = time.perf_counter()
+        try:
+            job.check()
+            with tracing.span(job.label, cat="job"):
+                result = tracing.call(job.fn, job)
+            job.elapsed = time.perf_counter() - t0
+            self._results.put((job, result, None))
+        except Exception as exc:
+            job.elapsed = time.perf_counter() - t0
+            self._results.put((job, None, exc))
+
+    def _poll(self):
+        while True:
+            try:
+                job, result, exc = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if job in self._active:
+                self._active.remove(job)
+            if job.cancelled or isinstance(exc, Cancelled):
+                continue
+            if exc is not None:
+                if job.on_error: job.on_error(exc)
+            else:
+                job.on_done(result)
+        self._on_status(self)
+        if self._active:
+            self._root.after(POLL_MS, self._poll)
+        else:
+            self._polling = False
+
+
+class SerialQueue:
+    """Applies (name, args) nodes in order on an OpExecutor.
+
+    Nodes queued while a job runs are handed to the next job together, so
+    work() can fold them into fewer passes. Repeated clicks are merged with
+    coalesce(prev, new) -> list of nodes or None; a merge with the last
+    running node cancels that job and restarts it from the same base.
+    run() queues other work that must finish before the next nodes, such
+    as re-rendering an undo step: their base() is what it produced."""
+
+    def __init__(self, executor, base, work, on_result, on_error=None,
+                 coalesce=None, describe=str):
+        self._ex        = executor
+        self._base      = base             # () -> input for the next job
+        self._work      = work             # (input, nodes, job) -> output
+        self._on_result = on_result        # (nodes, output), Tk thread
+        self._on_error  = on_error
+        self._coalesce  = coalesce or (lambda a, b: None)
+        self._describe  = describe
+        self._pending: list[tuple] = []
+        self._task      = None             # (label, fn, on_done) to run first
+        self._running   = None             # (job, nodes); nodes empty for a task
+        self.last_job   = None             # the job whose result was last delivered
+
+    @property
+    def busy(self):
+        return self._running is not None or self._task is not None or bool(self._pending)
+
+    def submit(self, name, args=()):
+        node = (name, tuple(args))
+        if self._pending:
+            merged = self._coalesce(self._pending[-1], node)
+            if merged is not None:
+                self._pending[-1:] = merged
+                return
+        elif self._running is not None and self._running[1]:
+            job, nodes = self._running
+            merged = self._coalesce(nodes[-1], node)
+            if merged is not None:
+                job.cancel()
+                self._running = None
+                self._pending = nodes[:-1] + list(merged)
+                self._next()
+                return
+        self._pending.append(node)
+        self._next()
+
+    def run(self, label, fn, on_done):
+        """Run fn(job) on the executor ahead of nodes submitted after it;
+        on_done(result) is called on the Tk thread before they start."""
+        self._task = (label, fn, on_done)
+        self._next()
+
+    def cancel(self):
+        """Drop pending nodes and cancel this queue's running job; other
+        work on the shared executor (saves, loads, exports) carries on."""
+        self._pending.clear()
+        self._task = None
+        if self._running is not None:
+            self._running[0].cancel()
+            self._running = None
+
+    def _next(self):
+        if self._running is not None:
+            return
+        if self._task is not None:
+            (label, fn, on_done), self._task = self._task, None
+            job = self._ex.submit(label, fn, lambda out: self._task_done(on_done, out),
+                                  self._failed)
+            self._running = (job, [])
+            return
+        if not self._pending:
+            return
+        nodes, self._pending = self._pending, []
+        src = self._base()
+        job = self._ex.submit(
+            " → ".join(self._describe(n) for n in nodes),
+            lambda j: self._work(src, nodes, j),
+            lambda out: self._done(nodes, out),
+            self._failed)
+        self._running = (job, nodes)
+
+    def _done(self, nodes, out):
+        self.last_job, self._running = self._running[0], None
+        self._on_result(nodes, out)
+        self._next()
+
+    def _task_done(self, on_done, out):
+        self._running = None
+        on_done(out)
+        self._next()
+
+    def _failed(self, exc):
+        self._running = None
+        self._pending.clear()
+        if self._on_error:
+            self._on_error(exc)
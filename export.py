@@ -0,0 +1,161 @@
+"""
+export.py — Background image export with encoder presets
+save() writes one file: the format comes from the extension, encoder
+options from a preset, alpha is kept wherever the format can store it,
+and the data goes to a temporary file that is renamed into place only
+once complete. export_all() writes several formats and sizes of one
+image in parallel; Pillow's encoders and resampling release the GIL, so
+threads keep every core busy without copying the image to other processes.
+"""
+
+import os, threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from PIL import Image
+
+import loader
+import tracing
+from executor import Cancelled
+
+FORMATS = {
+    ".png": "PNG", ".jpg": "JPEG", ".jpeg": "JPEG", ".webp": "WEBP",
+    ".tif": "TIFF", ".tiff": "TIFF", ".bmp": "BMP", ".gif": "GIF", ".ico": "ICO",
+}
+EXTENSIONS = {"PNG": ".png", "JPEG": ".jpg", "WEBP": ".webp", "TIFF": ".tif",
+              "BMP": ".bmp", "GIF": ".gif"}
+
+# name: (format, save options)
+PRESETS = {
+    "png-fast":         ("PNG",  {"compress_level": 1}),
+    "png-small":        ("PNG",  {"compress_level": 9}),
+    "jpeg-progressive": ("JPEG", {"quality": 90, "progressive": True, "optimize": True}),
+    "jpeg-optimized":   ("JPEG", {"quality": 90, "optimize": True}),
+    "jpeg-fast":        ("JPEG", {"quality": 90}),
+    "webp-fast":        ("WEBP", {"quality": 85, "method": 0}),
+    "webp":             ("WEBP", {"quality": 85, "method": 4}),
+    "webp-lossless":    ("WEBP", {"lossless": True, "method": 4}),
+    "tiff-lzw":         ("TIFF", {"compression": "tiff_lzw"}),
+    "tiff-deflate":     ("TIFF", {"compression": "tiff_adobe_deflate"}),
+    "bmp":              ("BMP",  {}),
+    "gif":              ("GIF",  {}),
+}
+DEFAULTS = {"PNG": "png-fast", "JPEG": "jpeg-progressive", "WEBP": "webp",
+            "TIFF": "tiff-deflate", "BMP": "bmp", "GIF": "gif"}
+
+# modes written as they are; others are converted by prepare()
+MODES = {
+    "PNG":  {"1", "L", "LA", "P", "RGB", "RGBA", "I", "I;16"},
+    "JPEG": {"L", "RGB", "CMYK"},
+    "WEBP": {"RGB", "RGBA"},
+    "TIFF": {"1", "L", "LA", "P", "RGB", "RGBA", "CMYK", "I", "I;16", "F"},
+    "BMP":  {"1", "L", "P", "RGB", "RGBA"},
+}
+
+FILE_TYPES = [("PNG", "*.png"), ("JPEG", "*.jpg *.jpeg"), ("WebP", "*.webp"),
+              ("TIFF", "*.tif *.tiff"), ("BMP", "*.bmp"), ("All", "*.*")]
+
+
+def format_for(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in FORMATS:
+        raise ValueError(f"Unknown image format: {ext or path!r}")
+    return FORMATS[ext]
+
+
+def options(fmt, preset=None, quality=None):
+    name = preset or DEFAULTS.get(fmt)
+    pfmt, opts = PRESETS[name] if name else (fmt, {})
+    if pfmt != fmt:
+        raise ValueError(f"Preset {name} writes {pfmt}, not {fmt}")
+    opts = dict(opts)
+    if quality is not None and fmt in ("JPEG", "WEBP") and not opts.get("lossless"):
+        opts["quality"] = quality
+    return opts
+
+
+def prepare(img: Image.Image, fmt) -> Image.Image:
+    """Convert to a mode the format can store, keeping alpha if it can."""
+    modes = MODES.get(fmt)
+    if modes is None or img.mode in modes:
+        return img
+    alpha = "A" in img.getbands() or "transparency" in img.info
+    if alpha and "RGBA" in modes:
+        return img.convert("RGBA")
+    if alpha:
+        # no alpha channel (JPEG): flatten onto white rather than black
+        rgba = img.convert("RGBA")
+        flat = Image.new("RGB", img.size, (255, 255, 255))
+        flat.paste(rgba, mask=rgba.getchannel("A"))
+        return flat
+    return img.convert("L" if img.mode in ("1", "I", "I;16", "F") else "RGB")
+
+
+def resize(img: Image.Image, size=None) -> Image.Image:
+    """Fit within size × size px (never enlarges); None keeps the original."""
+    return img if size is None else loader.display(img, (size, size))
+
+
+def save(img: Image.Image, out, preset=None, quality=None, size=None):
+    """Encode img to out atomically; returns the file size in bytes."""
+    fmt = format_for(out)
+    opts = options(fmt, preset, quality)
+    img = prepare(resize(img, size), fmt)
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    # a crash or cancel mid-write must not leave a partial file under out
+    tmp = f"{out}.part{os.getpid()}-{threading.get_ident()}"
+    with tracing.span("encode", path=os.path.basename(out), preset=preset or fmt) as sp:
+        try:
+            img.save(tmp, format=fmt, **opts)
+            os.replace(tmp, out)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        nbytes = os.path.getsize(out)
+        sp.add(bytes=nbytes)
+    return nbytes
+
+
+# ----------------------------------------------------------------------------
+def targets(base, presets, sizes=(None,)):
+    """(path, preset, size) for every preset × size: base.png, base_1024.jpg …"""
+    out, seen = [], set()
+    for size in sizes:
+        for preset in presets:
+            fmt = PRESETS[preset][0]
+            stem = base if size is None else f"{base}_{size}"
+            path = stem + EXTENSIONS[fmt]
+            if path in seen:                     # two presets of one format
+                path = f"{stem}_{preset}{EXTENSIONS[fmt]}"
+            seen.add(path)
+            out.append((path, preset, size))
+    return out
+
+
+def export_all(img: Image.Image, targets, workers=None, job=None):
+    """Write every (path, preset, size) target in parallel.
+
+    Each size is resampled once and shared by its formats. Returns
+    {path: bytes written, or the exception that target raised}."""
+    sizes = list(dict.fromkeys(size for _, _, size in targets))
+    workers = max(1, min(workers or os.cpu_count() or 1, len(targets)))
+    results = {}
+    with ThreadPoolExecutor(workers, thread_name_prefix="export") as pool:
+        scaled = dict(zip(sizes, pool.map(lambda s: resize(img, s), sizes)))
+        futures = {pool.submit(save, scaled[size], path, preset): path
+                   for path, preset, size in targets}
+        try:
+            for i, fut in enumerate(as_completed(futures), 1):
+                try:
+                    results[futures[fut]] = fut.result()
+                except Exception as exc:
+                    results[futures[fut]] = exc
+                if job is not None:
+                    job.report(i / len(futures))
+                    job.check()
+        except Cancelled:
+            # started encodes finish (and are complete files); the rest never run
+            for fut in futures:
+                fut.cancel()
+            raise
+    return results
@@ -0,0 +1,281 @@
+"""
+gallery.py — Folder browser with a persistent thumbnail cache
+Gallery lists a directory as a grid of thumbnails. Only the rows in view
+(plus one row either side) have canvas items; thumbnails for them are
+made on a worker pool with JPEG draft decoding and stored on disk under
+the file's content hash, so a second visit just reads small JPEGs.
+
+Content hashes are remembered per (path, mtime, size) in an index next to
+the thumbnails, so unchanged files are not re-read to find their hash.
+Set MM_THUMB_CACHE to move the cache (default ~/.cache/multimedia-course).
+"""
+
+import hashlib, json, os, threading
+import tkinter as tk
+from tkinter import ttk
+from collections import OrderedDict
+
+from PIL import Image, ImageOps, ImageTk
+
+from executor import OpExecutor
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".gif", ".tiff", ".tif", ".webp"}
+THUMB      = 160              # px, longest side
+HASH_BLOCK = 1 << 20          # bytes read per hash update
+KEEP_PHOTOS = 600             # Tk images kept for cells scrolled out of view
+
+
+def cache_dir():
+    base = os.environ.get("MM_THUMB_CACHE") or os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+        "multimedia-course")
+    return os.path.join(base, "thumbs")
+
+
+def scan(folder):
+    """[(path, stat)] of the images directly in folder, by name."""
+    out = []
+    with os.scandir(folder) as it:
+        for e in it:
+            if os.path.splitext(e.name)[1].lower() in IMAGE_EXTS and e.is_file():
+                out.append((e.path, e.stat()))
+    out.sort(key=lambda f: os.path.basename(f[0]).lower())
+    return out
+
+
+def content_hash(path, size):
+    """BLAKE2 of the whole file. Edits to uncompressed TIFF / BMP files can
+    keep the size and both ends, so nothing less is safe; the index only
+    calls this when a file's (mtime, size) is new."""
+    h = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(path, "rb") as f:
+        while block := f.read(HASH_BLOCK):
+            h.update(block)
+    return h.hexdigest()
+
+
+def make_thumb(path, size=THUMB) -> Image.Image:
+    with Image.open(path) as im:
+        if im.format == "JPEG":
+            im.draft("RGB", (size, size))        # decode at 1/2 … 1/8 scale
+        im = ImageOps.exif_transpose(im)
+        im.thumbnail((size, size), Image.LANCZOS, reducing_gap=2.0)
+        if "A" in im.getbands() or "transparency" in im.info:
+            rgba = im.convert("RGBA")
+            im = Image.new("RGB", rgba.size, (40, 40, 40))
+            im.paste(rgba, mask=rgba.getchannel("A"))
+        return im.convert("RGB")
+
+
+class ThumbCache:
+    """Thumbnails on disk as <dir>/<hash[:2]>/<hash>_<size>.jpg."""
+
+    def __init__(self, root=None):
+        self.root   = root or cache_dir()
+        self._index = {}                     # path -> [mtime_ns, size, hash]
+        self._dirty = False
+        self._lock  = threading.Lock()
+        try:
+            with open(os.path.join(self.root, "index.json")) as f:
+                self._index = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def hash_for(self, path, st):
+        with self._lock:
+            known = self._index.get(path)
+        if known and known[0] == st.st_mtime_ns and known[1] == st.st_size:
+            return known[2]
+        h = content_hash(path, st.st_size)
+        with self._lock:
+            self._index[path] = [st.st_mtime_ns, st.st_size, h]
+            self._dirty = True
+        return h
+
+    def file_for(self, h, size=THUMB):
+        return os.path.join(self.root, h[:2], f"{h}_{size}.jpg")
+
+    def thumbnail(self, path, st, size=THUMB) -> Image.Image:
+        """Cached thumbnail, made and stored on a miss (worker thread)."""
+        out = self.file_for(self.hash_for(path, st), size)
+        try:
+            with Image.open(out) as im:
+                im.load()
+                return im
+        except OSError:
+            pass
+        im = make_thumb(path, size)
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+        tmp = f"{out}.part{threading.get_ident()}"
+        try:
+            im.save(tmp, "JPEG", quality=85)
+            os.replace(tmp, out)
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return im
+
+    def save_index(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            data, self._dirty = json.dumps(self._index), False
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, "index.json")
+        with open(path + ".part", "w") as f:
+            f.write(data)
+        os.replace(path + ".part", path)
+
+
+# ----------------------------------------------------------------------------
+class Gallery(tk.Toplevel):
+    """Virtualized thumbnail grid of one folder; on_open(path) on double-click."""
+
+    CELL = THUMB + 28             # thumbnail + caption + padding
+
+    def __init__(self, master, folder, on_open, colors):
+        super().__init__(master)
+        self.title(f"🗂  {folder}")
+        self.geometry("900x640")
+        self._c       = colors
+        self._on_open = on_open
+        self._files   = scan(folder)
+        self._cache   = ThumbCache()
+        self._ex      = OpExecutor(self, workers=os.cpu_count() or 1)
+        self._cols    = 0
+        self._shown   = set()                  # indices with canvas items
+        self._photos  = OrderedDict()          # index -> PhotoImage, LRU
+        self._jobs    = {}                     # index -> Job being made
+        self._failed  = set()
+        self._selected = None
+
+        self.configure(bg=colors["bg"])
+        self._canvas = tk.Canvas(self, bg=colors["bg"], highlightthickness=0)
+        sb = ttk.Scrollbar(self, orient="vertical", command=self._yview)
+        self._canvas.configure(yscrollcommand=sb.set)
+        sb.pack(side="right", fill="y")
+        self._canvas.pack(side="left", fill="both", expand=True)
+        self._canvas.bind("<Configure>", lambda e: self._layout())
+        self._canvas.bind("<MouseWheel>",
+            lambda e: self._yview("scroll", -1 * (e.delta // 120), "units"))
+        self._canvas.bind("<Button-4>", lambda e: self._yview("scroll", -1, "units"))
+        self._canvas.bind("<Button-5>", lambda e: self._yview("scroll", 1, "units"))
+        self._canvas.bind("<Button-1>", self._click)
+        self._canvas.bind("<Double-Button-1>", self._open)
+        self._canvas.configure(yscrollincrement=self.CELL // 4)
+        self.bind("<Destroy>", self._closed)
+        if not self._files:
+            self._canvas.create_text(20, 20, anchor="nw", text="No images in this folder.",
+                                     fill=colors["subtext"], font=("Segoe UI", 11))
+
+    # layout
+    def _layout(self):
+        width = max(1, self._canvas.winfo_width())
+        cols = max(1, width // self.CELL)
+        if cols != self._cols:
+            self._cols = cols
+            self._canvas.delete("cell")
+            self._shown.clear()
+        rows = -(-len(self._files) // cols)
+        self._canvas.configure(scrollregion=(0, 0, cols * self.CELL, rows * self.CELL))
+        self._render()
+
+    def _yview(self, *args):
+        self._canvas.yview(*args)
+        self._render()
+
+    def _visible(self, margin=0):
+        top = self._canvas.canvasy(0)
+        r0 = max(0, int(top // self.CELL) - margin)
+        r1 = int((top + self._canvas.winfo_height()) // self.CELL) + margin
+        return range(r0 * self._cols, min(len(self._files), (r1 + 1) * self._cols))
+
+    def _render(self):
+        if not self._cols: return
+        view, ahead = self._visible(), self._visible(margin=1)
+        for i in self._shown - set(view):
+            self._canvas.delete(f"i{i}")
+        self._shown &= set(view)
+        for i, job in list(self._jobs.items()):
+            if i not in ahead:                 # scrolled past before it started
+                job.cancel()
+                del self._jobs[i]
+        for i in view:
+            if i not in self._shown:
+                self._draw(i)
+        for i in ahead:
+            self._request(i)
+
+    def _draw(self, i):
+        c, cell = self._c, self.CELL
+        x, y = (i % self._cols) * cell, (i // self._cols) * cell
+        tags = ("cell", f"i{i}")
+        self._canvas.create_rectangle(x + 4, y + 4, x + cell - 4, y + cell - 4,
+                                      fill=c["panel"], tags=tags + (f"box{i}",),
+                                      outline=c["highlight"] if i == self._selected else c["panel"])
+        name = os.path.basename(self._files[i][0])
+        if len(name) > 24:
+            name = name[:21] + "…"
+        self._canvas.create_text(x + cell // 2, y + cell - 14, text=name, tags=tags,
+                                 fill=c["subtext"], font=("Segoe UI", 8))
+        photo = self._photos.get(i)
+        if photo is not None:
+            self._photos.move_to_end(i)
+            self._canvas.create_image(x + cell // 2, y + 4 + THUMB // 2 + 4,
+                                      image=photo, tags=tags)
+        elif i in self._failed:
+            self._canvas.create_text(x + cell // 2, y + cell // 2 - 10, text="⚠",
+                                     fill=c["subtext"], tags=tags, font=("Segoe UI", 18))
+        self._shown.add(i)
+
+    # thumbnails
+    def _request(self, i):
+        if i in self._photos or i in self._jobs or i in self._failed:
+            return
+        path, st = self._files[i]
+        self._jobs[i] = self._ex.submit(
+            os.path.basename(path),
+            lambda job: self._cache.thumbnail(path, st),
+            lambda img: self._arrived(i, img),
+            lambda exc: self._arrived(i, None))
+
+    def _arrived(self, i, img):
+        self._jobs.pop(i, None)
+        if img is None:
+            self._failed.add(i)
+        else:
+            self._photos[i] = ImageTk.PhotoImage(img)
+            while len(self._photos) > KEEP_PHOTOS:
+                self._photos.popitem(last=False)
+        if i in self._shown:                   # redraw the cell with its image
+            self._canvas.delete(f"i{i}")
+            self._shown.discard(i)
+            self._draw(i)
+
+    # selection
+    def _index_at(self, event):
+        x, y = self._canvas.canvasx(event.x), self._canvas.canvasy(event.y)
+        col, row = int(x // self.CELL), int(y // self.CELL)
+        i = row * self._cols + col
+        return i if col < self._cols and 0 <= i < len(self._files) else None
+
+    def _click(self, event):
+        i = self._index_at(event)
+        for j in (self._selected, i):
+            if j is not None and j in self._shown:
+                self._canvas.itemconfig(f"box{j}", outline=self._c[
+                    "highlight" if j == i else "panel"])
+        self._selected = i
+
+    def _open(self, event):
+        i = self._index_at(event)
+        if i is not None:
+            self._on_open(self._files[i][0])
+
+    def _closed(self, event):
+        if event.widget is not self: return
+        self._ex.shutdown()
+        try:
+            self._cache.save_index()
+        except OSError:
+            pass
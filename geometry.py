@@ -0,0 +1,153 @@
+"""
+geometry.py — Folding of geometric op chains
+Runs of turn / flip / crop / square-crop nodes collapse into one crop box
+plus one transpose (a single exact pixel pass). Arbitrary rotations and
+resizes still run one at a time with their own filter: folding them
+would change the pixels, and history replays must match what was shown.
+"""
+
+import math
+
+from PIL import Image
+
+T = Image.Transpose
+
+EXACT  = {"turn", "flip_h", "flip_v", "crop", "square_crop"}
+RESAMPLING = {"rotate", "resize"}
+GEOMETRIC = EXACT | RESAMPLING
+
+# linear part (a, b, d, e) of the output → input map of each transpose
+TRANSPOSES = {
+    (1, 0, 0, 1):   None,
+    (-1, 0, 0, 1):  T.FLIP_LEFT_RIGHT,
+    (1, 0, 0, -1):  T.FLIP_TOP_BOTTOM,
+    (-1, 0, 0, -1): T.ROTATE_180,
+    (0, 1, 1, 0):   T.TRANSPOSE,
+    (0, 1, -1, 0):  T.ROTATE_270,
+    (0, -1, 1, 0):  T.ROTATE_90,
+    (0, -1, -1, 0): T.TRANSVERSE,
+}
+
+
+def _mul(m, n):
+    # 2×3 affine matrices (a, b, c, d, e, f), composed as m ∘ n
+    a, b, c, d, e, f = m
+    p, q, r, s, t, u = n
+    return (a*p + b*s, a*q + b*t, a*r + b*u + c,
+            d*p + e*s, d*q + e*t, d*r + e*u + f)
+
+
+IDENT = (1, 0, 0, 0, 1, 0)
+
+
+def _rotate_inverse(w, h, angle):
+    # same reverse matrix and expanded size as Image.rotate(expand=True)
+    a = -math.radians(angle)
+    m = [round(math.cos(a), 15), round(math.sin(a), 15), 0.0,
+         round(-math.sin(a), 15), round(math.cos(a), 15), 0.0]
+    def tr(x, y):
+        return m[0]*x + m[1]*y + m[2], m[3]*x + m[4]*y + m[5]
+    m[2], m[5] = tr(-w / 2, -h / 2)
+    m[2] += w / 2; m[5] += h / 2
+    pts = [tr(x, y) for x, y in ((0, 0), (w, 0), (w, h), (0, h))]
+    nw = math.ceil(max(p[0] for p in pts)) - math.floor(min(p[0] for p in pts))
+    nh = math.ceil(max(p[1] for p in pts)) - math.floor(min(p[1] for p in pts))
+    m[2], m[5] = tr(-(nw - w) / 2.0, -(nh - h) / 2.0)
+    return tuple(m), (nw, nh)
+
+
+def step(name, args, size):
+    """Output → input affine map and output size of one geometric node."""
+    w, h = size
+    if name == "rotate":
+        angle = args[0] % 360.0
+        if angle % 90 == 0:                # Image.rotate takes a transpose here
+            name, args = "turn", (int(-angle) % 360,)
+        else:
+            return _rotate_inverse(w, h, angle)
+    if name == "turn":
+        deg = args[0] % 360
+        if deg == 90:  return (0, 1, 0, -1, 0, h), (h, w)
+        if deg == 180: return (-1, 0, w, 0, -1, h), (w, h)
+        if deg == 270: return (0, -1, w, 1, 0, 0), (h, w)
+        return IDENT, (w, h)
+    if name == "flip_h":
+        return (-1, 0, w, 0, 1, 0), (w, h)
+    if name == "flip_v":
+        return (1, 0, 0, 0, -1, h), (w, h)
+    if name == "square_crop":
+        s = min(w, h)
+        name, args = "crop", (((w - s) // 2, (h - s) // 2,
+                               (w - s) // 2 + s, (h - s) // 2 + s),)
+    if name == "crop":
+        x0, y0, x1, y1 = map(int, map(round, args[0]))
+        return (1, 0, x0, 0, 1, y0), (x1 - x0, y1 - y0)
+    if name == "resize":
+        nw, nh = max(1, args[0]), max(1, args[1])
+        return (w / nw, 0, 0, 0, h / nh, 0), (nw, nh)
+    raise KeyError(name)
+
+
+# ----------------------------------------------------------------------------
+def _is_exact(name, args):
+    return name in EXACT or (name == "rotate" and args[0] % 90 == 0)
+
+
+def _pads(name, args, size):
+    # a crop reaching past the image pads with black; folding it into an
+    # earlier crop would pull in real pixels instead
+    if name != "crop":
+        return False
+    x0, y0, x1, y1 = map(int, map(round, args[0]))
+    return x0 < 0 or y0 < 0 or x1 > size[0] or y1 > size[1]
+
+
+def plan(nodes, size):
+    """Split a run of geometric nodes into folded passes.
+
+    Returns [(kind, data, out_size)]: ("exact", matrix) for transpose/crop
+    runs, or ("op", node) for a resampling node that keeps its own filter."""
+    passes, m, n, sz = [], IDENT, 0, size
+    for name, args in nodes:
+        mat, out = step(name, args, sz)
+        if _is_exact(name, args):
+            if n and _pads(name, args, sz):
+                passes.append(("exact", m, sz)); m, n = IDENT, 0
+            m = _mul(m, mat); n += 1
+        else:
+            if n:
+                passes.append(("exact", m, sz)); m, n = IDENT, 0
+            passes.append(("op", (name, args), out))
+        sz = out
+    if n:
+        passes.append(("exact", m, sz))
+    return passes
+
+
+def execute(img: Image.Image, m, size) -> Image.Image:
+    """One exact pass: crop box plus transpose given by matrix m."""
+    a, b, c, d, e, f = m
+    w, h = size
+    tp = TRANSPOSES[(a, b, d, e)]
+    # input rectangle covered by the output
+    xs = [a*x + b*y + c for x, y in ((0, 0), (w, 0), (0, h), (w, h))]
+    ys = [d*x + e*y + f for x, y in ((0, 0), (w, 0), (0, h), (w, h))]
+    box = (min(xs), min(ys), max(xs), max(ys))
+    full = box == (0, 0, img.width, img.height)
+    if tp is None:
+        return img if full else img.crop(box)
+    if full:
+        return img.transpose(tp)
+    # crop + transpose in one nearest-neighbour pass (exact for unit maps)
+    return img.transform(size, Image.Transform.AFFINE, m, Image.NEAREST)
+
+
+def run(img: Image.Image, nodes, apply_node) -> Image.Image:
+    """Execute geometric nodes with as few pixel passes as possible;
+    apply_node(img, name, args) runs nodes that are not folded."""
+    for kind, data, size in plan(nodes, img.size):
+        if kind == "op":
+            img = apply_node(img, *data)
+        else:
+            img = execute(img, data, size)
+    return img
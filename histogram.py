@@ -0,0 +1,43 @@
+"""
+histogram.py — Channel histograms drawn straight onto a Tk canvas
+Counts come from a single Image.histogram() call, which bins every band
+in one C pass, and are plotted as canvas lines, so no figure is
+rendered, encoded or decoded.
+"""
+
+import math
+
+RGB_COLORS = ("#ef4444", "#22c55e", "#3b82f6")
+
+
+def channels(img):
+    """256-bin counts per band of a PIL image: [L] or [R, G, B]."""
+    if img.mode not in ("L", "RGB", "RGBA"):
+        img = img.convert("RGB")
+    h = img.histogram()
+    return [h[i*256:(i+1)*256] for i in range(1 if img.mode == "L" else 3)]
+
+
+def from_array(arr):
+    """Counts per channel of an (H, W[, C]) uint8 array such as a video
+    frame, in array channel order."""
+    from PIL import Image
+    if arr.ndim == 3 and arr.shape[2] == 1:
+        arr = arr[:, :, 0]
+    img = Image.fromarray(arr)
+    h = img.histogram()
+    return [h[i*256:(i+1)*256] for i in range(len(img.getbands()))]
+
+
+def draw(canvas, hists, colors=RGB_COLORS, log=False, pad=8, tag="hist"):
+    """Plot the histograms as outlines filling the canvas."""
+    canvas.delete(tag)
+    w = max(1, canvas.winfo_width()  - 2 * pad)
+    h = max(1, canvas.winfo_height() - 2 * pad)
+    scale = math.log1p if log else float
+    peak = max((scale(v) for hist in hists for v in hist), default=0) or 1
+    for hist, color in zip(hists, colors):
+        pts = []
+        for i, v in enumerate(hist):
+            pts += (pad + i * w / 255, pad + h - scale(v) / peak * h)
+        canvas.create_line(*pts, fill=color, width=1, tags=tag)
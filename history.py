@@ -0,0 +1,257 @@
+"""
+history.py — Non-destructive edit history for Image Studio
+The session is a list of (op name, args) nodes over the source image.
+Undo/redo/reset move a pointer. The last few renders stay decoded, so a
+step back or forward is free; further steps re-render from the nearest
+checkpoint. Checkpoints are zlib-compressed tiles, built off the Tk
+thread, kept under a byte budget and spilled to a temporary file when
+RAM runs over. render() only reads the graph, so it can run on a worker.
+"""
+
+import tempfile, threading, zlib
+
+from PIL import Image
+
+import image_ops
+
+TILE        = 256
+CHECKPOINT_EVERY = 4
+KEEP_HEADS  = 3                      # recent full-res renders kept decoded
+MEM_BUDGET  = 256 * 1024 * 1024      # compressed bytes kept in RAM
+DISK_BUDGET = 4 * 1024 * 1024 * 1024  # compressed bytes kept in the spill file
+
+
+def tile_boxes(size, tile=TILE):
+    w, h = size
+    for y in range(0, h, tile):
+        for x in range(0, w, tile):
+            yield (x, y, min(x + tile, w), min(y + tile, h))
+
+
+def pack_tile(img: Image.Image, box) -> bytes:
+    return zlib.compress(img.crop(box).tobytes(), 1)
+
+
+def unpack_tile(mode, box, blob: bytes) -> Image.Image:
+    size = (box[2] - box[0], box[3] - box[1])
+    return Image.frombytes(mode, size, zlib.decompress(blob))
+
+
+# ----------------------------------------------------------------------------
+class SpillFile:
+    """Append-only temporary file holding blobs of spilled checkpoints."""
+
+    def __init__(self):
+        self._f    = None
+        self.live  = 0                     # bytes still referenced
+        self._lock = threading.Lock()      # renders read from workers
+
+    def write(self, blob: bytes):
+        with self._lock:
+            if self._f is None:
+                self._f = tempfile.TemporaryFile(prefix="imgstudio-history-")
+            self._f.seek(0, 2)
+            off = self._f.tell()
+            self._f.write(blob)
+            self.live += len(blob)
+            return off, len(blob)
+
+    def read(self, ref) -> bytes:
+        off, n = ref
+        with self._lock:
+            self._f.seek(off)
+            return self._f.read(n)
+
+    def release(self, ref):
+        with self._lock:
+            self.live -= ref[1]
+            if self.live == 0 and self._f is not None:
+                self._f.close(); self._f = None
+
+    def close(self):
+        with self._lock:
+            if self._f is not None:
+                self._f.close()
+            self._f = None; self.live = 0
+
+
+class Snapshot:
+    """A whole image as compressed tiles, in RAM or spilled to disk."""
+
+    def __init__(self, img: Image.Image):
+        self.mode, self.size = img.mode, img.size
+        self.chunks = [(box, pack_tile(img, box)) for box in tile_boxes(img.size)]
+
+    @property
+    def nbytes(self):
+        return sum(len(c) for _, c in self.chunks if isinstance(c, bytes))
+
+    @property
+    def spilled(self):
+        return any(not isinstance(c, bytes) for _, c in self.chunks)
+
+    def spill(self, spill: SpillFile):
+        self.chunks = [(box, spill.write(c) if isinstance(c, bytes) else c)
+                       for box, c in self.chunks]
+
+    def release(self, spill: SpillFile):
+        for _, c in self.chunks:
+            if not isinstance(c, bytes):
+                spill.release(c)
+
+    def load(self, spill: SpillFile) -> Image.Image:
+        out = Image.new(self.mode, self.size)
+        for box, c in self.chunks:
+            blob = c if isinstance(c, bytes) else spill.read(c)
+            out.paste(unpack_tile(self.mode, box, blob), box[:2])
+        return out
+
+
+# ----------------------------------------------------------------------------
+class EditGraph:
+    """Recipe of parametrized nodes over an immutable source image.
+
+    ``pos`` is the number of nodes currently applied; nodes past it are the
+    redo tail. A "reset" node renders back to the source."""
+
+    def __init__(self, source: Image.Image, every=CHECKPOINT_EVERY,
+                 mem_budget=MEM_BUDGET, disk_budget=DISK_BUDGET):
+        self.source      = source
+        self.every       = every
+        self.mem_budget  = mem_budget
+        self.disk_budget = disk_budget
+        self.nodes: list[tuple[str, tuple]] = []
+        self.pos = 0
+        self._checkpoints: dict[int, Snapshot] = {}
+        self._spill   = SpillFile()
+        self._heads   = {0: source}        # pos -> full-res render, oldest first
+        self._proxies = {}
+
+    def __len__(self):
+        return self.pos
+
+    @property
+    def can_undo(self): return self.pos > 0
+
+    @property
+    def can_redo(self): return self.pos < len(self.nodes)
+
+    @property
+    def mem_bytes(self):
+        return sum(s.nbytes for s in self._checkpoints.values())
+
+    @property
+    def disk_bytes(self):
+        return self._spill.live
+
+    def close(self):
+        self._checkpoints.clear(); self._spill.close(); self._proxies.clear()
+        self._heads.clear()
+
+    def recipe(self):
+        """Applied nodes since the last reset, ready for image_ops.save_recipe."""
+        nodes = self.nodes[:self.pos]
+        return nodes[self._last_reset(self.pos):]
+
+    # editing
+    def push(self, name, args, result: Image.Image | None):
+        """Append a node; result may be None for intermediate nodes of a
+        batch that was rendered in one pass."""
+        for p in [p for p in self._checkpoints if p > self.pos]:
+            self._checkpoints.pop(p).release(self._spill)
+        for p in [p for p in self._heads if p > self.pos]:
+            del self._heads[p]
+        del self.nodes[self.pos:]
+        self.nodes.append((name, tuple(args)))
+        self.pos += 1
+        if result is not None:
+            self.keep(self.pos, result)
+
+    def undo(self) -> Image.Image | None:
+        """Step back; the image if it is at hand, else None: render() it."""
+        self.pos -= 1
+        return self.cached()
+
+    def redo(self) -> Image.Image | None:
+        self.pos += 1
+        return self.cached()
+
+    # checkpoints: due after every `every` nodes; the Snapshot is built by
+    # the caller off the Tk thread
+    def due_checkpoint(self):
+        """Key for add_checkpoint() if the head is due a checkpoint, else None."""
+        pos = self.pos
+        if pos not in self._heads:
+            return None
+        last = max([p for p in self._checkpoints if p <= pos], default=self._last_reset(pos))
+        return (pos, tuple(self.nodes[:pos])) if pos - last >= self.every else None
+
+    def add_checkpoint(self, key, snap: Snapshot):
+        """Store snap for key; dropped if the nodes up to it changed meanwhile."""
+        pos, nodes = key
+        if tuple(self.nodes[:pos]) != nodes or pos in self._checkpoints:
+            return
+        self._checkpoints[pos] = snap
+        self._enforce_budget()
+
+    # evaluation
+    def cached(self, pos=None) -> Image.Image | None:
+        """Full-res image at pos if it needs no replay, else None."""
+        pos = self.pos if pos is None else pos
+        if pos in self._heads:
+            return self._heads[pos]
+        return self.source if self._last_reset(pos) == pos else None
+
+    def keep(self, pos, img: Image.Image):
+        """Remember a full-res render of pos; the oldest beyond KEEP_HEADS go."""
+        self._heads.pop(pos, None)
+        self._heads[pos] = img
+        while len(self._heads) > KEEP_HEADS:
+            del self._heads[next(iter(self._heads))]
+
+    def render(self, pos=None, scale=1.0, job=None) -> Image.Image:
+        """Evaluate the graph up to pos, at full size or on a scaled proxy,
+        from the nearest kept render or checkpoint. Reads the graph only."""
+        pos = self.pos if pos is None else pos
+        nodes = self.nodes[:pos]
+        start = self._last_reset(pos)
+        if scale != 1.0:
+            return image_ops.run(self.proxy(scale), nodes[start:], scale)
+        heads, cps = dict(self._heads), dict(self._checkpoints)
+        img = self.source
+        best = max([p for p in heads if start <= p <= pos], default=None)
+        cp = max([p for p in cps if start < p <= pos], default=None)
+        if cp is not None and (best is None or cp > best):
+            start, img = cp, cps[cp].load(self._spill)
+        elif best is not None:
+            start, img = best, heads[best]
+        if job is not None:
+            job.check()
+        return image_ops.run(img, nodes[start:])
+
+    def proxy(self, scale) -> Image.Image:
+        if scale not in self._proxies:
+            w = max(1, round(self.source.width  * scale))
+            h = max(1, round(self.source.height * scale))
+            self._proxies[scale] = self.source.resize((w, h), Image.LANCZOS,
+                                                      reducing_gap=2.0)
+        return self._proxies[scale]
+
+    def _last_reset(self, pos):
+        for i in range(pos - 1, -1, -1):
+            if self.nodes[i][0] == "reset":
+                return i + 1
+        return 0
+
+    def _enforce_budget(self):
+        # oldest checkpoints go to disk first, then are dropped; the source
+        # is always there to replay from
+        for p in sorted(self._checkpoints):
+            if self.mem_bytes <= self.mem_budget:
+                break
+            if not self._checkpoints[p].spilled:
+                self._checkpoints[p].spill(self._spill)
+        for p in sorted(self._checkpoints):
+            if self._spill.live <= self.disk_budget:
+                break
+            self._checkpoints.pop(p).release(self._spill)
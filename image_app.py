@@ -1,26 +1,33 @@
 """
 image_app.py — Dedicated Image Manipulation App
-Requires: pip install pillow matplotlib numpy
+Requires: pip install pillow numpy
 """
 
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import os, io, math
+import os, time
+
+from executor import OpExecutor, SerialQueue
+import tracing
 
 try:
-    from PIL import Image, ImageTk, ImageFilter, ImageEnhance, ImageOps, ImageDraw, ImageFont
+    from PIL import Image, ImageTk
+    from preview import PreviewRenderer, LivePreview, DRAFT_DELAY_MS, FRAME_MS
+    from history import EditGraph, Snapshot
+    import image_ops
+    import histogram
+    import tiled
+    import loader
+    import export
+    import image_cache
+    import gallery
     PIL_OK = True
 except ImportError:
     PIL_OK = False
 
-try:
-    import numpy as np
-    import matplotlib
-    matplotlib.use("Agg")
-    import matplotlib.pyplot as plt
-    MPL_OK = True
-except ImportError:
-    MPL_OK = False
+# NumPy is only needed by the inspector / palette; imported on first use
+from backends import Lazy, NP_OK
+analysis = Lazy("analysis")
 
 # palette 
 C = {
@@ -38,6 +45,8 @@ C = {
     "border":    "#2e2e5e",
 }
 
+PROXY_SIDE = 4096             # longest side of the working copy of huge images
+
 IMAGE_TYPES = [
     ("Image files", "*.jpg *.jpeg *.png *.bmp *.gif *.tiff *.webp *.ico"),
     ("All files", "*.*"),
@@ -56,21 +65,53 @@ class ImageApp(tk.Tk):
         if not PIL_OK:
             messagebox.showerror(
                 "Missing library",
-                "Pillow is required.\n\nRun:  pip install pillow matplotlib numpy")
+                "Pillow is required.\n\nRun:  pip install pillow numpy")
             self.destroy(); return
 
         # state
         self._original: Image.Image | None = None
         self._current:  Image.Image | None = None
-        self._history:  list[Image.Image]  = []   # undo stack
-        self._redo:     list[Image.Image]  = []
+        self._graph: EditGraph | None = None    # non-destructive edit history
+        self._shown_pos = 0                     # graph position _current shows
+        self._source = None                     # TiledSource when editing a proxy
+        self._loading = None                    # path whose full decode is pending
+        self._load_job = None                   # that decode (or tiled open) job
         self._zoom      = 1.0
         self._path      = ""
+        self._version   = 0                     # bumped whenever _current changes
+        self._view_x    = 0                     # scroll offset, display px
+        self._view_y    = 0
+        self._preview   = PreviewRenderer()
+        self._hq_job    = None
+        self._pan_from  = None
+        self._pixels    = (None, None)          # (version key, PixelBuffer)
+        self._hover     = None                  # last canvas (x, y) under the mouse
+        self._hover_job = None
+        self._inspect   = None                  # open inspector's update(px, py)
+        self._hist      = (None, None)          # (version key, channel counts)
+        self._hist_panel = None                 # open histogram's redraw()
 
         self._status_var = tk.StringVar(value="Open an image to begin …")
         self._zoom_var   = tk.StringVar(value="100 %")
+        self._busy_var   = tk.StringVar(value="")
+        self._cost_var   = tk.StringVar(value="")
+        self._spinning   = False
+
+        # operations run off the UI thread, one node at a time
+        self._executor = OpExecutor(self, self._update_busy)
+        self._queue = SerialQueue(
+            self._executor,
+            base=lambda: self._current,
+            work=self._run_ops,
+            on_result=self._op_done,
+            on_error=self._op_failed,
+            coalesce=image_ops.coalesce, describe=image_ops.describe)
 
         self._build_ui()
+        self.bind("<Escape>", lambda e: self._cancel_ops())
+        self.bind("<F8>", lambda e: self._toggle_tracing())
+        self.bind("<F9>", lambda e: self._toggle_profiler())
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
 
     # root layout 
     def _build_ui(self):
@@ -94,8 +135,10 @@ class ImageApp(tk.Tk):
         # quick toolbar
         for txt, cmd in [
             ("📂 Open",  self._open_file),
+            ("🗂 Gallery", self._open_gallery),
             ("💾 Save",  self._save_file),
             ("💾 Save As", self._save_as),
+            ("📤 Export", self._dlg_export),
             ("↩ Undo",  self._undo),
             ("↪ Redo",  self._redo_op),
             ("⟳ Reset", self._reset),
@@ -171,50 +214,51 @@ class ImageApp(tk.Tk):
             b.pack(fill="x", padx=8, pady=2)
             b.bind("<Enter>", lambda e: b.config(bg=C["accent"]))
             b.bind("<Leave>", lambda e: b.config(bg=c))
+            return b
 
         # Rotate & Flip
         section("Rotate & Flip", "🔄")
-        btn("Rotate 90° CW",    lambda: self._op(lambda i: i.rotate(-90, expand=True)))
-        btn("Rotate 90° CCW",   lambda: self._op(lambda i: i.rotate( 90, expand=True)))
-        btn("Rotate 180°",      lambda: self._op(lambda i: i.rotate(180)))
+        btn("Rotate 90° CW",    lambda: self._op("turn", 90))
+        btn("Rotate 90° CCW",   lambda: self._op("turn", 270))
+        btn("Rotate 180°",      lambda: self._op("turn", 180))
         btn("Custom Rotate …",  self._dlg_rotate)
-        btn("Flip Horizontal",  lambda: self._op(ImageOps.mirror))
-        btn("Flip Vertical",    lambda: self._op(ImageOps.flip))
+        btn("Flip Horizontal",  lambda: self._op("flip_h"))
+        btn("Flip Vertical",    lambda: self._op("flip_v"))
 
         # Color Adjustments
         section("Color", "🎨")
-        btn("Grayscale",        lambda: self._op(lambda i: i.convert("L").convert("RGB")))
-        btn("Invert Colors",    lambda: self._op(lambda i: ImageOps.invert(i.convert("RGB"))))
-        btn("Sepia",            lambda: self._op(self._apply_sepia))
-        btn("Solarize",         lambda: self._op(lambda i: ImageOps.solarize(i.convert("RGB"))))
-        btn("Posterize",        lambda: self._op(lambda i: ImageOps.posterize(i.convert("RGB"), 3)))
-        btn("Auto Contrast",    lambda: self._op(lambda i: ImageOps.autocontrast(i)))
-        btn("Equalize Hist",    lambda: self._op(lambda i: ImageOps.equalize(i.convert("RGB"))))
-        btn("Brightness …",     lambda: self._dlg_enhance("Brightness", ImageEnhance.Brightness))
-        btn("Contrast …",       lambda: self._dlg_enhance("Contrast",   ImageEnhance.Contrast))
-        btn("Saturation …",     lambda: self._dlg_enhance("Saturation", ImageEnhance.Color))
-        btn("Sharpness …",      lambda: self._dlg_enhance("Sharpness",  ImageEnhance.Sharpness))
+        btn("Grayscale",        lambda: self._op("grayscale"))
+        btn("Invert Colors",    lambda: self._op("invert"))
+        btn("Sepia",            lambda: self._op("sepia"))
+        btn("Solarize",         lambda: self._op("solarize"))
+        btn("Posterize",        lambda: self._op("posterize", 3))
+        btn("Auto Contrast",    lambda: self._op("autocontrast"))
+        btn("Equalize Hist",    lambda: self._op("equalize"))
+        btn("Brightness …",     lambda: self._dlg_enhance("Brightness", "brightness"))
+        btn("Contrast …",       lambda: self._dlg_enhance("Contrast",   "contrast"))
+        btn("Saturation …",     lambda: self._dlg_enhance("Saturation", "saturation"))
+        btn("Sharpness …",      lambda: self._dlg_enhance("Sharpness",  "sharpness"))
 
         # Filters
         section("Filters", "✨")
-        btn("Blur",             lambda: self._op(lambda i: i.filter(ImageFilter.GaussianBlur(2))))
-        btn("Strong Blur",      lambda: self._op(lambda i: i.filter(ImageFilter.GaussianBlur(8))))
-        btn("Sharpen",          lambda: self._op(lambda i: i.filter(ImageFilter.SHARPEN)))
-        btn("Edge Detect",      lambda: self._op(lambda i: i.filter(ImageFilter.FIND_EDGES)))
-        btn("Emboss",           lambda: self._op(lambda i: i.filter(ImageFilter.EMBOSS)))
-        btn("Smooth",           lambda: self._op(lambda i: i.filter(ImageFilter.SMOOTH_MORE)))
-        btn("Detail",           lambda: self._op(lambda i: i.filter(ImageFilter.DETAIL)))
-        btn("Contour",          lambda: self._op(lambda i: i.filter(ImageFilter.CONTOUR)))
-        btn("Min Filter",       lambda: self._op(lambda i: i.filter(ImageFilter.MinFilter(3))))
-        btn("Max Filter",       lambda: self._op(lambda i: i.filter(ImageFilter.MaxFilter(3))))
+        btn("Blur",             lambda: self._op("blur", 2))
+        btn("Strong Blur",      lambda: self._op("blur", 8))
+        btn("Sharpen",          lambda: self._op("kernel", "sharpen"))
+        btn("Edge Detect",      lambda: self._op("kernel", "edges"))
+        btn("Emboss",           lambda: self._op("kernel", "emboss"))
+        btn("Smooth",           lambda: self._op("kernel", "smooth"))
+        btn("Detail",           lambda: self._op("kernel", "detail"))
+        btn("Contour",          lambda: self._op("kernel", "contour"))
+        btn("Min Filter",       lambda: self._op("min_filter", 3))
+        btn("Max Filter",       lambda: self._op("max_filter", 3))
 
         # Crop & Resize
         section("Crop & Resize", "✂️")
         btn("Resize …",         self._dlg_resize)
         btn("Crop …",           self._dlg_crop)
-        btn("Square Crop (center)", lambda: self._op(self._square_crop))
-        btn("Fit to 512×512",   lambda: self._op(lambda i: ImageOps.fit(i,(512,512))))
-        btn("Fit to 1024×1024", lambda: self._op(lambda i: ImageOps.fit(i,(1024,1024))))
+        btn("Square Crop (center)", lambda: self._op("square_crop"))
+        btn("Fit to 512×512",   lambda: self._op("fit", 512, 512))
+        btn("Fit to 1024×1024", lambda: self._op("fit", 1024, 1024))
 
         # Draw & Annotate
         section("Draw / Annotate", "✏️")
@@ -224,10 +268,15 @@ class ImageApp(tk.Tk):
 
         # Pixel / Channel
         section("Channels", "🔬")
-        btn("Red Channel only",   lambda: self._op(lambda i: self._channel(i, 0)))
-        btn("Green Channel only", lambda: self._op(lambda i: self._channel(i, 1)))
-        btn("Blue Channel only",  lambda: self._op(lambda i: self._channel(i, 2)))
-        btn("Swap R ↔ B",         lambda: self._op(lambda i: Image.merge("RGB", i.convert("RGB").split()[::-1])))
+        btn("Red Channel only",   lambda: self._op("channel", 0))
+        btn("Green Channel only", lambda: self._op("channel", 1))
+        btn("Blue Channel only",  lambda: self._op("channel", 2))
+        btn("Swap R ↔ B",         lambda: self._op("swap_rb"))
+
+        # Recipes
+        section("Recipe", "📜")
+        btn("Save Recipe …",    self._save_recipe)
+        btn("Apply Recipe …",   self._apply_recipe)
 
         # Info & Analysis
         section("Info & Analysis", "📊")
@@ -236,6 +285,13 @@ class ImageApp(tk.Tk):
         btn("Show Histogram",   self._show_histogram)
         btn("Color Palette",    self._show_palette)
 
+        # Diagnostics
+        section("Diagnostics", "⏱")
+        self._trace_btn   = btn("", self._toggle_tracing)
+        btn("Export Trace …",   self._export_trace)
+        self._profile_btn = btn("", self._toggle_profiler)
+        self._diag_labels()
+
     # canvas (preview) area 
     def _build_canvas_area(self, parent):
         frame = tk.Frame(parent, bg=C["bg"])
@@ -251,6 +307,10 @@ class ImageApp(tk.Tk):
         self._canvas.bind("<Button-5>",  lambda e: self._zoom_by(0.8))
         self._canvas.bind("<MouseWheel>",
             lambda e: self._zoom_by(1.25 if e.delta > 0 else 0.8))
+        self._canvas.bind("<ButtonPress-1>",   self._pan_start)
+        self._canvas.bind("<B1-Motion>",       self._pan_move)
+        self._canvas.bind("<ButtonRelease-1>", lambda e: self._schedule_hq())
+        self._canvas.bind("<Configure>",       lambda e: self._refresh_canvas(draft=True))
 
         # placeholder text
         self._canvas.create_text(
@@ -266,147 +326,513 @@ class ImageApp(tk.Tk):
         self._pixel_var = tk.StringVar(value="")
         tk.Label(bar, textvariable=self._pixel_var, bg=C["card"], fg=C["accent2"],
                  font=("Consolas", 9), anchor="e", padx=12).pack(side="right")
+        # cost of the last op / open / save
+        tk.Label(bar, textvariable=self._cost_var, bg=C["card"], fg=C["subtext"],
+                 font=("Consolas", 9), anchor="e", padx=12).pack(side="right")
+
+        # busy indicator, packed only while an operation is running
+        self._busy_frame = tk.Frame(bar, bg=C["card"])
+        tk.Label(self._busy_frame, textvariable=self._busy_var, bg=C["card"],
+                 fg=C["highlight"], font=("Segoe UI", 9)).pack(side="left", padx=6)
+        self._progress = ttk.Progressbar(self._busy_frame, length=120,
+                                         mode="indeterminate")
+        self._progress.pack(side="left")
+        tk.Button(self._busy_frame, text="✕", command=self._cancel_ops,
+                  bg=C["red"], fg="white", relief="flat", bd=0, padx=6,
+                  cursor="hand2").pack(side="left", padx=6)
 
     # file operations 
     def _open_file(self):
         p = filedialog.askopenfilename(title="Open Image", filetypes=IMAGE_TYPES)
-        if not p: return
-        img = Image.open(p)
-        if img.mode not in ("RGB", "RGBA", "L"):
-            img = img.convert("RGB")
+        if p:
+            self._open_path(p)
+
+    def _open_gallery(self):
+        folder = filedialog.askdirectory(title="Browse Folder")
+        if folder:
+            gallery.Gallery(self, folder, self._open_path, C)
+
+    def _open_path(self, p):
+        # only a new file supersedes a pending load; history actions and
+        # Esc cancel the op queue and never reach the decode
+        self._queue.cancel()
+        if self._load_job is not None:
+            self._load_job.cancel()
+            self._load_job = None
+        if loader.is_cached(p):
+            # decoded recently and unchanged on disk: no preview, no decode
+            t0 = time.perf_counter()
+            with tracing.span("open", path=os.path.basename(p), cached=True):
+                img = loader.load_full(p)
+                self._set_image(p, img)
+            self._show_cost("open (cached)", 0, time.perf_counter() - t0, img)
+            return
+        with tracing.span("open", path=os.path.basename(p)):
+            img = tiled.open_lazy(p)
+            large, fast = tiled.is_large(img.size), loader.has_fast_preview(img)
+            img.close()
+            if large:
+                self._open_tiled(p); return
+            # a reduced-scale decode is on screen long before the full one
+            self._loading = p
+            if fast:
+                with tracing.span("preview"):
+                    self._show_preview(loader.preview(p, self._canvas_size()))
+        self._status_var.set(f"Loading {os.path.basename(p)} …")
+        def decode(job):
+            with tracing.span("decode", path=os.path.basename(p)) as sp:
+                img = loader.load_full(p)
+                sp.add(bytes=tracing.nbytes(img))
+            return img
+        def done(img):
+            if self._loading == p:
+                t0 = time.perf_counter()
+                self._set_image(p, img)
+                self._show_cost("open", job.elapsed, time.perf_counter() - t0, img)
+        def failed(exc):
+            if self._loading == p:
+                self._loading = self._load_job = None
+                self._refresh_canvas()
+            messagebox.showerror("Error", str(exc))
+        job = self._load_job = self._executor.submit(
+            f"open {os.path.basename(p)}", decode, done, failed)
+
+    def _canvas_size(self):
+        return max(1, self._canvas.winfo_width()), max(1, self._canvas.winfo_height())
+
+    def _show_preview(self, img):
+        cw, ch = self._canvas_size()
+        self._tk_img = ImageTk.PhotoImage(img)
+        self._canvas.delete("all")
+        self._canvas.create_image(cw // 2, ch // 2, image=self._tk_img)
+
+    def _open_tiled(self, p):
+        # too big to edit in memory: edit a proxy, render full size on save
+        src = tiled.TiledSource(p)
+        def done(proxy):
+            self._set_image(p, loader.normalize(proxy), src)
+        self._load_job = self._executor.submit(
+            f"open {os.path.basename(p)} (tiled)",
+            lambda job: src.proxy(PROXY_SIDE), done,
+            lambda exc: messagebox.showerror("Error", str(exc)))
+
+    def _set_image(self, p, img, source=None):
+        self._loading = self._load_job = None
         self._path = p
-        self._original = img.copy()
-        self._current  = img.copy()
-        self._history.clear(); self._redo.clear()
-        self._zoom = 1.0; self._zoom_var.set("100 %")
-        self._status_var.set(
-            f"{os.path.basename(p)}  •  {img.width}×{img.height}  •  {img.mode}")
-        self._refresh_canvas()
+        if self._source is not None:
+            self._source.close()
+        self._source = source
+        # ops never modify their input, so the graph source can be shared
+        self._original = img
+        self._current  = img
+        if self._graph is not None:
+            self._graph.close()
+        self._graph = EditGraph(img)
+        self._shown_pos = 0
+        # start fitted to the window, as the preview was shown
+        cw, ch = self._canvas_size()
+        self._zoom = min(1.0, cw / img.width, ch / img.height)
+        self._zoom_var.set(f"{int(self._zoom*100)} %")
+        self._view_x = self._view_y = 0
+        status = f"{os.path.basename(p)}  •  {img.width}×{img.height}  •  {img.mode}"
+        if source is not None:
+            w, h = source.size
+            status += f"  •  proxy of {w}×{h}, saved tiled"
+        self._status_var.set(status)
+        self._image_changed()
 
     def _save_file(self):
         if not self._current:
             messagebox.showwarning("No image", "Open an image first."); return
-        if not self._path:
+        if not self._path or self._source is not None:
             self._save_as(); return
-        self._current.save(self._path)
-        self._status_var.set(f"Saved → {self._path}")
+        self._export([(self._path, None, None)], f"save {os.path.basename(self._path)}")
 
     def _save_as(self):
         if not self._current:
             messagebox.showwarning("No image", "Open an image first."); return
+        if self._source is not None:
+            self._save_tiled(); return
         out = filedialog.asksaveasfilename(
-            defaultextension=".png",
-            filetypes=[("PNG","*.png"),("JPEG","*.jpg *.jpeg"),
-                       ("BMP","*.bmp"),("TIFF","*.tiff"),("All","*.*")])
+            defaultextension=".png", filetypes=export.FILE_TYPES)
         if out:
-            self._current.convert("RGB").save(out)
-            self._path = out
-            self._status_var.set(f"Saved → {out}")
+            self._export([(out, None, None)], f"save {os.path.basename(out)}", out)
 
-    # history helpers 
-    def _push_history(self, img: Image.Image):
-        self._history.append(img.copy())
-        self._redo.clear()
-        if len(self._history) > 50:
-            self._history.pop(0)
+    def _export(self, targets, label, new_path=None):
+        """Encode targets [(path, preset, size)] off the UI thread."""
+        try:
+            for path, _, _ in targets:
+                export.format_for(path)
+        except ValueError as exc:
+            messagebox.showerror("Error", str(exc)); return
+        img = self._current                  # ops never modify it in place
+        def done(results):
+            failed = {p: e for p, e in results.items() if isinstance(e, Exception)}
+            if new_path and not failed:
+                self._path = new_path
+            total = sum(v for v in results.values() if not isinstance(v, Exception))
+            where = targets[0][0] if len(targets) == 1 else os.path.dirname(targets[0][0])
+            self._status_var.set(f"Saved {len(results) - len(failed)} file(s), "
+                                 f"{total / 1e6:.1f} MB → {where}")
+            self._show_cost(label, job.elapsed, 0, img)
+            if failed:
+                messagebox.showerror("Export failed", "\n".join(
+                    f"{os.path.basename(p)}: {e}" for p, e in failed.items()))
+        job = self._executor.submit(
+            label, lambda job: export.export_all(img, targets, job=job), done,
+            lambda exc: messagebox.showerror("Error", str(exc)))
+
+    def _dlg_export(self):
+        if self._current is None:
+            messagebox.showwarning("No image", "Open an image first."); return
+        if self._source is not None:
+            messagebox.showinfo("Export", "Huge images are written tiled — use Save As."); return
+        d = tk.Toplevel(self); d.title("Export"); d.configure(bg=C["bg"])
+        d.resizable(False, False); d.grab_set()
+        formats, sizes = {}, {}
+        def group(title, picks, items):
+            tk.Label(d, text=title, bg=C["bg"], fg=C["highlight"],
+                     font=("Segoe UI", 9, "bold"), anchor="w").pack(fill="x", padx=24, pady=(12, 2))
+            for text, key, on in items:
+                picks[key] = var = tk.BooleanVar(value=on)
+                tk.Checkbutton(d, text=text, variable=var, bg=C["bg"], fg=C["text"],
+                               selectcolor=C["panel"], activebackground=C["bg"],
+                               anchor="w").pack(fill="x", padx=32)
+        group("Formats", formats, [
+            ("PNG — fast (level 1)",         "png-fast",         True),
+            ("PNG — smallest (level 9)",     "png-small",        False),
+            ("JPEG — progressive, optimized","jpeg-progressive", True),
+            ("JPEG — baseline, optimized",   "jpeg-optimized",   False),
+            ("WebP — lossy (method 4)",      "webp",             True),
+            ("WebP — lossless",              "webp-lossless",    False),
+            ("TIFF — Deflate (lossless)",    "tiff-deflate",     False),
+            ("TIFF — LZW (lossless)",        "tiff-lzw",         False),
+        ])
+        w, h = self._current.size
+        group("Sizes (longest side)", sizes, [(f"Original  {w}×{h}", None, True)] + [
+            (f"{s} px", s, False) for s in (2048, 1024, 512, 256) if s < max(w, h)])
+        def run():
+            presets = [k for k, v in formats.items() if v.get()]
+            fits    = [k for k, v in sizes.items() if v.get()]
+            if not presets or not fits:
+                messagebox.showwarning("Export", "Pick at least one format and size.",
+                                       parent=d); return
+            folder = filedialog.askdirectory(title="Export to folder", parent=d)
+            if not folder: return
+            stem = os.path.splitext(os.path.basename(self._path))[0] or "image"
+            d.destroy()
+            targets = export.targets(os.path.join(folder, stem), presets, fits)
+            self._export(targets, f"export {len(targets)} files")
+        tk.Button(d, text="Export", command=run, bg=C["accent"], fg="white",
+                  relief="flat", padx=20, pady=7,
+                  font=("Segoe UI", 10, "bold")).pack(pady=14)
 
+    def _save_tiled(self):
+        out = filedialog.asksaveasfilename(
+            defaultextension=".tif", filetypes=[("TIFF","*.tif *.tiff")])
+        if not out: return
+        src, nodes = self._source, self._graph.recipe()
+        scale = src.size[0] / self._original.width     # proxy px → full px
+        self._executor.submit(
+            f"save {os.path.basename(out)} (tiled)",
+            lambda job: tiled.process(src, nodes, out, scale, job=job),
+            lambda _: self._status_var.set(f"Saved → {out}"),
+            lambda exc: messagebox.showerror("Error", str(exc)))
+
+    # history helpers 
     def _undo(self):
-        if not self._history:
+        self._queue.cancel()
+        if self._graph is None or not self._graph.can_undo:
             self._status_var.set("Nothing to undo."); return
-        self._redo.append(self._current.copy())
-        self._current = self._history.pop()
-        self._refresh_canvas()
-        self._status_var.set("Undo")
+        self._show_head(self._graph.undo(), "Undo")
 
     def _redo_op(self):
-        if not self._redo:
+        self._queue.cancel()
+        if self._graph is None or not self._graph.can_redo:
             self._status_var.set("Nothing to redo."); return
-        self._history.append(self._current.copy())
-        self._current = self._redo.pop()
-        self._refresh_canvas()
-        self._status_var.set("Redo")
+        self._show_head(self._graph.redo(), "Redo")
+
+    def _show_head(self, img, label):
+        """Show the graph's position: at once if its image is kept, else
+        re-rendered on the op queue, ahead of ops clicked meanwhile."""
+        graph, pos = self._graph, self._graph.pos
+        def show(img):
+            graph.keep(pos, img)
+            self._current, self._shown_pos = img, pos
+            self._image_changed()
+            self._status_var.set(label)
+        if img is not None:
+            show(img); return
+        self._status_var.set(f"{label} …")
+        self._queue.run(label, lambda job: graph.render(pos, job=job), show)
 
     def _reset(self):
         if self._original is None: return
-        self._push_history(self._current)
-        self._current = self._original.copy()
-        self._refresh_canvas()
+        self._queue.cancel()
+        self._graph.push("reset", (), self._original)
+        self._current, self._shown_pos = self._original, self._graph.pos
+        self._image_changed()
         self._status_var.set("Reset to original.")
 
-    # generic operation runner 
-    def _op(self, fn):
+    def _save_recipe(self):
+        if self._graph is None:
+            messagebox.showwarning("No image", "Open an image first."); return
+        out = filedialog.asksaveasfilename(
+            defaultextension=".json", filetypes=[("Recipe","*.json"),("All","*.*")])
+        if out:
+            image_ops.save_recipe(out, self._graph.recipe())
+            self._status_var.set(f"Recipe saved → {out}")
+
+    def _apply_recipe(self):
         if self._current is None:
             messagebox.showwarning("No image", "Open an image first."); return
+        p = filedialog.askopenfilename(
+            title="Apply Recipe", filetypes=[("Recipe","*.json"),("All","*.*")])
+        if not p: return
         try:
-            self._push_history(self._current)
-            result = fn(self._current)
-            if result is None: return          # fn modified in-place (unused)
-            self._current = result.convert("RGB") if result.mode not in ("RGB","RGBA") else result
-            self._refresh_canvas()
+            nodes = image_ops.load_recipe(p)
         except Exception as exc:
-            messagebox.showerror("Error", str(exc))
+            messagebox.showerror("Error", str(exc)); return
+        for name, args in nodes:
+            self._op(name, *args)
+
+    # generic operation runner 
+    def _op(self, name, *args):
+        if self._loading:
+            self._status_var.set("Still loading the image …"); return
+        if self._current is None:
+            messagebox.showwarning("No image", "Open an image first."); return
+        if self._source is not None and image_ops.halo(name, args) is None:
+            w, h = self._source.size
+            messagebox.showinfo(
+                "Not available",
+                f"{image_ops.describe((name, tuple(args)))} needs the whole image "
+                f"and cannot be applied to a {w}×{h} image.")
+            return
+        with tracing.span("op.submit", op=name):
+            self._queue.submit(name, args)
+
+    def _run_ops(self, img, nodes, job):
+        with tracing.span("ops", nodes=len(nodes)) as sp:
+            out = image_ops.run(img, nodes)
+            sp.add(bytes=tracing.nbytes(out))
+        return out
+
+    def _op_done(self, nodes, result):
+        t0 = time.perf_counter()
+        # every node stays a separate undo step even if rendered in one pass
+        with tracing.span("history", nodes=len(nodes)):
+            for i, (name, args) in enumerate(nodes):
+                self._graph.push(name, args, result if i == len(nodes) - 1 else None)
+        self._current, self._shown_pos = result, self._graph.pos
+        self._image_changed()
+        self._checkpoint(result)
+        job = self._queue.last_job
+        self._show_cost(job.label, job.elapsed, time.perf_counter() - t0, result)
+
+    def _checkpoint(self, img):
+        # compressing every tile of a large image takes a while: off the Tk thread
+        graph = self._graph
+        key = graph.due_checkpoint()
+        if key is None: return
+        self._executor.submit(
+            "checkpoint", lambda job: Snapshot(img),
+            lambda snap: graph is self._graph and graph.add_checkpoint(key, snap))
+
+    def _show_cost(self, label, work, ui, img):
+        """Status-bar summary: worker time + UI-thread time, output size."""
+        if len(label) > 32:
+            label = label[:31] + "…"
+        self._cost_var.set(f"⏱ {label}  {(work or 0) * 1000:.0f} ms"
+                           f" + {ui * 1000:.0f} ms UI"
+                           f"  •  {tracing.nbytes(img) / 1e6:.1f} MB")
+
+    def _op_failed(self, exc):
+        self._rewind()
+        self._refresh_canvas()
+        messagebox.showerror("Error", str(exc))
+
+    def _cancel_ops(self):
+        if self._queue.busy:
+            self._queue.cancel()
+            self._rewind()
+            self._status_var.set("Operation cancelled.")
+
+    def _rewind(self):
+        # an undo / redo whose render never arrived: back to what is shown
+        if self._graph is not None:
+            self._graph.pos = self._shown_pos
+
+    def _update_busy(self, ex):
+        job = ex.current
+        if job is None:
+            self._progress.stop(); self._spinning = False
+            self._busy_frame.pack_forget()
+            return
+        self._busy_var.set(f"⏳ {job.label} …  (Esc to cancel)")
+        if not self._busy_frame.winfo_ismapped():
+            self._busy_frame.pack(side="right")
+        if job.progress is None:
+            if not self._spinning:
+                self._progress.config(mode="indeterminate")
+                self._progress.start(15); self._spinning = True
+        else:
+            if self._spinning:
+                self._progress.stop(); self._spinning = False
+            self._progress.config(mode="determinate", value=job.progress * 100)
+
+    def _on_close(self):
+        self._executor.shutdown()
+        self.destroy()
+
+    # tracing / profiling 
+    def _diag_labels(self):
+        self._trace_btn.config(
+            text=f"Tracing: {'on' if tracing.enabled() else 'off'}  (F8)")
+        self._profile_btn.config(
+            text=("Stop Profiler …" if tracing.profiling() else "Start Profiler") + "  (F9)")
+
+    def _toggle_tracing(self):
+        tracing.enable(not tracing.enabled())
+        self._diag_labels()
+        self._status_var.set(f"Tracing {'on' if tracing.enabled() else 'off'}.")
+
+    def _export_trace(self):
+        if not tracing.spans():
+            messagebox.showinfo("Trace", "No spans recorded yet — turn tracing on (F8)."); return
+        out = filedialog.asksaveasfilename(
+            defaultextension=".json", filetypes=[("Chrome trace","*.json"),("All","*.*")])
+        if out:
+            n = tracing.export_chrome(out)
+            self._status_var.set(f"Trace ({n} events) → {out}  — open in ui.perfetto.dev")
+
+    def _toggle_profiler(self):
+        if not tracing.profiling():
+            tracing.start_profile()
+            self._diag_labels()
+            self._status_var.set("Profiling …  (F9 to stop)")
+            return
+        out = filedialog.asksaveasfilename(
+            title="Save profile (cancel to only view)", defaultextension=".prof",
+            filetypes=[("cProfile","*.prof"),("All","*.*")])
+        report = tracing.stop_profile(out or None)
+        self._diag_labels()
+        self._status_var.set(f"Profile saved → {out}" if out else "Profiler stopped.")
+        d = tk.Toplevel(self); d.title("Profile"); d.configure(bg=C["bg"])
+        txt = tk.Text(d, bg=C["panel"], fg=C["text"], font=("Consolas", 9),
+                      width=110, height=32, relief="flat", wrap="none")
+        txt.insert("1.0", report); txt.config(state="disabled")
+        txt.pack(fill="both", expand=True, padx=8, pady=8)
 
     # canvas refresh 
-    def _refresh_canvas(self):
-        if self._current is None: return
+    def _image_changed(self):
+        self._version += 1
+        self._refresh_canvas()
+        if self._inspect:
+            self._inspect()
+        if self._hist_panel:
+            self._hist_panel()
+
+    def _refresh_canvas(self, draft=False):
+        """Render only the visible part of the image; drafts get a HQ pass later."""
+        if self._current is None or self._loading: return
+        with tracing.span("display", draft=draft):
+            self._draw(draft)
+        if draft:
+            self._schedule_hq()
+
+    def _draw(self, draft):
+        cw = max(1, self._canvas.winfo_width())
+        ch = max(1, self._canvas.winfo_height())
+        w = max(1, int(self._current.width  * self._zoom))
+        h = max(1, int(self._current.height * self._zoom))
+        # centre small images, scroll large ones
+        self._view_x = min(max(0, self._view_x), max(0, w - cw))
+        self._view_y = min(max(0, self._view_y), max(0, h - ch))
+        ox = (cw - w) // 2 if w <= cw else -self._view_x
+        oy = (ch - h) // 2 if h <= ch else -self._view_y
+        box = (max(0, -ox), max(0, -oy), min(w, cw - ox), min(h, ch - oy))
+        with tracing.span("render") as sp:
+            disp = self._preview.render(self._current, self._version, self._zoom,
+                                        box, draft=draft)
+            sp.add(bytes=tracing.nbytes(disp))
+        with tracing.span("photoimage"):
+            self._tk_img = ImageTk.PhotoImage(disp)
         self._canvas.delete("all")
-        w = int(self._current.width  * self._zoom)
-        h = int(self._current.height * self._zoom)
-        disp = self._current.resize((max(1,w), max(1,h)), Image.LANCZOS)
-        self._tk_img = ImageTk.PhotoImage(disp)
-        cx = max(self._canvas.winfo_width()  // 2, w // 2)
-        cy = max(self._canvas.winfo_height() // 2, h // 2)
-        self._canvas.create_image(cx, cy, image=self._tk_img, anchor="center")
-        self._img_canvas_offset = (cx - w//2, cy - h//2)
+        self._canvas.create_image(ox + box[0], oy + box[1],
+                                  image=self._tk_img, anchor="nw")
+        self._img_canvas_offset = (ox, oy)
+
+    def _schedule_hq(self):
+        if self._hq_job is not None:
+            self.after_cancel(self._hq_job)
+        self._hq_job = self.after(DRAFT_DELAY_MS, self._hq_render)
+
+    def _hq_render(self):
+        self._hq_job = None
+        self._refresh_canvas()
 
     def _zoom_by(self, factor):
+        if self._current is None: return
+        old = self._zoom
         self._zoom = max(0.05, min(self._zoom * factor, 10.0))
         self._zoom_var.set(f"{int(self._zoom*100)} %")
-        self._refresh_canvas()
+        # keep the viewport centre fixed while zooming
+        cw, ch = self._canvas.winfo_width(), self._canvas.winfo_height()
+        k = self._zoom / old
+        self._view_x = int((self._view_x + cw / 2) * k - cw / 2)
+        self._view_y = int((self._view_y + ch / 2) * k - ch / 2)
+        self._refresh_canvas(draft=True)
+
+    def _pan_start(self, event):
+        self._pan_from = (event.x, event.y, self._view_x, self._view_y)
+
+    def _pan_move(self, event):
+        if self._current is None or self._pan_from is None: return
+        x, y, vx, vy = self._pan_from
+        self._view_x = vx - (event.x - x)
+        self._view_y = vy - (event.y - y)
+        self._refresh_canvas(draft=True)
+
+    def _pixel_buffer(self):
+        key = (id(self._current), self._version)
+        if self._pixels[0] != key:
+            self._pixels = (key, analysis.PixelBuffer(self._current))
+        return self._pixels[1]
 
     def _on_mouse_move(self, event):
-        if self._current is None: return
+        # Motion fires far more often than the screen refreshes
+        self._hover = (event.x, event.y)
+        if self._hover_job is None:
+            self._hover_job = self.after(FRAME_MS, self._hover_update)
+
+    def _hover_update(self):
+        self._hover_job = None
+        if self._current is None or self._hover is None: return
         ox, oy = self._img_canvas_offset if hasattr(self, "_img_canvas_offset") else (0,0)
-        px = int((event.x - ox) / self._zoom)
-        py = int((event.y - oy) / self._zoom)
+        px = int((self._hover[0] - ox) / self._zoom)
+        py = int((self._hover[1] - oy) / self._zoom)
         if 0 <= px < self._current.width and 0 <= py < self._current.height:
-            pixel = self._current.getpixel((px, py))
-            if isinstance(pixel, int): pixel = (pixel, pixel, pixel)
-            r,g,b = pixel[:3]
+            if NP_OK:
+                r, g, b = self._pixel_buffer().pixel(px, py)
+            else:
+                pixel = self._current.getpixel((px, py))
+                if isinstance(pixel, int): pixel = (pixel, pixel, pixel)
+                r, g, b = pixel[:3]
             self._pixel_var.set(f"({px}, {py})  R:{r} G:{g} B:{b}  #{r:02x}{g:02x}{b:02x}")
+            if self._inspect:
+                self._inspect(px, py)
         else:
             self._pixel_var.set("")
 
-    # image operations 
-    def _apply_sepia(self, img):
-        gray = img.convert("L")
-        return Image.merge("RGB", [
-            gray.point(lambda p: min(int(p * 1.08), 255)),
-            gray.point(lambda p: min(int(p * 0.84), 255)),
-            gray.point(lambda p: min(int(p * 0.66), 255)),
-        ])
-
-    def _channel(self, img, ch):
-        r = img.convert("RGB")
-        channels = list(r.split())
-        for i in range(3):
-            if i != ch:
-                channels[i] = channels[i].point(lambda _: 0)
-        return Image.merge("RGB", channels)
-
-    def _square_crop(self, img):
-        s = min(img.size)
-        left = (img.width  - s) // 2
-        top  = (img.height - s) // 2
-        return img.crop((left, top, left+s, top+s))
-
     # dialogs 
     def _dlg_rotate(self):
         self._simple_dialog(
             "Custom Rotate", "Angle (degrees):", 0.0, -360, 360,
-            lambda v: self._op(lambda i: i.rotate(v, expand=True, fillcolor=0)))
+            lambda v: ("rotate", (v,)))
 
-    def _dlg_enhance(self, name, Enhancer):
+    def _dlg_enhance(self, name, kind):
+        if self._current is None: return
         d = tk.Toplevel(self); d.title(name); d.configure(bg=C["bg"])
         d.resizable(False, False); d.grab_set()
         var = tk.DoubleVar(value=1.0)
@@ -421,8 +847,10 @@ class ImageApp(tk.Tk):
         lbl.pack(side="left", padx=6)
         var.trace_add("write", lambda *_: lbl.config(
             text=f"{var.get():.2f}"))
+        var.trace_add("write", self._live_preview(
+            d, lambda: ("enhance", (kind, var.get()))))
         def apply():
-            self._op(lambda i: Enhancer(i).enhance(var.get()))
+            self._op("enhance", kind, var.get())
             d.destroy()
         tk.Button(d, text="Apply", command=apply, bg=C["accent"], fg="white",
                   relief="flat", padx=20, pady=7,
@@ -446,12 +874,14 @@ class ImageApp(tk.Tk):
             if keep.get() and orig_w:
                 h_var.set(int(w_var.get() * orig_h / orig_w))
         w_var.trace_add("write", sync_h)
+        refresh = self._live_preview(
+            d, lambda: ("resize", (w_var.get(), h_var.get())))
+        w_var.trace_add("write", refresh); h_var.trace_add("write", refresh)
         tk.Checkbutton(d, text="Keep aspect ratio", variable=keep,
                        bg=C["bg"], fg=C["text"], selectcolor=C["panel"],
                        activebackground=C["bg"]).pack(padx=24, anchor="w")
         def apply():
-            self._op(lambda i: i.resize((max(1,w_var.get()), max(1,h_var.get())),
-                                         Image.LANCZOS))
+            self._op("resize", w_var.get(), h_var.get())
             d.destroy()
         tk.Button(d, text="Resize", command=apply, bg=C["accent"], fg="white",
                   relief="flat", padx=20, pady=7).pack(pady=14)
@@ -475,7 +905,7 @@ class ImageApp(tk.Tk):
         def apply():
             box = (vars_["Left:"].get(), vars_["Top:"].get(),
                    vars_["Right:"].get(), vars_["Bottom:"].get())
-            self._op(lambda i: i.crop(box))
+            self._op("crop", box)
             d.destroy()
         tk.Button(d, text="Crop", command=apply, bg=C["accent"], fg="white",
                   relief="flat", padx=20, pady=7).pack(pady=14)
@@ -483,8 +913,7 @@ class ImageApp(tk.Tk):
     def _dlg_border(self):
         self._simple_dialog(
             "Add Border", "Border size (px):", 20, 1, 200,
-            lambda v: self._op(
-                lambda i: ImageOps.expand(i, border=int(v), fill=(0,0,0))))
+            lambda v: ("border", (int(v),)))
 
     def _dlg_text(self):
         if self._current is None: return
@@ -501,23 +930,15 @@ class ImageApp(tk.Tk):
                      width=18, relief="flat").pack(side="left")
             vars_[label] = v
         def apply():
-            def draw(img):
-                out = img.copy().convert("RGBA")
-                overlay = Image.new("RGBA", out.size, (0,0,0,0))
-                draw_ctx = ImageDraw.Draw(overlay)
-                try:
-                    color = vars_["Color (hex):"].get()
-                    size  = int(vars_["Font size:"].get())
-                    draw_ctx.text(
-                        (int(vars_["X:"].get()), int(vars_["Y:"].get())),
-                        vars_["Text:"].get(), fill=color,
-                        font=ImageFont.load_default(size=size))
-                except Exception:
-                    draw_ctx.text(
-                        (int(vars_["X:"].get()), int(vars_["Y:"].get())),
-                        vars_["Text:"].get(), fill=vars_["Color (hex):"].get())
-                return Image.alpha_composite(out, overlay).convert("RGB")
-            self._op(draw); d.destroy()
+            try:
+                x, y = int(vars_["X:"].get()), int(vars_["Y:"].get())
+                size = int(vars_["Font size:"].get())
+            except ValueError:
+                messagebox.showerror("Error", "X, Y and font size must be integers.")
+                return
+            self._op("text", vars_["Text:"].get(), x, y, size,
+                     vars_["Color (hex):"].get())
+            d.destroy()
         tk.Button(d, text="Draw Text", command=apply, bg=C["accent"], fg="white",
                   relief="flat", padx=20, pady=7).pack(pady=14)
 
@@ -533,22 +954,12 @@ class ImageApp(tk.Tk):
             tk.Entry(row, textvariable=var, bg=C["panel"], fg=C["text"],
                      width=6, relief="flat").pack(side="left")
         def apply():
-            def draw(img):
-                out = img.copy().convert("RGB")
-                draw_ctx = ImageDraw.Draw(out)
-                W, H = out.size
-                for r in range(1, rows_v.get()):
-                    y = r * H // rows_v.get()
-                    draw_ctx.line([(0,y),(W,y)], fill="#ff0000", width=2)
-                for c in range(1, cols_v.get()):
-                    x = c * W // cols_v.get()
-                    draw_ctx.line([(x,0),(x,H)], fill="#ff0000", width=2)
-                return out
-            self._op(draw); d.destroy()
+            self._op("grid", rows_v.get(), cols_v.get()); d.destroy()
         tk.Button(d, text="Draw Grid", command=apply, bg=C["accent"], fg="white",
                   relief="flat", padx=20, pady=7).pack(pady=14)
 
-    def _simple_dialog(self, title, label, default, lo, hi, apply_fn):
+    def _simple_dialog(self, title, label, default, lo, hi, node):
+        if self._current is None: return
         d = tk.Toplevel(self); d.title(title); d.configure(bg=C["bg"])
         d.resizable(False, False); d.grab_set()
         var = tk.DoubleVar(value=default)
@@ -559,11 +970,49 @@ class ImageApp(tk.Tk):
                   orient="horizontal", length=260).pack(side="left")
         tk.Label(row, textvariable=var, bg=C["bg"], fg=C["highlight"],
                  font=("Consolas", 10), width=6).pack(side="left", padx=6)
+        var.trace_add("write", self._live_preview(d, lambda: node(var.get())))
         def apply():
-            apply_fn(var.get()); d.destroy()
+            name, args = node(var.get())
+            self._op(name, *args); d.destroy()
         tk.Button(d, text="Apply", command=apply, bg=C["accent"], fg="white",
                   relief="flat", padx=20, pady=7).pack(pady=14)
 
+    # live dialog preview 
+    def _live_preview(self, d, node):
+        """Show node() applied to a screen-sized proxy while dialog d is open.
+
+        Returns a trigger for variable traces; redraws are coalesced to one
+        per frame and the real image comes back when d is closed."""
+        size = (max(1, self._canvas.winfo_width()),
+                max(1, self._canvas.winfo_height()))
+        live = LivePreview(
+            self._preview.proxy(self._current, self._version, size),
+            self._current.size)
+        job = [None]
+        def draw():
+            job[0] = None
+            try:
+                out = live.render(*node())
+            except Exception:
+                return                         # half-typed entry, bad value …
+            self._tk_img = ImageTk.PhotoImage(out)
+            self._canvas.delete("all")
+            self._canvas.create_image(size[0] // 2, size[1] // 2,
+                                      image=self._tk_img, anchor="center")
+        def trigger(*_):
+            if job[0] is None:
+                job[0] = self.after(FRAME_MS, draw)
+        def on_destroy(e):
+            # every way out (Apply, a refused or cancelled op, closing the
+            # window) puts the real image back; a result redraws it later
+            if e.widget is not d: return
+            if job[0] is not None:
+                self.after_cancel(job[0]); job[0] = None
+            self._refresh_canvas()
+        d.bind("<Destroy>", on_destroy, add="+")
+        trigger()
+        return trigger
+
     # info & analysis 
     def _show_info(self):
         if self._current is None: return
@@ -576,97 +1025,159 @@ class ImageApp(tk.Tk):
             f"Current:   {self._current.width} × {self._current.height} px\n"
             f"Mode:      {self._current.mode}\n"
             f"Format:    {getattr(orig, 'format', 'N/A')}\n\n"
-            f"Undo stack: {len(self._history)} step(s)\n"
-            f"Zoom:      {int(self._zoom*100)} %"
+            f"Undo stack: {len(self._graph)} step(s)\n"
+            f"Checkpoints: {self._graph.mem_bytes/1024/1024:.1f} MB in RAM, "
+            f"{self._graph.disk_bytes/1024/1024:.1f} MB on disk\n"
+            f"Zoom:      {int(self._zoom*100)} %\n\n"
+            f"Image cache: {image_cache.CACHE.summary()}"
         )
         messagebox.showinfo("Image Info", info)
 
     def _show_pixel_inspector(self):
         if self._current is None: return
-        img = self._current.convert("RGB")
-        W, H = img.size
-        sample = 5
+        if not NP_OK:
+            messagebox.showerror("Missing", "pip install numpy"); return
+        CELLS = 480
         d = tk.Toplevel(self); d.title("Pixel Grid Inspector"); d.configure(bg=C["bg"])
-        d.geometry("480x480"); d.grab_set()
-
-        cv = tk.Canvas(d, bg=C["bg"], highlightthickness=0)
+        d.geometry(f"{CELLS}x{CELLS + 40}")
+        cv = tk.Canvas(d, bg=C["bg"], width=CELLS, height=CELLS, highlightthickness=0)
         cv.pack(fill="both", expand=True)
-
-        zoom_v = tk.IntVar(value=sample)
-
-        def draw_grid(sz):
+        info = tk.StringVar(value="Hover the image to inspect")
+        zoom_v = tk.IntVar(value=5)
+        # follows the mouse; starts at the image centre
+        state = {"at": (self._current.width // 2, self._current.height // 2),
+                 "n": 0, "labels": [], "photo": None}
+
+        def layout(n):
+            # canvas items are created once per grid size and reused
             cv.delete("all")
-            patch = img.resize((sz*20, sz*20), Image.NEAREST)
-            import io as _io
-            buf = _io.BytesIO(); patch.save(buf, format="PNG"); buf.seek(0)
-            tk_img = ImageTk.PhotoImage(Image.open(buf))
+            cell = CELLS // n
+            state["photo"] = cv.create_image(0, 0, anchor="nw")
+            state["labels"] = [
+                cv.create_text(c*cell + cell//2, r*cell + cell//2,
+                               font=("Consolas", 7))
+                for r in range(n) for c in range(n)]
+            cv.create_rectangle(0, 0, cell, cell, outline=C["highlight"],
+                                width=2, tags="cursor")
+            state["n"] = n
+
+        def update(px=None, py=None):
+            n = zoom_v.get()
+            if px is not None:
+                state["at"] = (px, py)
+            if n != state["n"]:
+                layout(n)
+            cell = CELLS // n
+            buf = self._pixel_buffer()
+            state["at"] = (min(state["at"][0], buf.width - 1),
+                           min(state["at"][1], buf.height - 1))
+            block, x0, y0 = buf.patch(*state["at"], n)
+            tk_img = ImageTk.PhotoImage(analysis.magnify(block, cell))
             cv._ref = tk_img
-            cv.create_image(0, 0, image=tk_img, anchor="nw")
-            step = patch.width // sz
-            for r in range(sz):
-                for c in range(sz):
-                    x0, y0 = c*step, r*step
-                    px = img.getpixel((min(c, W-1), min(r, H-1)))
-                    if isinstance(px, int): px=(px,px,px)
-                    bright = (px[0]*299 + px[1]*587 + px[2]*114) // 1000
-                    fg = "black" if bright > 128 else "white"
-                    cv.create_text(x0+step//2, y0+step//2,
-                                   text=f"{px[0]}\n{px[1]}\n{px[2]}",
-                                   fill=fg, font=("Consolas", 7))
+            cv.itemconfigure(state["photo"], image=tk_img)
+            fgs = analysis.text_colors(block)
+            rgb = block.reshape(-1, 3).tolist()
+            for item, (r, g, b), fg in zip(state["labels"], rgb, fgs.ravel()):
+                cv.itemconfigure(item, text=f"{r}\n{g}\n{b}", fill=fg)
+            cx, cy = state["at"][0] - x0, state["at"][1] - y0
+            cv.coords("cursor", cx*cell, cy*cell, (cx+1)*cell, (cy+1)*cell)
+            info.set(f"Centre ({state['at'][0]}, {state['at'][1]})  •  {n}×{n}")
+
+        def on_slide(_):
+            if zoom_v.get() != state["n"]:  # the scale reports fractional steps
+                update()
+
+        def close():
+            self._inspect = None
+            d.destroy()
 
         bar = tk.Frame(d, bg=C["bg"]); bar.pack(fill="x")
         tk.Label(bar, text="Sample size:", bg=C["bg"], fg=C["text"]).pack(side="left",padx=8)
         ttk.Scale(bar, from_=3, to=20, variable=zoom_v, orient="horizontal",
-                  length=160, command=lambda _: draw_grid(zoom_v.get())).pack(side="left")
-        draw_grid(sample)
+                  length=160, command=on_slide).pack(side="left")
+        tk.Label(bar, textvariable=info, bg=C["bg"], fg=C["subtext"],
+                 font=("Consolas", 9)).pack(side="left", padx=8)
+        d.protocol("WM_DELETE_WINDOW", close)
+        self._inspect = update
+        update()
+
+    def _histogram(self):
+        key = (id(self._current), self._version)
+        if self._hist[0] != key:
+            self._hist = (key, histogram.channels(self._current))
+        return self._hist[1]
 
     def _show_histogram(self):
-        if not MPL_OK:
-            messagebox.showerror("Missing", "pip install matplotlib numpy"); return
-        img = self._current.convert("RGB")
-        arr = np.array(img)
-        fig, ax = plt.subplots(figsize=(6, 3), facecolor="#0d0d1a")
-        ax.set_facecolor("#13132b")
-        for i, (color, label) in enumerate(
-                zip(["#ef4444","#22c55e","#3b82f6"], ["Red","Green","Blue"])):
-            ax.hist(arr[:,:,i].ravel(), bins=256, color=color,
-                    alpha=0.7, label=label, histtype="stepfilled")
-        ax.legend(facecolor="#1a1a3e", edgecolor="none", labelcolor="white")
-        ax.tick_params(colors=C["subtext"]); ax.set_xlim(0, 255)
-        for spine in ax.spines.values(): spine.set_color(C["border"])
-        fig.tight_layout()
-        buf = io.BytesIO(); fig.savefig(buf, format="png"); buf.seek(0); plt.close(fig)
-        histo_img = Image.open(buf)
-        # show in a new window
+        if self._current is None: return
+        if self._hist_panel:                    # already open: just refresh
+            self._hist_panel(); return
         d = tk.Toplevel(self); d.title("RGB Histogram"); d.configure(bg=C["bg"])
-        tk_img = ImageTk.PhotoImage(histo_img)
-        lbl = tk.Label(d, image=tk_img, bg=C["bg"]); lbl.pack()
-        lbl._ref = tk_img
+        d.geometry("600x300")
+        cv = tk.Canvas(d, bg=C["panel"], highlightthickness=0)
+        cv.pack(fill="both", expand=True, padx=8, pady=(8, 0))
+        log_v = tk.BooleanVar(value=False)
+
+        def redraw():
+            if self._current is None: return
+            hists = self._histogram()
+            colors = histogram.RGB_COLORS if len(hists) == 3 else (C["text"],)
+            histogram.draw(cv, hists, colors, log=log_v.get())
+
+        def close():
+            self._hist_panel = None
+            d.destroy()
+
+        bar = tk.Frame(d, bg=C["bg"]); bar.pack(fill="x", pady=4)
+        tk.Checkbutton(bar, text="Log scale", variable=log_v, command=redraw,
+                       bg=C["bg"], fg=C["text"], selectcolor=C["card"],
+                       activebackground=C["bg"]).pack(side="left", padx=8)
+        cv.bind("<Configure>", lambda e: redraw())
+        d.protocol("WM_DELETE_WINDOW", close)
+        self._hist_panel = redraw
 
     def _show_palette(self):
         if self._current is None: return
-        img = self._current.convert("RGB")
-        colors = img.getcolors(maxcolors=img.width * img.height)
-        if colors:
-            colors.sort(key=lambda x: -x[0])
-            top = colors[:16]
-        else:
-            top = []
+        if not NP_OK:
+            messagebox.showerror("Missing", "pip install numpy"); return
         d = tk.Toplevel(self); d.title("Top Colors"); d.configure(bg=C["bg"])
-        tk.Label(d, text="Most Common Colors (top 16)", bg=C["bg"], fg=C["text"],
+        title = tk.StringVar(value="Most Common Colors (top 16)")
+        tk.Label(d, textvariable=title, bg=C["bg"], fg=C["text"],
                  font=("Segoe UI", 11, "bold")).pack(pady=(14,6))
+        mode_v = tk.StringVar(value="common")
+        modes = tk.Frame(d, bg=C["bg"]); modes.pack()
+        for mode in analysis.PALETTE_MODES:
+            tk.Radiobutton(modes, text=mode, value=mode, variable=mode_v,
+                           command=lambda: show(), bg=C["bg"], fg=C["text"],
+                           selectcolor=C["card"], activebackground=C["bg"]
+                           ).pack(side="left", padx=6)
         grid = tk.Frame(d, bg=C["bg"]); grid.pack(padx=16, pady=8)
-        for idx, (count, (r,g,b)) in enumerate(top):
-            col = idx % 8; row = idx // 8
-            hex_ = f"#{r:02x}{g:02x}{b:02x}"
-            bright = (r*299 + g*587 + b*114) // 1000
-            fg = "black" if bright > 128 else "white"
-            tk.Label(grid, bg=hex_, fg=fg, text=hex_,
-                     font=("Consolas", 8), width=9, height=3,
-                     relief="flat").grid(row=row, column=col, padx=3, pady=3)
+
+        def fill(mode, top):
+            if not d.winfo_exists(): return
+            for w in grid.winfo_children(): w.destroy()
+            title.set("Most Common Colors (top 16)" if mode == "common"
+                      else f"Dominant Colors ({mode})")
+            for idx, (share, (r,g,b)) in enumerate(top):
+                col = idx % 8; row = idx // 8
+                hex_ = f"#{r:02x}{g:02x}{b:02x}"
+                bright = (r*299 + g*587 + b*114) // 1000
+                fg = "black" if bright > 128 else "white"
+                tk.Label(grid, bg=hex_, fg=fg, text=f"{hex_}\n{share:.1%}",
+                         font=("Consolas", 8), width=9, height=3,
+                         relief="flat").grid(row=row, column=col, padx=3, pady=3)
+
+        def show():
+            mode = mode_v.get()
+            buf = self._pixel_buffer()
+            # counting runs off the Tk thread; results are cached per version
+            self._executor.submit(f"palette ({mode})",
+                                  lambda job: analysis.palette(buf, mode),
+                                  lambda top: fill(mode, top),
+                                  lambda exc: messagebox.showerror("Error", str(exc)))
+
         tk.Button(d, text="Close", command=d.destroy, bg=C["accent"], fg="white",
                   relief="flat", padx=14, pady=5).pack(pady=10)
-
+        show()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,108 @@
+"""
+image_cache.py — Process-wide LRU cache of decoded images
+Decoded images and display-size previews are kept by (path, mtime, file
+size), so flipping between recently opened files skips the disk and the
+decoder; a file changed on disk gets a new key. The least recently used
+entries are evicted once the byte budget is exceeded.
+
+Cached images are shared, not copied: callers must not modify them in
+place (the image ops never do). audio_io keeps decoded audio in a second
+ImageCache with its own sizeof().
+
+Set MM_IMAGE_CACHE_MB to change the budget (default 1024).
+"""
+
+import os, threading
+from collections import OrderedDict
+
+BUDGET = int(os.environ.get("MM_IMAGE_CACHE_MB", 1024)) << 20
+
+
+def nbytes(img):
+    # Pillow keeps 3-band images in 4-byte pixels
+    bands = len(img.getbands())
+    return img.width * img.height * (4 if bands == 3 else bands)
+
+
+def file_key(path):
+    st = os.stat(path)
+    return os.path.abspath(path), st.st_mtime_ns, st.st_size
+
+
+class ImageCache:
+    def __init__(self, budget=BUDGET, sizeof=nbytes):
+        self.budget  = budget
+        self.sizeof  = sizeof
+        self.used    = 0
+        self.hits    = 0
+        self.misses  = 0
+        self.evicted = 0
+        self._items  = OrderedDict()         # key -> (image, bytes)
+        self._lock   = threading.Lock()
+
+    def get(self, path, variant="full"):
+        """Cached image for path, or None (counted as a miss)."""
+        try:
+            key = (file_key(path), variant)
+        except OSError:
+            return None
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def has(self, path, variant="full"):
+        """Whether get() would hit; not counted in the stats."""
+        try:
+            return (file_key(path), variant) in self._items
+        except OSError:
+            return False
+
+    def put(self, path, img, variant="full"):
+        size = self.sizeof(img)
+        if size > self.budget:
+            return img
+        key = (file_key(path), variant)
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.used -= old[1]
+            self._items[key] = (img, size)
+            self.used += size
+            while self.used > self.budget:
+                _, (_, freed) = self._items.popitem(last=False)
+                self.used -= freed
+                self.evicted += 1
+        return img
+
+    def load(self, path, decode, variant="full"):
+        """get() or decode(path) and put(); decode runs outside the lock."""
+        img = self.get(path, variant)
+        if img is None:
+            img = self.put(path, decode(path), variant)
+        return img
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.used = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"entries": len(self._items), "bytes": self.used,
+                "budget": self.budget, "hits": self.hits, "misses": self.misses,
+                "evicted": self.evicted,
+                "hit_rate": self.hits / total if total else 0.0}
+
+    def summary(self):
+        s = self.stats()
+        return (f"{s['entries']} entries, {s['bytes'] / 2**20:.0f} / "
+                f"{s['budget'] / 2**20:.0f} MB, {s['hits']} hits / "
+                f"{s['misses']} misses ({100 * s['hit_rate']:.0f}%)")
+
+
+CACHE = ImageCache()
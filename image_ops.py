@@ -0,0 +1,323 @@
+"""
+image_ops.py — Named, parametrized image operations
+Every sidebar action is an (op name, args) node so it can be recorded,
+replayed at another resolution and saved as a recipe.
+"""
+
+import json
+
+from PIL import Image, ImageFilter, ImageEnhance, ImageOps, ImageDraw, ImageFont
+
+import color_pipeline as cp
+import geometry
+import parallel
+
+OPS = {}
+
+ENHANCERS = {
+    "brightness": ImageEnhance.Brightness,
+    "contrast":   ImageEnhance.Contrast,
+    "saturation": ImageEnhance.Color,
+    "sharpness":  ImageEnhance.Sharpness,
+}
+
+KERNELS = {
+    "sharpen": ImageFilter.SHARPEN,
+    "edges":   ImageFilter.FIND_EDGES,
+    "emboss":  ImageFilter.EMBOSS,
+    "smooth":  ImageFilter.SMOOTH_MORE,
+    "detail":  ImageFilter.DETAIL,
+    "contour": ImageFilter.CONTOUR,
+}
+
+
+class Op:
+    def __init__(self, name, fn, px_args=(), combine=None, color=None, halo=None,
+                 split=None):
+        self.name    = name
+        self.fn      = fn
+        self.px_args = px_args             # arg positions measured in pixels
+        self.combine = combine             # (args, args) -> args | None (identity)
+        self.color   = color               # (*args) -> color_pipeline steps | None
+        self.halo    = halo                # int | (*args) -> int | None; see halo()
+        self.split   = split               # "threads" | "processes" | None; see parallel
+
+    def scaled_args(self, args, scale):
+        if scale == 1.0 or not self.px_args:
+            return args
+        def sc(v):
+            if isinstance(v, (tuple, list)):
+                return type(v)(sc(x) for x in v)
+            return max(1, int(round(v * scale))) if v else v
+        return tuple(sc(a) if i in self.px_args else a for i, a in enumerate(args))
+
+
+def register(name, px_args=(), combine=None, color=None, halo=None, split=None):
+    def deco(fn):
+        OPS[name] = Op(name, fn, px_args, combine, color, halo, split)
+        return fn
+    return deco
+
+
+def color_steps(name, args):
+    op = OPS[name]
+    return op.color(*args) if op.color else None
+
+
+def halo(name, args):
+    """Rows of context an output row needs on either side, or None if the
+    op depends on the whole image (global statistics, size changes)."""
+    h = OPS[name].halo
+    return h(*args) if callable(h) else h
+
+
+def _normalize(out):
+    return out.convert("RGB") if out.mode not in ("RGB", "RGBA") else out
+
+
+def apply_op(img: Image.Image, name, args=(), scale=1.0) -> Image.Image:
+    op = OPS[name]
+    steps = color_steps(name, args)
+    if steps is not None:
+        return _normalize(cp.ColorPipeline(steps).apply(img))
+    args = op.scaled_args(tuple(args), scale)
+    h = halo(name, args) if op.split else None
+    if h:
+        # neighbourhood filter: strips with h rows of context, one per core
+        out = parallel.filter_image(img, name, args, h, op.split == "processes")
+    else:
+        out = op.fn(img, *args)
+    return _normalize(out)
+
+
+def run(img: Image.Image, nodes, scale=1.0) -> Image.Image:
+    """Apply nodes in order, fusing consecutive pointwise color nodes into
+    one lookup pass and consecutive geometric nodes into one transform."""
+    nodes, i = list(nodes), 0
+    while i < len(nodes):
+        j = i + 1
+        if color_steps(*nodes[i]) is not None:
+            while j < len(nodes) and color_steps(*nodes[j]) is not None:
+                j += 1
+            pipe = cp.ColorPipeline()
+            for name, args in nodes[i:j]:
+                pipe.then(color_steps(name, args))
+            img = _normalize(pipe.apply(img))
+        elif nodes[i][0] in geometry.GEOMETRIC:
+            while j < len(nodes) and nodes[j][0] in geometry.GEOMETRIC:
+                j += 1
+            run_ = [(name, OPS[name].scaled_args(tuple(args), scale))
+                    for name, args in nodes[i:j]]
+            img = _normalize(geometry.run(img, run_, apply_op))
+        else:
+            img = apply_op(img, *nodes[i], scale)
+        i = j
+    return img
+
+
+def coalesce(prev, node):
+    """Merge two consecutive nodes: [] if they cancel out, [merged] if they
+    fold into one, None if they must both run."""
+    (pname, pargs), (name, args) = prev, node
+    op = OPS.get(name)
+    if pname != name or op is None or op.combine is None:
+        return None
+    merged = op.combine(pargs, args)
+    return [] if merged is None else [(name, merged)]
+
+
+def describe(node):
+    name, args = node
+    return f"{name}({', '.join(map(str, args))})" if args else name
+
+
+# recipes
+def save_recipe(path, nodes):
+    with open(path, "w") as f:
+        json.dump([[name, list(args)] for name, args in nodes], f, indent=1)
+
+
+def load_recipe(path):
+    with open(path) as f:
+        data = json.load(f)
+    for name, _ in data:
+        if name not in OPS:
+            raise ValueError(f"Unknown operation in recipe: {name}")
+    return [(name, tuple(args)) for name, args in data]
+
+
+# ----------------------------------------------------------------------------
+#  rotate & flip
+def _add_turns(a, b):
+    deg = (a[0] + b[0]) % 360
+    return (deg,) if deg else None
+
+def _cancel_out(a, b):
+    return None
+
+@register("turn", combine=_add_turns)
+def turn(img, degrees):
+    # clockwise quarter turns
+    return img.rotate(-degrees, expand=True)
+
+@register("rotate")
+def rotate(img, angle):
+    return img.rotate(angle, expand=True, fillcolor=0)
+
+@register("flip_h", combine=_cancel_out, halo=0)
+def flip_h(img):
+    return ImageOps.mirror(img)
+
+@register("flip_v", combine=_cancel_out)
+def flip_v(img):
+    return ImageOps.flip(img)
+
+
+#  color
+SEPIA = [[min(int(p * k), 255) for p in range(256)] for k in (1.08, 0.84, 0.66)]
+
+@register("grayscale", color=lambda: [cp.GRAY], halo=0)
+def grayscale(img):
+    return img.convert("L").convert("RGB")
+
+@register("invert", color=lambda: [cp.lut([255 - p for p in range(256)])], halo=0)
+def invert(img):
+    return ImageOps.invert(img.convert("RGB"))
+
+@register("sepia", color=lambda: [cp.GRAY, cp.lut(*SEPIA)], halo=0)
+def sepia(img):
+    gray = img.convert("L")
+    return Image.merge("RGB", [gray.point(t) for t in SEPIA])
+
+@register("solarize",
+          color=lambda: [cp.lut([p if p < 128 else 255 - p for p in range(256)])],
+          halo=0)
+def solarize(img):
+    return ImageOps.solarize(img.convert("RGB"))
+
+def _posterize_steps(bits=3):
+    mask = ~(2 ** (8 - bits) - 1)
+    return [cp.lut([p & mask for p in range(256)])]
+
+@register("posterize", color=_posterize_steps, halo=0)
+def posterize(img, bits=3):
+    return ImageOps.posterize(img.convert("RGB"), bits)
+
+@register("autocontrast")
+def autocontrast(img):
+    return ImageOps.autocontrast(img)
+
+@register("equalize")
+def equalize(img):
+    return ImageOps.equalize(img.convert("RGB"))
+
+def _enhance_steps(kind, factor):
+    if kind == "brightness":
+        return [cp.lut(cp.blend_table(0, factor), alpha=cp.IDENTITY, keep_alpha=True)]
+    if kind == "contrast":
+        return [("contrast", factor)]
+    return None                            # saturation / sharpness mix pixels
+
+# contrast blends towards the mean of the whole image; sharpness uses SMOOTH
+ENHANCE_HALO = {"brightness": 0, "saturation": 0, "sharpness": 1}
+
+@register("enhance", color=_enhance_steps,
+          halo=lambda kind, factor: ENHANCE_HALO.get(kind), split="threads")
+def enhance(img, kind, factor):
+    return ENHANCERS[kind](img).enhance(factor)
+
+
+#  filters
+def _blur_halo(radius=2):
+    # three box passes, each reaching int(box radius) + 1 px, box radius <= radius + .5
+    return 3 * (int(radius + 0.5) + 1)
+
+@register("blur", px_args=(0,), halo=_blur_halo, split="threads")
+def blur(img, radius=2):
+    return img.filter(ImageFilter.GaussianBlur(radius))
+
+@register("kernel", halo=lambda name: KERNELS[name].filterargs[0][1] // 2,
+          split="threads")
+def kernel(img, name):
+    return img.filter(KERNELS[name])
+
+# rank filters hold the GIL, so their strips go to worker processes; sizes
+# scaled to another resolution may come out even, rank filters need odd
+@register("min_filter", px_args=(0,), halo=lambda size=3: size // 2, split="processes")
+def min_filter(img, size=3):
+    return img.filter(ImageFilter.MinFilter(size | 1))
+
+@register("max_filter", px_args=(0,), halo=lambda size=3: size // 2, split="processes")
+def max_filter(img, size=3):
+    return img.filter(ImageFilter.MaxFilter(size | 1))
+
+
+#  crop & resize
+@register("resize", px_args=(0, 1))
+def resize(img, w, h):
+    return img.resize((max(1, w), max(1, h)), Image.LANCZOS)
+
+@register("crop", px_args=(0,))
+def crop(img, box):
+    return img.crop(tuple(box))
+
+@register("square_crop")
+def square_crop(img):
+    s = min(img.size)
+    left = (img.width  - s) // 2
+    top  = (img.height - s) // 2
+    return img.crop((left, top, left+s, top+s))
+
+@register("fit", px_args=(0, 1))
+def fit(img, w, h):
+    return ImageOps.fit(img, (w, h))
+
+
+#  draw / annotate
+@register("border", px_args=(0,))
+def border(img, size):
+    return ImageOps.expand(img, border=int(size), fill=(0,0,0))
+
+@register("text", px_args=(1, 2, 3))
+def text(img, txt, x, y, size, color):
+    out = img.copy().convert("RGBA")
+    overlay = Image.new("RGBA", out.size, (0,0,0,0))
+    draw_ctx = ImageDraw.Draw(overlay)
+    try:
+        draw_ctx.text((int(x), int(y)), txt, fill=color,
+                      font=ImageFont.load_default(size=int(size)))
+    except Exception:
+        draw_ctx.text((int(x), int(y)), txt, fill=color)
+    return Image.alpha_composite(out, overlay).convert("RGB")
+
+@register("grid")
+def grid(img, rows, cols):
+    out = img.copy().convert("RGB")
+    draw_ctx = ImageDraw.Draw(out)
+    W, H = out.size
+    for r in range(1, rows):
+        y = r * H // rows
+        draw_ctx.line([(0,y),(W,y)], fill="#ff0000", width=2)
+    for c in range(1, cols):
+        x = c * W // cols
+        draw_ctx.line([(x,0),(x,H)], fill="#ff0000", width=2)
+    return out
+
+
+#  channels
+def _channel_steps(ch):
+    zero = [0] * 256
+    return [cp.lut(*[cp.IDENTITY if i == ch else zero for i in range(3)])]
+
+@register("channel", color=_channel_steps, halo=0)
+def channel(img, ch):
+    r = img.convert("RGB")
+    channels = list(r.split())
+    for i in range(3):
+        if i != ch:
+            channels[i] = channels[i].point(lambda _: 0)
+    return Image.merge("RGB", channels)
+
+@register("swap_rb", halo=0)
+def swap_rb(img):
+    return Image.merge("RGB", img.convert("RGB").split()[::-1])
@@ -0,0 +1,74 @@
+"""
+loader.py — Fast image opening for the Tk apps
+A screen-sized preview comes first: JPEGs are decoded at 1/2 … 1/8 scale
+straight from the DCT coefficients via draft(), so a first picture shows
+up long before the full-resolution decode, which runs in the background.
+Both are kept in image_cache, so re-opening a recent file skips the decode.
+"""
+
+from PIL import Image
+
+from image_cache import CACHE
+
+DRAFT_FORMATS = {"JPEG", "MPO"}
+
+
+def normalize(img: Image.Image) -> Image.Image:
+    return img if img.mode in ("RGB", "RGBA", "L") else img.convert("RGB")
+
+
+def fit_size(size, max_size):
+    ratio = min(max_size[0] / size[0], max_size[1] / size[1], 1)
+    return max(1, int(size[0] * ratio)), max(1, int(size[1] * ratio))
+
+
+def has_fast_preview(img: Image.Image):
+    return img.format in DRAFT_FORMATS
+
+
+def header(path):
+    """(format, mode) of the file as stored, before normalize(); reads
+    only the header."""
+    with Image.open(path) as im:
+        return im.format, im.mode
+
+
+def preview(path, max_size) -> Image.Image:
+    """Image fitted to max_size, decoded at reduced scale when the format
+    allows it."""
+    return CACHE.load(path, lambda p: _preview(p, max_size),
+                      ("preview", tuple(max_size)))
+
+
+def _preview(path, max_size):
+    with Image.open(path) as im:
+        size = fit_size(im.size, max_size)
+        if has_fast_preview(im):
+            im.draft("RGB" if im.mode == "RGB" else None, size)
+        img = display(im, size)
+        img.load()                       # may be im itself, read before closing
+        return normalize(img)
+
+
+def display(img: Image.Image, max_size) -> Image.Image:
+    """Downscale for display; large factors are first box-reduced."""
+    size = fit_size(img.size, max_size)
+    if size == img.size:
+        return img
+    return img.resize(size, Image.LANCZOS, reducing_gap=3.0)
+
+
+def load_full(path) -> Image.Image:
+    """Full-resolution decode, in an app-supported mode."""
+    return CACHE.load(path, _load_full)
+
+
+def _load_full(path):
+    img = Image.open(path)
+    img.load()
+    return normalize(img)
+
+
+def is_cached(path, max_size=None):
+    """Whether load_full(path), or preview(path, max_size), is a cache hit."""
+    return CACHE.has(path, ("preview", tuple(max_size)) if max_size else "full")
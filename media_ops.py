@@ -0,0 +1,84 @@
+"""
+media_ops.py — Headless audio, video and text operations
+The MultimediaApp tool buttons call these; the benchmark suite drives the
+same functions without a window.
+"""
+
+import os
+from collections import Counter
+
+from backends import Lazy
+
+AudioSegment = Lazy("pydub", "AudioSegment")
+cv2          = Lazy("cv2")
+
+
+# ----------------------------------------------------------------------------
+#  audio
+def load_audio(path):
+    return AudioSegment.from_file(path)
+
+
+def audio_trim(seg, start_s, end_s):
+    return seg[int(start_s * 1000):int(end_s * 1000)]
+
+
+def audio_gain(seg, db):
+    return seg + db
+
+
+def audio_reverse(seg):
+    # whole frames, last to first, like audio_io.stream_reverse: reversing
+    # the interleaved samples (seg.reverse()) would swap L and R
+    if seg.channels == 1:
+        return seg.reverse()
+    return AudioSegment.from_mono_audiosegments(*(c.reverse() for c in seg.split_to_mono()))
+
+
+def audio_export(seg, out, fmt=None):
+    seg.export(out, format=fmt or os.path.splitext(out)[1][1:] or "wav")
+    return out
+
+
+#  video
+def extract_frames(path, out_dir, progress=None):
+    """Write every frame as frame_00000.png …; returns the frame count."""
+    cap = cv2.VideoCapture(path)
+    i = 0
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret: break
+            cv2.imwrite(os.path.join(out_dir, f"frame_{i:05d}.png"), frame)
+            i += 1
+            if progress: progress(i)
+    finally:
+        cap.release()
+    return i
+
+
+#  text
+TEXT_TRANSFORMS = {
+    "upper":     str.upper,
+    "lower":     str.lower,
+    "rev_lines": lambda t: "\n".join(reversed(t.splitlines())),
+    "sort":      lambda t: "\n".join(sorted(t.splitlines())),
+    "rm_blank":  lambda t: "\n".join(l for l in t.splitlines() if l.strip()),
+}
+
+
+def text_transform(text, op):
+    return TEXT_TRANSFORMS[op](text)
+
+
+def text_stats(text):
+    return {"lines": len(text.splitlines()), "words": len(text.split()),
+            "chars": len(text)}
+
+
+def char_freq(text, n=10):
+    return Counter(c for c in text if c.isalpha()).most_common(n)
+
+
+def find_replace(text, find, repl):
+    return text.replace(find, repl)
@@ -0,0 +1,131 @@
+"""
+parallel.py — Neighbourhood filters split across cores
+The image is cut into full-width row strips; each strip is filtered with
+image_ops.halo() rows of context on either side and only its own rows are
+kept, so the result is bit-identical to filtering the whole image at once.
+
+Pillow's blur and convolution code runs without the GIL, so those strips
+go to a thread pool working on the shared source image. Rank filters
+(min / max) hold the GIL; their strips go to a process pool that reads
+and writes shared-memory buffers instead of pickling pixels.
+"""
+
+import atexit, os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from PIL import Image
+
+WORKERS    = os.cpu_count() or 1     # set to 1 where the caller is already parallel
+MIN_PIXELS = 1_000_000               # smaller images are filtered in one piece
+MIN_ROWS   = 64                      # smallest strip, before halo
+
+_threads = None
+_procs   = None
+
+
+def _thread_pool():
+    global _threads
+    if _threads is None:
+        _threads = ThreadPoolExecutor(WORKERS, thread_name_prefix="filter")
+    return _threads
+
+
+def _proc_pool():
+    global _procs
+    if _procs is None:
+        import multiprocessing
+        # spawn: forking a process that runs Tk and worker threads is unsafe
+        _procs = ProcessPoolExecutor(WORKERS, multiprocessing.get_context("spawn"))
+    return _procs
+
+
+@atexit.register
+def shutdown():
+    global _threads, _procs
+    for pool in (_threads, _procs):
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+    _threads = _procs = None
+
+
+def strips(height, halo, workers):
+    """Row ranges [(y0, y1)], about two per worker so stragglers even out."""
+    n = max(1, min(2 * workers, height // max(MIN_ROWS, 4 * halo)))
+    cuts = [height * i // n for i in range(n + 1)]
+    return list(zip(cuts, cuts[1:]))
+
+
+def worth_splitting(img, halo, workers=None):
+    return (bool(halo) and (workers or WORKERS) > 1
+            and img.width * img.height >= MIN_PIXELS
+            and len(strips(img.height, halo, workers or WORKERS)) > 1)
+
+
+def filter_image(img: Image.Image, name, args, halo, processes=False, workers=None):
+    """image_ops op `name` applied to img strip by strip on a pool."""
+    workers = workers or WORKERS
+    if not worth_splitting(img, halo, workers):
+        return _call(name, args, img)
+    bounds = strips(img.height, halo, workers)
+    if processes:
+        return _filter_procs(img, name, args, halo, bounds)
+    W, H = img.size
+
+    def work(b):
+        y0, y1 = b
+        top = max(0, y0 - halo)
+        piece = _call(name, args, img.crop((0, top, W, min(H, y1 + halo))))
+        return y0, piece.crop((0, y0 - top, W, y1 - top))
+
+    out = None
+    for y0, piece in _thread_pool().map(work, bounds):
+        if out is None:
+            out = Image.new(piece.mode, img.size)
+        out.paste(piece, (0, y0))
+    return out
+
+
+def _call(name, args, img):
+    import image_ops
+    return image_ops.OPS[name].fn(img, *args)
+
+
+# ----------------------------------------------------------------------------
+#  process pool: source and result rows live in shared memory
+def _filter_procs(img, name, args, halo, bounds):
+    from multiprocessing import shared_memory
+    W, H = img.size
+    raw = img.tobytes()
+    stride = len(raw) // H
+    src = shared_memory.SharedMemory(create=True, size=len(raw))
+    dst = shared_memory.SharedMemory(create=True, size=len(raw))
+    try:
+        src.buf[:len(raw)] = raw
+        del raw
+        pool = _proc_pool()
+        jobs = [pool.submit(_strip_worker, src.name, dst.name, img.mode, W, H,
+                            stride, name, args, halo, y0, y1) for y0, y1 in bounds]
+        for fut in jobs:
+            fut.result()
+        return Image.frombytes(img.mode, img.size, bytes(dst.buf[:stride * H]))
+    finally:
+        for shm in (src, dst):
+            shm.close()
+            shm.unlink()
+
+
+def _strip_worker(src_name, dst_name, mode, W, H, stride, name, args, halo, y0, y1):
+    from multiprocessing import shared_memory
+    src = shared_memory.SharedMemory(name=src_name)
+    dst = shared_memory.SharedMemory(name=dst_name)
+    try:
+        top, bottom = max(0, y0 - halo), min(H, y1 + halo)
+        piece = Image.frombytes(mode, (W, bottom - top),
+                                bytes(src.buf[top * stride:bottom * stride]))
+        piece = _call(name, args, piece).crop((0, y0 - top, W, y1 - top))
+        if piece.mode != mode:
+            piece = piece.convert(mode)
+        dst.buf[y0 * stride:y1 * stride] = piece.tobytes()
+    finally:
+        src.close()
+        dst.close()
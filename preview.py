@@ -0,0 +1,85 @@
+"""
+preview.py — Viewport-aware preview rendering for Image Studio
+Keeps a lazily built mip pyramid per image version and resamples only the
+part of the image that is visible on the canvas.
+"""
+
+from PIL import Image
+
+import image_ops
+
+DRAFT_DELAY_MS = 120          # idle time before the high-quality pass
+FRAME_MS       = 16           # live previews refresh at most once per frame
+
+
+class Pyramid:
+    """Successive 2× box reductions of one image, built on demand."""
+
+    def __init__(self, img: Image.Image):
+        self.levels = [img]
+
+    def level_for(self, zoom: float) -> int:
+        # deepest level that still has at least one source pixel per screen pixel
+        lvl = 0
+        while 0.5 ** (lvl + 1) >= zoom:
+            src = self.get(lvl)
+            if min(src.size) < 4:
+                break
+            lvl += 1
+        return lvl
+
+    def get(self, lvl: int) -> Image.Image:
+        while len(self.levels) <= lvl:
+            self.levels.append(self.levels[-1].reduce(2))
+        return self.levels[lvl]
+
+
+class PreviewRenderer:
+    def __init__(self):
+        self._key     = None
+        self._pyramid = None
+
+    def invalidate(self):
+        self._key = None; self._pyramid = None
+
+    def _pyramid_for(self, img, version):
+        key = (id(img), version)
+        if key != self._key:
+            self._key, self._pyramid = key, Pyramid(img)
+        return self._pyramid
+
+    def proxy(self, img: Image.Image, version, max_size):
+        """A copy of img that fits max_size, taken from the pyramid."""
+        scale = min(1.0, max_size[0] / img.width, max_size[1] / img.height)
+        pyr = self._pyramid_for(img, version)
+        src = pyr.get(pyr.level_for(scale))
+        size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+        return src if src.size == size else src.resize(size, Image.LANCZOS)
+
+    def render(self, img: Image.Image, version, zoom: float, box, draft=False):
+        """Render the display-space box (x0, y0, x1, y1) of img at zoom."""
+        pyr = self._pyramid_for(img, version)
+        x0, y0, x1, y1 = box
+        out_w, out_h = max(1, x1 - x0), max(1, y1 - y0)
+        src = pyr.get(pyr.level_for(zoom))
+        # display coords → coords of the chosen pyramid level
+        s = src.width / img.width / zoom
+        sy = src.height / img.height / zoom
+        src_box = (x0 * s, y0 * sy,
+                   min(x1 * s, src.width), min(y1 * sy, src.height))
+        if draft:
+            resample = Image.NEAREST if zoom >= 1 else Image.BILINEAR
+        else:
+            resample = Image.LANCZOS
+        return src.resize((out_w, out_h), resample, box=src_box)
+
+
+class LivePreview:
+    """Renders one op node on a screen-sized proxy while a dialog is open."""
+
+    def __init__(self, proxy: Image.Image, full_size):
+        self.proxy = proxy
+        self.scale = proxy.width / full_size[0]
+
+    def render(self, name, args) -> Image.Image:
+        return image_ops.apply_op(self.proxy, name, args, self.scale)
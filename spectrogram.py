@@ -0,0 +1,256 @@
+"""
+spectrogram.py — Tiled short-time Fourier transform of long recordings
+The STFT is computed in tiles of TILE columns at a hop of HOP frames:
+each tile reads its span of an audio_io.AudioBuffer once, takes the
+windows as a strided view and transforms them with one batched rfft.
+Zoomed-out levels (hop 2·HOP, 4·HOP …) are built like the waveform
+pyramid: a tile is the column-wise max of the two tiles below it, so
+every frame is analysed and short events survive at any zoom. The
+first overview of a long file therefore costs one pass over it, painted
+tile by tile as it completes.
+
+Tiles of every level are kept as 8-bit dB images in an ImageCache keyed
+by file version, FFT size, hop and tile index, so zooming back or
+panning over seen audio redraws without recomputing. Set
+MM_SPECTRO_CACHE_MB to change its budget (default 256).
+"""
+
+import os
+import tkinter as tk
+from functools import lru_cache
+
+from backends import Lazy
+from executor import OpExecutor
+from image_cache import ImageCache
+import audio_io
+import waveform
+
+np      = Lazy("numpy")
+Image   = Lazy("PIL.Image")
+ImageTk = Lazy("PIL.ImageTk")
+
+N_FFT    = 1024               # window length, frames
+HOP      = 256                # hop of the finest level, frames
+TILE     = 256                # STFT columns per tile
+BINS     = N_FFT // 2 + 1
+FLOOR_DB = -100.0             # dB below full scale shown as black
+
+BUDGET = int(os.environ.get("MM_SPECTRO_CACHE_MB", 256)) << 20
+CACHE  = ImageCache(BUDGET, sizeof=lambda tile: tile.nbytes)
+
+# inferno-like ramp, dark to bright
+COLORMAP = [(0.0, (0, 0, 4)), (0.25, (87, 16, 110)), (0.5, (188, 55, 84)),
+            (0.75, (249, 142, 9)), (1.0, (252, 255, 164))]
+
+
+@lru_cache(maxsize=None)
+def hann(n):
+    # periodic Hann window, as STFTs use
+    return 0.5 - 0.5 * np.cos(2 * np.pi * np.arange(n) / n)
+
+
+@lru_cache(maxsize=None)
+def lut():
+    pos = [p for p, _ in COLORMAP]
+    x = np.linspace(0, 1, 256)
+    return np.stack([np.interp(x, pos, [c[i] for _, c in COLORMAP])
+                     for i in range(3)], axis=1).astype(np.uint8)
+
+
+def hop_for(span, width):
+    """Largest level hop with at least one column per pixel."""
+    k = int(np.log2(max(span / max(width, 1), HOP) / HOP))
+    return HOP << k
+
+
+def tile(buf, t):
+    """(BINS, TILE) uint8 dB magnitudes of columns t·TILE … at HOP; row 0
+    is DC. Channels are mixed down; frames past the end are zero."""
+    n, info = len(buf), buf.info
+    start = t * TILE * HOP
+    need = (TILE - 1) * HOP + N_FFT
+    x = np.zeros(need)
+    if start < n:
+        got = buf.samples(start, min(n, start + need)).mean(axis=1)
+        x[:len(got)] = got / audio_io.full_scale(info)
+    frames = np.lib.stride_tricks.sliding_window_view(x, N_FFT)[::HOP]
+    mag = np.abs(np.fft.rfft(frames * hann(N_FFT), axis=1))
+    db = 20 * np.log10(np.maximum(mag / (N_FFT / 4), 1e-10))   # full-scale sine ≈ 0 dB
+    return np.clip((db - FLOOR_DB) * (255 / -FLOOR_DB), 0, 255).astype(np.uint8).T
+
+
+def variant(hop, t):
+    return ("stft", N_FFT, hop, t)
+
+
+def cached_tile(path, buf, hop, t, job=None):
+    """Tile t at hop: computed at HOP, else max-pooled from tiles 2t and
+    2t+1 at hop / 2; every level passed through stays cached."""
+    def make(p):
+        if hop == HOP:
+            return tile(buf, t)
+        last = (len(buf) - 1) // (hop // 2) // TILE       # last tile one level down
+        halves = []
+        for i in (2 * t, 2 * t + 1):
+            if job is not None:
+                job.check()
+            halves.append(cached_tile(path, buf, hop // 2, i, job) if i <= last
+                          else np.zeros((BINS, TILE), np.uint8))
+        return np.concatenate(halves, axis=1).reshape(BINS, TILE, 2).max(axis=2)
+    return CACHE.load(path, make, variant(hop, t))
+
+
+def compose(tiles, hop, start, end, width, height):
+    """(height, width) uint8 image of frames [start, end) from {t: tile},
+    highest frequency on top; missing tiles stay black. Columns and bins
+    that share a pixel are max-pooled so short events stay visible."""
+    c0, c1 = start / hop, end / hop
+    t0, t1 = int(c0) // TILE, int(np.ceil(c1)) // TILE
+    block = np.zeros((BINS, (t1 - t0 + 1) * TILE), np.uint8)
+    for t in range(t0, t1 + 1):
+        if t in tiles:
+            block[:, (t - t0) * TILE:(t - t0 + 1) * TILE] = tiles[t]
+    cols = np.linspace(c0, c1, width + 1) - t0 * TILE
+    first = cols[:-1].astype(np.int64)
+    if c1 - c0 >= width:
+        stop = max(int(np.ceil(cols[-1])), first[-1] + 1)
+        img = np.maximum.reduceat(block[:, :stop], first, axis=1)
+    else:
+        img = block[:, first]                   # zoomed in: columns stretch
+    rows = np.linspace(0, BINS, height + 1)[:-1].astype(np.int64)
+    img = np.maximum.reduceat(img, rows, axis=0) if height < BINS else img[rows]
+    return img[::-1]
+
+
+def colorize(img):
+    return lut()[img]
+
+
+# ----------------------------------------------------------------------------
+class Spectrogram(tk.Toplevel):
+    """Spectrogram window for one file: the wheel zooms around the pointer,
+    dragging pans and a double-click shows the whole file. Tiles for the
+    view are computed on a worker pool and painted as each one arrives."""
+
+    ZOOM  = 1.25
+    AXIS  = 18                    # px below the image for time labels
+
+    def __init__(self, master, path, colors):
+        super().__init__(master)
+        self.title(f"🌈  {os.path.basename(path)}")
+        self.geometry("960x520")
+        self.configure(bg=colors["bg"])
+        self._c      = colors
+        self._path   = path
+        self._ex     = OpExecutor(self, workers=os.cpu_count() or 1)
+        self._buf    = None
+        self._hop    = None
+        self._need   = range(0)
+        self._tiles  = {}                      # t -> tile at self._hop
+        self._jobs   = {}                      # (hop, t) -> Job
+        self._drag   = None
+        self._photo  = None
+        self.start   = self.end = 0
+        self._info   = tk.StringVar(value="Opening …")
+
+        self._canvas = tk.Canvas(self, bg=colors["bg"], highlightthickness=0,
+                                 cursor="sb_h_double_arrow")
+        self._canvas.pack(fill="both", expand=True)
+        tk.Label(self, textvariable=self._info, bg=colors["accent"], fg=colors["subtext"],
+                 font=("Segoe UI", 9), anchor="w", padx=8).pack(fill="x", side="bottom")
+        self._canvas.bind("<Configure>", lambda e: self._update())
+        self._canvas.bind("<MouseWheel>", lambda e: self.zoom(self.ZOOM ** (-e.delta / 120), e.x))
+        self._canvas.bind("<Button-4>", lambda e: self.zoom(1 / self.ZOOM, e.x))
+        self._canvas.bind("<Button-5>", lambda e: self.zoom(self.ZOOM, e.x))
+        self._canvas.bind("<ButtonPress-1>", lambda e: setattr(self, "_drag", (e.x, self.start)))
+        self._canvas.bind("<B1-Motion>", self._pan)
+        self._canvas.bind("<Double-Button-1>", lambda e: self._set(0, len(self._buf or ())))
+        self.bind("<Destroy>", self._closed)
+        self._ex.submit(f"open {os.path.basename(path)}",
+                        lambda job: audio_io.open_buffer(path), self._opened,
+                        lambda exc: self._info.set(f"Cannot read audio: {exc}"))
+
+    def _opened(self, buf):
+        self._buf = buf
+        self.start, self.end = 0, len(buf)
+        self._update()
+
+    # view
+    def _set(self, start, span):
+        if not self._buf: return
+        n, w = len(self._buf), max(1, self._canvas.winfo_width())
+        span = min(n, max(span, w * HOP // 4))           # at most 4 px per column
+        self.start = int(min(max(0, start), n - span))
+        self.end = self.start + int(span)
+        self._update()
+
+    def zoom(self, factor, x):
+        if not self._buf: return
+        span, w = self.end - self.start, max(1, self._canvas.winfo_width())
+        at = self.start + span * x / w                   # frame kept under the pointer
+        self._set(at - span * factor * x / w, span * factor)
+
+    def _pan(self, e):
+        if not self._buf or self._drag is None: return
+        x0, start0 = self._drag
+        span = self.end - self.start
+        self._set(start0 - (e.x - x0) * span / max(1, self._canvas.winfo_width()), span)
+
+    # tiles
+    def _update(self):
+        """Pick the hop for the view, request missing tiles, repaint."""
+        if not self._buf: return
+        buf, hop = self._buf, hop_for(self.end - self.start, self._canvas.winfo_width())
+        last = (len(buf) - 1) // hop // TILE
+        need = range(self.start // hop // TILE, min(last, self.end // hop // TILE) + 1)
+        if hop != self._hop:
+            self._hop, self._tiles = hop, {}
+        self._tiles = {t: v for t, v in self._tiles.items() if t in need}
+        for key, job in list(self._jobs.items()):
+            if key[0] != hop or key[1] not in need:      # zoomed or panned away
+                job.cancel()
+                del self._jobs[key]
+        for t in need:
+            if t in self._tiles or (hop, t) in self._jobs:
+                continue
+            if CACHE.has(self._path, variant(hop, t)):
+                self._tiles[t] = CACHE.get(self._path, variant(hop, t))
+                continue
+            self._jobs[hop, t] = self._ex.submit(
+                f"stft {t}", lambda job, t=t: cached_tile(self._path, buf, hop, t, job),
+                lambda tl, t=t: self._arrived(hop, t, tl),
+                lambda exc: self._info.set(f"Spectrogram failed: {exc}"))
+        self._need = need
+        self._paint()
+
+    def _arrived(self, hop, t, tl):
+        self._jobs.pop((hop, t), None)
+        if hop == self._hop and t in self._need:
+            self._tiles[t] = tl
+            self._paint()
+
+    def _paint(self):
+        w, h = self._canvas.winfo_width(), self._canvas.winfo_height() - self.AXIS
+        if w < 2 or h < 2 or self._hop is None: return
+        img = colorize(compose(self._tiles, self._hop, self.start, self.end, w, h))
+        self._photo = ImageTk.PhotoImage(Image.fromarray(img))
+        c, font, fg = self._canvas, ("Segoe UI", 8), self._c["subtext"]
+        c.delete("all")
+        c.create_image(0, 0, anchor="nw", image=self._photo)
+        rate = self._buf.info["rate"]
+        nyq = rate / 2000                                   # kHz
+        step = next((s for s in (0.5, 1, 2, 5, 10, 20, 50) if nyq / s <= 8), 100)
+        for i in range(1, int(nyq / step) + 1):
+            y = h * (1 - i * step / nyq)
+            c.create_text(w - 4, y, anchor="e", text=f"{i * step:g} kHz", fill="white", font=font)
+        c.create_text(4, h + 2, anchor="nw", text=waveform.clock(self.start / rate),
+                      fill=fg, font=font)
+        c.create_text(w - 4, h + 2, anchor="ne", text=waveform.clock(self.end / rate),
+                      fill=fg, font=font)
+        done = sum(t in self._tiles for t in self._need)
+        self._info.set(f"hop {self._hop} • {N_FFT}-point Hann • "
+                       f"tiles {done}/{len(self._need)} • cache {CACHE.summary()}")
+
+    def _closed(self, event):
+        if event.widget is self:
+            self._ex.shutdown()
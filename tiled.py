@@ -0,0 +1,265 @@
+"""
+tiled.py — Out-of-core processing for images larger than RAM
+Images are read, processed and written as horizontal strips. Each strip
+is read with a halo of extra rows so neighbourhood filters see the same
+input they would on the whole image, which makes the result identical
+to the in-memory path. Uncompressed TIFF / PPM / BMP sources are read
+strip by strip straight from the file; other formats are decoded once.
+Output goes to a strip TIFF written incrementally.
+"""
+
+import os, struct
+
+from PIL import Image
+
+import image_ops
+
+ROWS         = 256                 # output rows per strip
+LARGE_PIXELS = 100_000_000         # above this Image Studio works on a proxy
+
+# bytes per pixel of the 8-bit raw layouts we can slice directly
+RAW_BPP = {"L": 1, "P": 1, "LA": 2, "RGB": 3, "BGR": 3, "RGBA": 4,
+           "RGBX": 4, "BGRA": 4, "BGRX": 4, "RGBa": 4}
+
+
+def open_lazy(path) -> Image.Image:
+    """Image.open without the decompression-bomb limit (nothing is decoded)."""
+    limit, Image.MAX_IMAGE_PIXELS = Image.MAX_IMAGE_PIXELS, None
+    try:
+        return Image.open(path)
+    finally:
+        Image.MAX_IMAGE_PIXELS = limit
+
+
+def is_large(size):
+    return size[0] * size[1] > LARGE_PIXELS
+
+
+# ----------------------------------------------------------------------------
+#  halo of a recipe
+def halo(nodes):
+    """Rows of context the nodes need on each side of a strip; raises
+    ValueError for a node that needs the whole image."""
+    total = 0
+    for name, args in nodes:
+        h = image_ops.halo(name, args)
+        if h is None:
+            raise ValueError(f"{image_ops.describe((name, args))} needs the "
+                             f"whole image and cannot run tiled")
+        total += h
+    return total
+
+
+def tileable(nodes):
+    try:
+        halo(nodes)
+        return True
+    except ValueError:
+        return False
+
+
+# ----------------------------------------------------------------------------
+class TiledSource:
+    """Row-range reader over an image file."""
+
+    def __init__(self, path):
+        self.path = path
+        im = open_lazy(path)
+        self.size, self.mode = im.size, im.mode
+        self._tiles = self._raw_tiles(im)
+        self._full  = None if self._tiles is not None else im
+        if self._tiles is not None:
+            im.close()
+
+    @property
+    def streaming(self):
+        """True if rows are read from the file without decoding it all."""
+        return self._tiles is not None
+
+    @staticmethod
+    def _raw_tiles(im):
+        if im.mode not in ("L", "RGB", "RGBA") or not im.tile:
+            return None
+        tiles = []
+        for codec, extents, offset, args in im.tile:
+            if isinstance(args, str):
+                args = (args, 0, 1)
+            rawmode, stride, ystep = (tuple(args) + (0, 1))[:3]
+            if codec != "raw" or rawmode not in RAW_BPP or ystep not in (1, -1):
+                return None
+            x0, y0, x1, y1 = extents
+            stride = stride or (x1 - x0) * RAW_BPP[rawmode]
+            tiles.append((extents, offset, rawmode, stride, ystep))
+        return tiles
+
+    def read(self, y0, y1) -> Image.Image:
+        """Rows y0 … y1 (exclusive) as an image of the source mode."""
+        w = self.size[0]
+        if self._full is not None:
+            return self._full.crop((0, y0, w, y1))
+        band = Image.new(self.mode, (w, y1 - y0))
+        with open(self.path, "rb") as f:
+            for (tx0, ty0, tx1, ty1), offset, rawmode, stride, ystep in self._tiles:
+                r0, r1 = max(y0, ty0), min(y1, ty1)
+                if r0 >= r1:
+                    continue
+                # bottom-up layouts store the last row first
+                first = r0 - ty0 if ystep == 1 else ty1 - r1
+                f.seek(offset + first * stride)
+                data = f.read((r1 - r0) * stride)
+                part = Image.frombytes(self.mode, (tx1 - tx0, r1 - r0), data,
+                                       "raw", rawmode, stride, ystep)
+                band.paste(part, (tx0, r0 - y0))
+        return band
+
+    def strips(self, rows=ROWS, pad=0):
+        """Yield (y0, y1, top, band): band holds rows y0 - top … y1 + pad."""
+        h = self.size[1]
+        for y0 in range(0, h, rows):
+            y1 = min(h, y0 + rows)
+            a, b = max(0, y0 - pad), min(h, y1 + pad)
+            yield y0, y1, y0 - a, self.read(a, b)
+
+    def proxy(self, max_side):
+        """Box-reduced copy no larger than max_side, built strip by strip."""
+        w, h = self.size
+        f = max(1, -(-max(w, h) // max_side))          # ceil
+        out = Image.new(self.mode, (-(-w // f), -(-h // f)))
+        # strips of whole reduction blocks reduce exactly like the full image
+        for y0, y1, _, band in self.strips(rows=f * max(1, ROWS // f)):
+            out.paste(band.reduce(f), (0, y0 // f))
+        return out
+
+    def close(self):
+        if self._full is not None:
+            self._full.close()
+
+
+# ----------------------------------------------------------------------------
+class TiffWriter:
+    """Uncompressed strip TIFF written top to bottom; BigTIFF when the
+    pixel data would not fit 32-bit offsets."""
+
+    PHOTOMETRIC = {"L": 1, "RGB": 2, "RGBA": 2}
+
+    def __init__(self, path, size, mode):
+        if mode not in self.PHOTOMETRIC:
+            raise ValueError(f"cannot write {mode} strips")
+        self.path, self.size, self.mode = path, size, mode
+        self.bands = len(mode)
+        self.big = size[0] * size[1] * self.bands > 0xFFFF0000
+        self._strips = []                           # (offset, nbytes)
+        self._rows = 0
+        self._rows_per_strip = None
+        self._f = open(path, "wb")
+        if self.big:
+            self._f.write(b"II" + struct.pack("<HHHQ", 43, 8, 0, 0))
+        else:
+            self._f.write(b"II" + struct.pack("<HI", 42, 0))
+
+    def write(self, strip: Image.Image):
+        if strip.mode != self.mode or strip.width != self.size[0]:
+            raise ValueError("strip does not match the output image")
+        data = strip.tobytes()
+        self._strips.append((self._f.tell(), len(data)))
+        self._f.write(data)
+        self._rows += strip.height
+        if self._rows_per_strip is None:
+            self._rows_per_strip = strip.height
+
+    def close(self):
+        if self._f is None:
+            return
+        if self._rows != self.size[1]:
+            self._f.close(); self._f = None
+            os.remove(self.path)
+            raise ValueError(f"{self._rows} of {self.size[1]} rows written")
+        w, h = self.size
+        rows = self._rows_per_strip or h
+        LONG = 16 if self.big else 4                # LONG8 in BigTIFF
+        tags = [
+            (256, 4, [w]), (257, 4, [h]), (258, 3, [8] * self.bands),
+            (259, 3, [1]), (262, 3, [self.PHOTOMETRIC[self.mode]]),
+            (273, LONG, [o for o, _ in self._strips]),
+            (277, 3, [self.bands]), (278, 4, [rows]),
+            (279, LONG, [n for _, n in self._strips]), (284, 3, [1]),
+        ]
+        if self.mode == "RGBA":
+            tags.append((338, 3, [2]))               # unassociated alpha
+        self._write_ifd(tags)
+        self._f.close(); self._f = None
+
+    def _write_ifd(self, tags):
+        f, big = self._f, self.big
+        fmt = {3: "H", 4: "I", 16: "Q"}
+        inline = 8 if big else 4
+        # out-of-line values first, then the directory pointing at them
+        values = []
+        for tag, typ, vals in tags:
+            raw = struct.pack(f"<{len(vals)}{fmt[typ]}", *vals)
+            if len(raw) > inline:
+                if f.tell() % 2:
+                    f.write(b"\0")
+                off = f.tell(); f.write(raw)
+                raw = struct.pack("<Q" if big else "<I", off)
+            values.append((tag, typ, len(vals), raw.ljust(inline, b"\0")))
+        if f.tell() % 2:
+            f.write(b"\0")
+        ifd = f.tell()
+        if big:
+            f.write(struct.pack("<Q", len(values)))
+            for tag, typ, n, raw in values:
+                f.write(struct.pack("<HHQ", tag, typ, n) + raw)
+            f.write(struct.pack("<Q", 0))
+            f.seek(8); f.write(struct.pack("<Q", ifd))
+        else:
+            f.write(struct.pack("<H", len(values)))
+            for tag, typ, n, raw in values:
+                f.write(struct.pack("<HHI", tag, typ, n) + raw)
+            f.write(struct.pack("<I", 0))
+            f.seek(4); f.write(struct.pack("<I", ifd))
+
+    def abort(self):
+        if self._f is not None:
+            self._f.close(); self._f = None
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *_):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+# ----------------------------------------------------------------------------
+def process(src, nodes, out_path, scale=1.0, rows=ROWS, job=None):
+    """Apply nodes to a TiledSource (or path) strip by strip, writing a TIFF.
+    scale converts pixel arguments recorded on a proxy to full size."""
+    if not isinstance(src, TiledSource):
+        src = TiledSource(src)
+    nodes = [(name, image_ops.OPS[name].scaled_args(tuple(args), scale))
+             for name, args in nodes]
+    pad = halo(nodes)
+    w, h = src.size
+    writer = None
+    try:
+        for y0, y1, top, band in src.strips(rows, pad):
+            if job is not None:
+                job.check()
+            if band.mode not in ("L", "RGB", "RGBA"):
+                band = band.convert("RGB")
+            out = image_ops.run(band, nodes).crop((0, top, w, top + y1 - y0))
+            if writer is None:
+                writer = TiffWriter(out_path, (w, h), out.mode)
+            writer.write(out)
+            if job is not None:
+                job.report(y1 / h)
+        writer.close()
+    except BaseException:
+        if writer is not None:
+            writer.abort()
+        raise
+    return out_path
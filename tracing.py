@@ -0,0 +1,159 @@
+"""
+tracing.py — Span timings and on-demand profiling for the Tk apps
+span() records how long a stage took (decode, op, history, display …)
+plus sizes of what it produced; export_chrome() writes the spans as a
+Chrome trace (chrome://tracing, ui.perfetto.dev). With tracing off,
+span() hands back one shared no-op object, so instrumented code costs a
+flag check. cProfile capture can be switched on and off separately.
+
+Set MM_TRACE=1 in the environment to start with tracing enabled.
+"""
+
+import os, threading, time
+from collections import deque
+
+MAX_SPANS = 20_000            # oldest spans are dropped beyond this
+
+_enabled  = os.environ.get("MM_TRACE", "") not in ("", "0")
+_spans    = deque(maxlen=MAX_SPANS)
+_t0       = time.perf_counter()
+_profiles = None              # list of cProfile.Profile while profiling
+_main_profile = None
+_lock     = threading.Lock()
+
+
+class _Span:
+    __slots__ = ("name", "cat", "args", "start")
+
+    def __init__(self, name, cat, args):
+        self.name, self.cat, self.args = name, cat, args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, *_):
+        end = time.perf_counter()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        _spans.append((self.name, self.cat, self.start, end,
+                       threading.get_ident(), self.args))
+
+    def add(self, **args):
+        self.args.update(args)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        pass
+
+    def add(self, **args):
+        pass
+
+
+NULL = _NullSpan()
+
+
+def span(name, cat="app", **args):
+    """Context manager timing one stage; .add(key=value) attaches details."""
+    if not _enabled:
+        return NULL
+    return _Span(name, cat, args)
+
+
+def enable(on=True):
+    global _enabled
+    _enabled = bool(on)
+
+
+def enabled():
+    return _enabled
+
+
+def clear():
+    _spans.clear()
+
+
+def spans():
+    return list(_spans)
+
+
+def nbytes(img):
+    """Size of a decoded image buffer, for span details."""
+    return img.width * img.height * len(img.getbands()) if img is not None else 0
+
+
+# ----------------------------------------------------------------------------
+def export_chrome(path):
+    """Write the recorded spans as Chrome trace-event JSON."""
+    import json
+    pid = os.getpid()
+    names = {t.ident: t.name for t in threading.enumerate()}
+    events = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+               "args": {"name": name}} for tid, name in names.items()]
+    for name, cat, start, end, tid, args in list(_spans):
+        events.append({"name": name, "cat": cat, "ph": "X", "pid": pid,
+                       "tid": tid, "ts": (start - _t0) * 1e6,
+                       "dur": (end - start) * 1e6,
+                       "args": {k: v if isinstance(v, (int, float, bool)) else str(v)
+                                for k, v in args.items()}})
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    return len(events)
+
+
+# ----------------------------------------------------------------------------
+#  profiling: one cProfile per worker call plus one for the Tk thread,
+#  merged when the capture stops (cProfile/pstats load only when used)
+def profiling():
+    return _profiles is not None
+
+
+def start_profile():
+    global _profiles, _main_profile
+    import cProfile
+    if _profiles is not None:
+        return
+    _profiles = []
+    _main_profile = cProfile.Profile()
+    _main_profile.enable()
+
+
+def call(fn, *args):
+    """fn(*args), profiled when a capture is running (for worker threads)."""
+    profiles = _profiles
+    if profiles is None:
+        return fn(*args)
+    import cProfile
+    prof = cProfile.Profile()
+    try:
+        return prof.runcall(fn, *args)
+    finally:
+        with _lock:
+            profiles.append(prof)
+
+
+def stop_profile(path=None, top=25):
+    """End the capture; dump it to path (.prof) if given and return the
+    top entries by cumulative time as text."""
+    global _profiles, _main_profile
+    if _profiles is None:
+        return ""
+    _main_profile.disable()
+    import io, pstats
+    with _lock:
+        profiles, _profiles = [_main_profile] + _profiles, None
+    _main_profile = None
+    out = io.StringIO()
+    stats = pstats.Stats(profiles[0], stream=out)
+    for p in profiles[1:]:
+        stats.add(p)
+    if path:
+        stats.dump_stats(path)
+    stats.sort_stats("cumulative").print_stats(top)
+    return out.getvalue()
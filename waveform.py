@@ -0,0 +1,210 @@
+"""
+waveform.py — Min/max peak pyramid and a zoomable waveform view
+A long recording cannot be drawn sample by sample. build() reduces it in
+one pass over an audio_io.AudioBuffer to the minimum and maximum of
+every BASE frames (all channels), then halves that level repeatedly, so
+any zoom draws from the coarsest level that still has a bin per pixel:
+a few thousand values, however long the file. Zoomed in past level 0,
+the view reads the few samples it needs straight from the buffer.
+
+Pyramids are stored as .npz files in a cache directory, one per source
+path, and rebuilt only when the file's mtime or size changes.
+Set MM_PEAK_CACHE to move the cache (default ~/.cache/multimedia-course).
+"""
+
+import hashlib, os, zipfile
+import tkinter as tk
+
+from backends import Lazy
+from image_cache import file_key
+import audio_io
+
+np = Lazy("numpy")
+
+BASE     = 256                # frames per bin at level 0
+MIN_BINS = 1024               # levels stop halving below this many bins
+
+
+def cache_dir():
+    base = os.environ.get("MM_PEAK_CACHE") or os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+        "multimedia-course")
+    return os.path.join(base, "peaks")
+
+
+def cache_file(path):
+    h = hashlib.blake2b(os.path.abspath(path).encode(), digest_size=16).hexdigest()
+    return os.path.join(cache_dir(), f"{h}.npz")
+
+
+class Peaks:
+    """levels[k] is a (2, n) float16 array of [min, max] per BASE << k
+    frames, scaled to -1 … 1."""
+
+    def __init__(self, levels, rate, frames):
+        self.levels, self.rate, self.frames = levels, rate, frames
+
+    def level_for(self, frames_per_px):
+        k = int(np.log2(max(frames_per_px, BASE) / BASE))
+        return min(k, len(self.levels) - 1)
+
+    def columns(self, start, end, width, buffer=None):
+        """(mins, maxs) of width pixel columns over frames [start, end);
+        below level 0 from buffer's samples when one is given."""
+        if buffer is not None and (end - start) < width * BASE:
+            x = buffer.samples(start, end) / audio_io.full_scale(buffer.info)
+            lo, hi, size, start = x.min(axis=1), x.max(axis=1), 1, 0
+            end = len(x)
+        else:
+            k = self.level_for((end - start) / width)
+            lo, hi = self.levels[k]
+            size = BASE << k
+        if not len(lo):
+            return np.zeros(width), np.zeros(width)
+        # reduceat covers whole bins from each column's left edge to the
+        # next one's; a column ending inside a bin also takes that bin
+        n = len(lo)
+        edges = np.linspace(start, end, width + 1) / size
+        first = np.minimum(edges.astype(np.int64), n - 1)
+        part = edges[1:] - np.floor(edges[1:]) > 1e-6
+        stop = min(n, max(int(np.ceil(edges[-1])), first[-2] + 1))   # last column's end
+        mins = np.minimum.reduceat(lo[:stop], first[:-1])
+        maxs = np.maximum.reduceat(hi[:stop], first[:-1])
+        return (np.where(part, np.minimum(mins, lo[first[1:]]), mins),
+                np.where(part, np.maximum(maxs, hi[first[1:]]), maxs))
+
+
+def build(buf, job=None):
+    """Peaks of an AudioBuffer in one pass over its blocks."""
+    n, scale = len(buf), audio_io.full_scale(buf.info)
+    level = np.zeros((2, -(-n // BASE)), np.float16)
+    for s, e in buf.blocks(job):                # BLOCK is a multiple of BASE
+        x = buf.typed(s, e).ravel()             # channels interleaved in each bin
+        b = s // BASE
+        full = len(x) - len(x) % (BASE * buf.info["channels"])
+        rows = x[:full].reshape(-1, BASE * buf.info["channels"])
+        level[0, b:b + len(rows)] = rows.min(axis=1) / scale
+        level[1, b:b + len(rows)] = rows.max(axis=1) / scale
+        if full < len(x):                       # the file's last, partial bin
+            level[:, b + len(rows)] = x[full:].min() / scale, x[full:].max() / scale
+    levels = [level]
+    while level.shape[1] > MIN_BINS:
+        if level.shape[1] & 1:
+            level = np.concatenate([level, level[:, -1:]], axis=1)
+        pairs = level.reshape(2, -1, 2)
+        level = np.stack([pairs[0].min(axis=1), pairs[1].max(axis=1)])
+        levels.append(level)
+    return Peaks(levels, buf.info["rate"], n)
+
+
+def peaks_for(path, job=None):
+    """Peaks of path from the cache, built and stored if missing or stale."""
+    _, mtime, size = file_key(path)
+    key = [mtime, size, BASE]
+    out = cache_file(path)
+    try:
+        with np.load(out) as z:
+            if z["key"].tolist() == key:
+                return Peaks([z[f"l{k}"] for k in range(int(z["levels"]))],
+                             int(z["rate"]), int(z["frames"]))
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        pass
+    peaks = build(audio_io.open_buffer(path), job)
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    tmp = f"{out}.part{os.getpid()}"
+    try:
+        with open(tmp, "wb") as f:
+            np.savez(f, key=np.array(key, np.int64), levels=len(peaks.levels),
+                     rate=peaks.rate, frames=peaks.frames,
+                     **{f"l{k}": lvl for k, lvl in enumerate(peaks.levels)})
+        os.replace(tmp, out)
+    except OSError:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return peaks
+
+
+def clock(t):
+    m, s = divmod(t, 60)
+    h, m = divmod(int(m), 60)
+    return f"{h}:{m:02d}:{s:05.2f}" if h else f"{m}:{s:05.2f}"
+
+
+# ----------------------------------------------------------------------------
+class WaveformView(tk.Canvas):
+    """Waveform of a Peaks pyramid: the wheel zooms around the pointer,
+    dragging pans and a double-click shows the whole file."""
+
+    ZOOM = 1.25
+
+    def __init__(self, master, colors, height=180):
+        super().__init__(master, bg=colors["bg"], height=height,
+                         highlightthickness=0, cursor="sb_h_double_arrow")
+        self._c      = colors
+        self.peaks   = None
+        self.buffer  = None                      # AudioBuffer for zooms past level 0
+        self.start   = self.end = 0              # frames in view
+        self._drag   = None
+        self.bind("<Configure>", lambda e: self.draw())
+        self.bind("<MouseWheel>", lambda e: self.zoom(self.ZOOM ** (-e.delta / 120), e.x))
+        self.bind("<Button-4>", lambda e: self.zoom(1 / self.ZOOM, e.x))
+        self.bind("<Button-5>", lambda e: self.zoom(self.ZOOM, e.x))
+        self.bind("<ButtonPress-1>", lambda e: setattr(self, "_drag", (e.x, self.start)))
+        self.bind("<B1-Motion>", self._pan)
+        self.bind("<Double-Button-1>", lambda e: self.show(self.peaks, self.buffer))
+
+    def message(self, text):
+        self.peaks = None
+        self.delete("all")
+        self.create_text(12, 12, anchor="nw", text=text, fill=self._c["subtext"],
+                         font=("Segoe UI", 10))
+
+    def show(self, peaks, buffer=None):
+        if peaks is None: return
+        self.peaks, self.buffer = peaks, buffer
+        self.start, self.end = 0, peaks.frames
+        self.draw()
+
+    def _set(self, start, span):
+        n = self.peaks.frames
+        span = min(n, max(span, self.winfo_width()))   # at most 1 px per frame
+        self.start = int(min(max(0, start), n - span))
+        self.end = self.start + int(span)
+        self.draw()
+
+    def zoom(self, factor, x):
+        if self.peaks is None: return
+        span = self.end - self.start
+        at = self.start + span * x / max(1, self.winfo_width())   # frame kept under the pointer
+        new = span * factor
+        self._set(at - new * x / max(1, self.winfo_width()), new)
+
+    def _pan(self, e):
+        if self.peaks is None or self._drag is None: return
+        x0, start0 = self._drag
+        span = self.end - self.start
+        self._set(start0 - (e.x - x0) * span / max(1, self.winfo_width()), span)
+
+    def draw(self):
+        if self.peaks is None or self.end <= self.start: return
+        w, h = self.winfo_width(), self.winfo_height()
+        if w < 2: return
+        lo, hi = self.peaks.columns(self.start, self.end, w, self.buffer)
+        mid, amp = h / 2, h / 2 - 14
+        xs = np.arange(w)
+        top = np.stack([xs, mid - np.clip(hi, -1, 1) * amp], axis=1)
+        bot = np.stack([xs, mid - np.clip(lo, -1, 1) * amp], axis=1)[::-1]
+        self.delete("all")
+        self.create_line(0, mid, w, mid, fill=self._c["accent"])
+        self.create_polygon(np.concatenate([top, bot]).ravel().tolist(),
+                            fill=self._c["highlight"], outline=self._c["highlight"])
+        rate, font = self.peaks.rate, ("Segoe UI", 8)
+        self.create_text(4, h - 2, anchor="sw", text=clock(self.start / rate),
+                         fill=self._c["subtext"], font=font)
+        self.create_text(w - 4, h - 2, anchor="se", text=clock(self.end / rate),
+                         fill=self._c["subtext"], font=font)
+        per_px = (self.end - self.start) / w
+        level = "samples" if self.buffer is not None and per_px < BASE else \
+                f"level {self.peaks.level_for(per_px)}"
+        self.create_text(w - 4, 2, anchor="ne", text=f"{per_px:,.0f} frames/px  •  {level}",
+                         fill=self._c["subtext"], font=font)